@@ -2,7 +2,7 @@
 Authentication API routes
 """
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.core.config import get_settings
@@ -11,7 +11,7 @@ from app.services.auth import (
     authenticate_user,
     create_access_token,
     get_current_active_user,
-    get_password_hash,
+    get_password_hash_async,
     require_admin
 )
 from app.services.database import get_database
@@ -115,7 +115,7 @@ async def create_user(
     user_doc = {
         "username": user_data.username,
         "name": user_data.name,
-        "password_hash": get_password_hash(user_data.password),
+        "password_hash": await get_password_hash_async(user_data.password),
         "role": user_data.role.value,
         "store_ids": user_data.store_ids
     }
@@ -132,19 +132,23 @@ async def create_user(
 
 @router.get("/users")
 async def list_users(
+    limit: int = Query(200, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
     db = Depends(get_database),
     current_user: dict = Depends(require_admin)
 ):
     """
-    List all users (admin only)
+    List users (admin only)
     """
-    users = await db.users.find(
+    cursor = db.users.find(
         {},
         {"password_hash": 0}  # Exclude password hash
-    ).to_list(length=None)
+    ).sort("username", 1).skip(offset).limit(limit)
     
-    # Convert ObjectId to string
-    for user in users:
+    users = []
+    async for user in cursor:
+        # Convert ObjectId to string
         user["id"] = str(user.pop("_id"))
+        users.append(user)
     
     return users
@@ -2,26 +2,111 @@
 Dashboard and Analytics API routes
 """
 from datetime import datetime, date, timedelta
-from typing import Optional, List
-from collections import Counter
+from typing import Dict, Optional, List
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from bson import ObjectId
 
 from app.models.schemas import (
-    DashboardSummary, DailySummary, TopItem, ToneBreakdown,
-    ProcessingStatus
+    DashboardSummary, ProcessingStatus, ToneType,
+    STORE_ID_PATTERN, TONE_PATTERN, STATUS_FILTER_PATTERN
 )
+from app.services.analytics import MENTION_FIELDS, store_name_lookup
 from app.services.auth import require_manager, get_current_active_user
+from app.services.cache import dashboard_cache, get_store_names
 from app.services.database import get_database
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 
-@router.get("/summary", response_model=DashboardSummary)
+def feedback_date_range(start_date: Optional[date], end_date: Optional[date]) -> dict:
+    """
+    Range filter on the raw feedback_date field.
+    
+    Bounds are native datetimes (BSON Dates) so a leading $match can use the
+    feedback_date indexes; never filter on a $dateToString-derived value.
+    """
+    bounds = {}
+    if start_date:
+        bounds["$gte"] = datetime.combine(start_date, datetime.min.time())
+    if end_date:
+        bounds["$lte"] = datetime.combine(end_date, datetime.max.time())
+    return bounds
+
+
+# Fields read by get_feedbacks_list; skips transcription text, notes, etc.
+FEEDBACK_LIST_PROJECTION = {
+    "store_id": 1,
+    "store_name": 1,
+    "feedback_date": 1,
+    "submitted_at": 1,
+    "submitted_by": 1,
+    "analysis.tone": 1,
+    "analysis.tone_score": 1,
+    "analysis.summary": 1,
+    "analysis.products": 1,
+    "analysis.issues": 1,
+    "analysis.actions": 1,
+    "transcription_status": 1,
+    "analysis_status": 1,
+    "audio_url": 1
+}
+
+# $group accumulators summing daily_analytics rollup rows
+ROLLUP_COUNTERS = {
+    "total": {"$sum": "$total_feedbacks"},
+    **{tone.value: {"$sum": f"$tone_breakdown.{tone.value}"} for tone in ToneType}
+}
+
+
+def _daily_pipeline(start_date: date, end_date: date) -> list:
+    """$facet branch with per-day tone counts, every day in the window present"""
+    return [
+        {"$group": {"_id": "$date", **ROLLUP_COUNTERS}},
+        {"$project": {"_id": 0, "date": "$_id", "total": 1, **{tone.value: 1 for tone in ToneType}}},
+        {
+            "$densify": {
+                "field": "date",
+                "range": {
+                    "step": 1,
+                    "unit": "day",
+                    "bounds": [
+                        datetime.combine(start_date, datetime.min.time()),
+                        datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+                    ]
+                }
+            }
+        },
+        {"$sort": {"date": 1}},
+        {
+            "$project": {
+                "_id": 0,
+                "date": 1,
+                "store_id": {"$literal": None},
+                "total": {"$ifNull": ["$total", 0]},
+                **{tone.value: {"$ifNull": [f"${tone.value}", 0]} for tone in ToneType}
+            }
+        }
+    ]
+
+
+def _top_items_pipeline(field: str, limit: int = 5) -> list:
+    """$facet branch summing the most mentioned analysis.<field> entries"""
+    return [
+        {"$project": {"items": {"$objectToArray": f"${MENTION_FIELDS[field]}"}}},
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.k", "count": {"$sum": "$items.v"}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit}
+    ]
+
+
+@router.get("/summary", response_model=None, responses={200: {"model": DashboardSummary}})
 async def get_dashboard_summary(
     days: int = Query(15, ge=1, le=90, description="Number of days to include"),
-    store_id: Optional[str] = Query(None, pattern=r'^W\d{3}$', description="Filter by store"),
+    store_id: Optional[str] = Query(None, pattern=STORE_ID_PATTERN, description="Filter by store"),
     db = Depends(get_database),
     current_user: dict = Depends(require_manager)
 ):
@@ -35,147 +120,109 @@ async def get_dashboard_summary(
     - Store-wise breakdown
     - Top 5 products, issues, and actions
     """
+    cache_key = ("summary", days, store_id)
+    cached = dashboard_cache.get(cache_key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+    
     end_date = date.today()
     start_date = end_date - timedelta(days=days - 1)
     
-    # Build query filter
-    query = {
-        "feedback_date": {
-            "$gte": datetime.combine(start_date, datetime.min.time()),
-            "$lte": datetime.combine(end_date, datetime.max.time())
-        },
-        "analysis_status": ProcessingStatus.COMPLETED.value
-    }
+    # Read the per-(day, store) rollups of completed feedbacks rather than
+    # the feedbacks themselves; see app.services.analytics
+    query = {"date": feedback_date_range(start_date, end_date)}
     
     if store_id:
         query["store_id"] = store_id
     
-    # Fetch all analyzed feedbacks for the period
-    feedbacks = await db.feedbacks.find(query).to_list(length=None)
-    
-    # Initialize counters
-    total_feedbacks = len(feedbacks)
-    tone_counts = Counter()
-    daily_data = {}
-    store_data = {}
-    all_products = Counter()
-    all_issues = Counter()
-    all_actions = Counter()
-    
-    stores_seen = set()
-    
-    # Process each feedback
-    for fb in feedbacks:
-        fb_date = fb["feedback_date"].date() if fb.get("feedback_date") else None
-        fb_store = fb.get("store_id", "unknown")
-        analysis = fb.get("analysis", {})
-        tone = analysis.get("tone", "neutral")
-        
-        stores_seen.add(fb_store)
-        
-        # Count tones
-        tone_counts[tone] += 1
-        
-        # Daily breakdown
-        if fb_date:
-            date_key = fb_date.isoformat()
-            if date_key not in daily_data:
-                daily_data[date_key] = {
-                    "date": fb_date,
-                    "total": 0,
-                    "positive": 0,
-                    "negative": 0,
-                    "neutral": 0
-                }
-            daily_data[date_key]["total"] += 1
-            daily_data[date_key][tone] += 1
-        
-        # Store breakdown
-        if fb_store not in store_data:
-            store_data[fb_store] = {
-                "store_id": fb_store,
-                "store_name": fb.get("store_name", fb_store),
-                "total": 0,
-                "positive": 0,
-                "negative": 0,
-                "neutral": 0
+    pipeline = [
+        {"$match": query},
+        {
+            "$facet": {
+                "totals": [
+                    {"$group": {"_id": None, **ROLLUP_COUNTERS}}
+                ],
+                "daily": _daily_pipeline(start_date, end_date),
+                "stores": [
+                    {
+                        "$group": {
+                            "_id": "$store_id",
+                            "store_name": {"$first": "$store_name"},
+                            **ROLLUP_COUNTERS
+                        }
+                    },
+                    {"$sort": {"total": -1, "_id": 1}}
+                ],
+                "top_products": _top_items_pipeline("products"),
+                "top_issues": _top_items_pipeline("issues"),
+                "top_actions": _top_items_pipeline("actions"),
             }
-        store_data[fb_store]["total"] += 1
-        store_data[fb_store][tone] += 1
-        
-        # Aggregate products, issues, actions
-        for product in analysis.get("products", []):
-            if product:
-                all_products[product.strip().lower()] += 1
-        
-        for issue in analysis.get("issues", []):
-            if issue:
-                all_issues[issue.strip().lower()] += 1
-        
-        for action in analysis.get("actions", []):
-            if action:
-                all_actions[action.strip().lower()] += 1
-    
-    # Build daily breakdown sorted by date
-    daily_breakdown = []
-    current = start_date
-    while current <= end_date:
-        date_key = current.isoformat()
-        if date_key in daily_data:
-            daily_breakdown.append(DailySummary(
-                date=current,
-                total=daily_data[date_key]["total"],
-                positive=daily_data[date_key]["positive"],
-                negative=daily_data[date_key]["negative"],
-                neutral=daily_data[date_key]["neutral"]
-            ))
-        else:
-            daily_breakdown.append(DailySummary(
-                date=current,
-                total=0,
-                positive=0,
-                negative=0,
-                neutral=0
-            ))
-        current += timedelta(days=1)
-    
-    # Build store breakdown sorted by total
-    store_breakdown = sorted(
-        list(store_data.values()),
-        key=lambda x: x["total"],
-        reverse=True
-    )
+        }
+    ]
     
-    # Get top 5 items
-    def get_top_5(counter: Counter) -> List[TopItem]:
-        return [
-            TopItem(name=name.title(), count=count)
-            for name, count in counter.most_common(5)
+    cursor = await db.daily_analytics.aggregate(pipeline)
+    results = await cursor.to_list(length=1)
+    facets = results[0] if results else {}
+    
+    totals = (facets.get("totals") or [{}])[0]
+    
+    # Daily breakdown arrives gap-filled and sorted. Rows are plain dicts in the
+    # DashboardSummary shape: the data comes straight from the aggregation, so
+    # Pydantic validation is skipped.
+    daily_breakdown = facets.get("daily", [])
+    for day in daily_breakdown:
+        day["date"] = day["date"].date()
+    
+    if not daily_breakdown:
+        # $densify has nothing to extend when the window has no rollup rows
+        daily_breakdown = [
+            {"date": start_date + timedelta(days=i), "store_id": None,
+             "total": 0, "positive": 0, "negative": 0, "neutral": 0}
+            for i in range(days)
         ]
     
-    return DashboardSummary(
-        period_start=start_date,
-        period_end=end_date,
-        total_feedbacks=total_feedbacks,
-        total_stores=len(stores_seen),
-        tone_breakdown=ToneBreakdown(
-            positive=tone_counts.get("positive", 0),
-            negative=tone_counts.get("negative", 0),
-            neutral=tone_counts.get("neutral", 0)
-        ),
-        daily_breakdown=daily_breakdown,
-        store_breakdown=store_breakdown,
-        top_products=get_top_5(all_products),
-        top_issues=get_top_5(all_issues),
-        top_actions=get_top_5(all_actions)
-    )
+    # Store breakdown, already sorted by total
+    store_breakdown = [
+        {
+            "store_id": s["_id"],
+            "store_name": s.get("store_name"),
+            "total": s["total"],
+            "positive": s["positive"],
+            "negative": s["negative"],
+            "neutral": s["neutral"]
+        }
+        for s in facets.get("stores", [])
+    ]
+    
+    def get_top_5(rows: List[dict]) -> List[dict]:
+        return [{"name": r["_id"].title(), "count": r["count"]} for r in rows]
+    
+    summary = {
+        "period_start": start_date,
+        "period_end": end_date,
+        "total_feedbacks": totals.get("total", 0),
+        "total_stores": len(store_breakdown),
+        "tone_breakdown": {
+            "positive": totals.get("positive", 0),
+            "negative": totals.get("negative", 0),
+            "neutral": totals.get("neutral", 0)
+        },
+        "daily_breakdown": daily_breakdown,
+        "store_breakdown": store_breakdown,
+        "top_products": get_top_5(facets.get("top_products", [])),
+        "top_issues": get_top_5(facets.get("top_issues", [])),
+        "top_actions": get_top_5(facets.get("top_actions", []))
+    }
+    
+    dashboard_cache[cache_key] = summary
+    return ORJSONResponse(summary)
 
 
 @router.get("/daily")
 async def get_daily_breakdown(
     start_date: date = Query(..., description="Start date"),
     end_date: date = Query(..., description="End date"),
-    store_id: Optional[str] = Query(None, pattern=r'^W\d{3}$'),
+    store_id: Optional[str] = Query(None, pattern=STORE_ID_PATTERN),
     db = Depends(get_database),
     current_user: dict = Depends(require_manager)
 ):
@@ -189,10 +236,7 @@ async def get_daily_breakdown(
         )
     
     query = {
-        "feedback_date": {
-            "$gte": datetime.combine(start_date, datetime.min.time()),
-            "$lte": datetime.combine(end_date, datetime.max.time())
-        }
+        "feedback_date": feedback_date_range(start_date, end_date)
     }
     
     if store_id:
@@ -219,7 +263,8 @@ async def get_daily_breakdown(
         {"$sort": {"_id.date": 1}}
     ]
     
-    results = await db.feedbacks.aggregate(pipeline).to_list(length=None)
+    cursor = await db.feedbacks.aggregate(pipeline)
+    results = await cursor.to_list(length=None)
     
     # Format results
     formatted = []
@@ -235,30 +280,19 @@ async def get_daily_breakdown(
     return formatted
 
 
-@router.get("/feedbacks")
-async def get_feedbacks_list(
-    start_date: Optional[date] = Query(None),
-    end_date: Optional[date] = Query(None),
-    store_id: Optional[str] = Query(None, pattern=r'^W\d{3}$'),
-    tone: Optional[str] = Query(None, pattern=r'^(positive|negative|neutral)$'),
-    status: Optional[str] = Query(None, pattern=r'^(pending|completed|failed)$'),
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-    db = Depends(get_database),
-    current_user: dict = Depends(require_manager)
-):
-    """
-    Get filtered list of feedbacks for the dashboard
-    """
+def _feedbacks_query(
+    start_date: Optional[date],
+    end_date: Optional[date],
+    store_id: Optional[str],
+    tone: Optional[str],
+    status: Optional[str]
+) -> dict:
+    """Build the feedbacks filter shared by the list and export endpoints"""
     query = {}
     
     # Date range filter
     if start_date or end_date:
-        query["feedback_date"] = {}
-        if start_date:
-            query["feedback_date"]["$gte"] = datetime.combine(start_date, datetime.min.time())
-        if end_date:
-            query["feedback_date"]["$lte"] = datetime.combine(end_date, datetime.max.time())
+        query["feedback_date"] = feedback_date_range(start_date, end_date)
     
     # Store filter
     if store_id:
@@ -272,37 +306,70 @@ async def get_feedbacks_list(
     if status:
         query["analysis_status"] = status
     
-    # Get total count
-    total = await db.feedbacks.count_documents(query)
+    return query
+
+
+def _format_feedback_item(fb: dict, store_names: Dict[str, str]) -> dict:
+    """Format a projected feedback document for dashboard lists and exports"""
+    analysis = fb.get("analysis", {})
+    return {
+        "id": str(fb["_id"]),
+        "store_id": fb.get("store_id"),
+        "store_name": store_names.get(fb.get("store_id"), fb.get("store_name", "")),
+        "feedback_date": fb["feedback_date"].date().isoformat() if fb.get("feedback_date") else None,
+        "submitted_at": fb.get("submitted_at"),
+        "submitted_by": fb.get("submitted_by"),
+        "tone": analysis.get("tone"),
+        "tone_score": analysis.get("tone_score"),
+        "summary": analysis.get("summary"),
+        "products": analysis.get("products", []),
+        "issues": analysis.get("issues", []),
+        "actions": analysis.get("actions", []),
+        "transcription_status": fb.get("transcription_status", "pending"),
+        "analysis_status": fb.get("analysis_status", "pending"),
+        "audio_url": fb.get("audio_url")
+    }
+
+
+@router.get("/feedbacks")
+async def get_feedbacks_list(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    store_id: Optional[str] = Query(None, pattern=STORE_ID_PATTERN),
+    tone: Optional[str] = Query(None, pattern=TONE_PATTERN),
+    status: Optional[str] = Query(None, pattern=STATUS_FILTER_PATTERN),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db = Depends(get_database),
+    current_user: dict = Depends(require_manager)
+):
+    """
+    Get filtered list of feedbacks for the dashboard
+    """
+    query = _feedbacks_query(start_date, end_date, store_id, tone, status)
     
-    # Get feedbacks
-    feedbacks = await db.feedbacks.find(query)\
-        .sort("feedback_date", -1)\
-        .skip(offset)\
-        .limit(limit)\
-        .to_list(length=None)
+    # Page of feedbacks and total count in a single round-trip
+    pipeline = [
+        {"$match": query},
+        {
+            "$facet": {
+                "rows": [
+                    {"$sort": {"feedback_date": -1}},
+                    {"$skip": offset},
+                    {"$limit": limit},
+                    {"$project": FEEDBACK_LIST_PROJECTION}
+                ],
+                "total": [{"$count": "n"}]
+            }
+        }
+    ]
+    cursor = await db.feedbacks.aggregate(pipeline)
+    results = await cursor.to_list(length=1)
+    page = results[0] if results else {"rows": [], "total": []}
+    total = page["total"][0]["n"] if page["total"] else 0
     
-    # Format response
-    items = []
-    for fb in feedbacks:
-        analysis = fb.get("analysis", {})
-        items.append({
-            "id": str(fb["_id"]),
-            "store_id": fb.get("store_id"),
-            "store_name": fb.get("store_name", ""),
-            "feedback_date": fb["feedback_date"].date().isoformat() if fb.get("feedback_date") else None,
-            "submitted_at": fb["submitted_at"].isoformat() if fb.get("submitted_at") else None,
-            "submitted_by": fb.get("submitted_by"),
-            "tone": analysis.get("tone"),
-            "tone_score": analysis.get("tone_score"),
-            "summary": analysis.get("summary"),
-            "products": analysis.get("products", []),
-            "issues": analysis.get("issues", []),
-            "actions": analysis.get("actions", []),
-            "transcription_status": fb.get("transcription_status", "pending"),
-            "analysis_status": fb.get("analysis_status", "pending"),
-            "audio_url": fb.get("audio_url")
-        })
+    store_names = await get_store_names(db)
+    items = [_format_feedback_item(fb, store_names) for fb in page["rows"]]
     
     return {
         "total": total,
@@ -312,6 +379,37 @@ async def get_feedbacks_list(
     }
 
 
+@router.get("/feedbacks/export")
+async def export_feedbacks(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    store_id: Optional[str] = Query(None, pattern=STORE_ID_PATTERN),
+    tone: Optional[str] = Query(None, pattern=TONE_PATTERN),
+    status: Optional[str] = Query(None, pattern=STATUS_FILTER_PATTERN),
+    db = Depends(get_database),
+    current_user: dict = Depends(require_manager)
+):
+    """
+    Export all matching feedbacks as newline-delimited JSON (NDJSON)
+    
+    Rows are streamed as they are read from MongoDB, so memory use stays
+    flat regardless of export size.
+    """
+    query = _feedbacks_query(start_date, end_date, store_id, tone, status)
+    cursor = db.feedbacks.find(query, FEEDBACK_LIST_PROJECTION).sort("feedback_date", -1)
+    store_names = await get_store_names(db)
+    
+    async def generate_rows():
+        async for fb in cursor:
+            yield orjson.dumps(_format_feedback_item(fb, store_names)) + b"\n"
+    
+    return StreamingResponse(
+        generate_rows(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="feedbacks.ndjson"'}
+    )
+
+
 @router.get("/stores")
 async def get_stores_summary(
     days: int = Query(15, ge=1, le=90),
@@ -321,41 +419,44 @@ async def get_stores_summary(
     """
     Get summary of feedback activity by store
     """
+    cache_key = ("stores", days)
+    cached = dashboard_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     end_date = date.today()
     start_date = end_date - timedelta(days=days - 1)
     
     pipeline = [
         {
             "$match": {
-                "feedback_date": {
-                    "$gte": datetime.combine(start_date, datetime.min.time()),
-                    "$lte": datetime.combine(end_date, datetime.max.time())
-                }
+                "feedback_date": feedback_date_range(start_date, end_date)
             }
         },
         {
             "$group": {
                 "_id": "$store_id",
-                "store_name": {"$first": "$store_name"},
                 "total_feedbacks": {"$sum": 1},
                 "last_feedback": {"$max": "$feedback_date"}
             }
         },
+        *store_name_lookup("_id"),
         {"$sort": {"total_feedbacks": -1}}
     ]
     
-    results = await db.feedbacks.aggregate(pipeline).to_list(length=None)
+    cursor = await db.feedbacks.aggregate(pipeline)
+    results = await cursor.to_list(length=None)
     
     # Get all stores for comparison
-    all_stores = await db.stores.find({"active": True}).to_list(length=None)
+    store_names = await get_store_names(db)
     stores_with_feedback = {r["_id"] for r in results}
     
     # Add stores with no feedback
-    for store in all_stores:
-        if store["store_id"] not in stores_with_feedback:
+    for store_id, store_name in store_names.items():
+        if store_id not in stores_with_feedback:
             results.append({
-                "_id": store["store_id"],
-                "store_name": store.get("store_name", ""),
+                "_id": store_id,
+                "store_name": store_name,
                 "total_feedbacks": 0,
                 "last_feedback": None
             })
@@ -370,6 +471,7 @@ async def get_stores_summary(
             "last_feedback": r["last_feedback"].isoformat() if r.get("last_feedback") else None
         })
     
+    dashboard_cache[cache_key] = formatted
     return formatted
 
 
@@ -381,38 +483,59 @@ async def get_processing_status(
     """
     Get overview of processing queue status
     """
-    # Transcription status
-    transcription_pending = await db.feedbacks.count_documents({
-        "transcription_status": ProcessingStatus.PENDING.value
-    })
-    transcription_processing = await db.feedbacks.count_documents({
-        "transcription_status": ProcessingStatus.PROCESSING.value
-    })
-    transcription_failed = await db.feedbacks.count_documents({
-        "transcription_status": ProcessingStatus.FAILED.value
-    })
-    
-    # Analysis status
-    analysis_pending = await db.feedbacks.count_documents({
-        "transcription_status": ProcessingStatus.COMPLETED.value,
-        "analysis_status": ProcessingStatus.PENDING.value
-    })
-    analysis_processing = await db.feedbacks.count_documents({
-        "analysis_status": ProcessingStatus.PROCESSING.value
-    })
-    analysis_failed = await db.feedbacks.count_documents({
-        "analysis_status": ProcessingStatus.FAILED.value
-    })
+    cached = dashboard_cache.get(("processing-status",))
+    if cached is not None:
+        return cached
     
-    return {
+    pending = ProcessingStatus.PENDING.value
+    processing = ProcessingStatus.PROCESSING.value
+    failed = ProcessingStatus.FAILED.value
+    
+    def count_where(condition: dict) -> list:
+        return [{"$match": condition}, {"$count": "n"}]
+    
+    # All six queue counters in a single round-trip
+    pipeline = [
+        {
+            "$match": {
+                "$or": [
+                    {"transcription_status": {"$in": [pending, processing, failed]}},
+                    {"analysis_status": {"$in": [pending, processing, failed]}}
+                ]
+            }
+        },
+        {
+            "$facet": {
+                "transcription_pending": count_where({"transcription_status": pending}),
+                "transcription_processing": count_where({"transcription_status": processing}),
+                "transcription_failed": count_where({"transcription_status": failed}),
+                "analysis_pending": count_where({
+                    "transcription_status": ProcessingStatus.COMPLETED.value,
+                    "analysis_status": pending
+                }),
+                "analysis_processing": count_where({"analysis_status": processing}),
+                "analysis_failed": count_where({"analysis_status": failed}),
+            }
+        }
+    ]
+    
+    cursor = await db.feedbacks.aggregate(pipeline)
+    results = await cursor.to_list(length=1)
+    facets = results[0] if results else {}
+    counts = {name: rows[0]["n"] if rows else 0 for name, rows in facets.items()}
+    
+    queue_status = {
         "transcription": {
-            "pending": transcription_pending,
-            "processing": transcription_processing,
-            "failed": transcription_failed
+            "pending": counts.get("transcription_pending", 0),
+            "processing": counts.get("transcription_processing", 0),
+            "failed": counts.get("transcription_failed", 0)
         },
         "analysis": {
-            "pending": analysis_pending,
-            "processing": analysis_processing,
-            "failed": analysis_failed
+            "pending": counts.get("analysis_pending", 0),
+            "processing": counts.get("analysis_processing", 0),
+            "failed": counts.get("analysis_failed", 0)
         }
     }
+    
+    dashboard_cache[("processing-status",)] = queue_status
+    return queue_status
@@ -1,27 +1,57 @@
 """
 Feedback upload and management API routes
 """
+import asyncio
 import os
 import uuid
-from datetime import datetime, date
+from datetime import UTC, datetime, date
 from pathlib import Path
-from typing import Optional
+from typing import Annotated, Optional
+from urllib.parse import quote
 
+import aiofiles
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
 from app.core.config import get_settings
 from app.models.schemas import (
     Feedback, FeedbackCreate, FeedbackListItem, 
-    ProcessingStatus
+    ProcessingStatus, STORE_ID_PATTERN
 )
 from app.services.auth import get_current_active_user, require_staff, require_manager
+from app.services.cache import invalidate_dashboard_cache, get_store_names
+from app.services.analytics import refresh_daily_analytics, rollup_key
 from app.services.database import get_database
 from bson import ObjectId
 
 router = APIRouter(prefix="/feedback", tags=["Feedback"])
 settings = get_settings()
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+# Fields read by get_my_feedbacks; skips transcription text, notes, etc.
+MY_FEEDBACKS_PROJECTION = {
+    "store_id": 1,
+    "store_name": 1,
+    "feedback_date": 1,
+    "submitted_at": 1,
+    "analysis.tone": 1,
+    "analysis.summary": 1,
+    "transcription_status": 1,
+    "analysis_status": 1
+}
+
+
+def _parse_feedback_id(feedback_id: str) -> ObjectId:
+    """Parse the {feedback_id} path parameter once; malformed ids are a 400, as before"""
+    if not ObjectId.is_valid(feedback_id):
+        raise HTTPException(status_code=400, detail="Invalid feedback ID")
+    return ObjectId(feedback_id)
+
+
+# {feedback_id} path parameter arriving in handlers as an already-parsed ObjectId
+FeedbackId = Annotated[ObjectId, Depends(_parse_feedback_id)]
+
 
 def validate_file_extension(filename: str) -> bool:
     """Check if file extension is allowed"""
@@ -32,7 +62,7 @@ def validate_file_extension(filename: str) -> bool:
 @router.post("/upload", status_code=status.HTTP_201_CREATED)
 async def upload_feedback(
     file: UploadFile = File(...),
-    store_id: str = Form(..., pattern=r'^W\d{3}$'),
+    store_id: str = Form(..., pattern=STORE_ID_PATTERN),
     feedback_date: date = Form(...),
     notes: Optional[str] = Form(None),
     db = Depends(get_database),
@@ -53,18 +83,6 @@ async def upload_feedback(
             detail=f"File type not allowed. Supported: {', '.join(settings.ALLOWED_EXTENSIONS)}"
         )
     
-    # Check file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Seek back to start
-    
-    max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-    if file_size > max_size:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE_MB}MB"
-        )
-    
     # Check if user has access to this store (for staff users)
     user_role = current_user.get("role", "staff")
     user_stores = current_user.get("store_ids", [])
@@ -76,8 +94,7 @@ async def upload_feedback(
         )
     
     # Get store info
-    store = await db.stores.find_one({"store_id": store_id})
-    store_name = store.get("store_name", "") if store else ""
+    store_name = (await get_store_names(db)).get(store_id, "")
     
     # Create directory structure: uploads/{store_id}/{date}/
     date_str = feedback_date.isoformat()
@@ -89,17 +106,33 @@ async def upload_feedback(
     unique_filename = f"{uuid.uuid4().hex}{file_ext}"
     file_path = upload_dir / unique_filename
     
-    # Save file
+    # Stream file to disk in chunks, enforcing the size limit as we go
+    max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    file_size = 0
     try:
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        async with aiofiles.open(file_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > max_size:
+                    break
+                await f.write(chunk)
+            if settings.UPLOAD_FSYNC and file_size <= max_size:
+                await f.flush()
+                await asyncio.to_thread(os.fdatasync, f.fileno())
     except Exception as e:
+        file_path.unlink(missing_ok=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save file: {str(e)}"
         )
     
+    if file_size > max_size:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE_MB}MB"
+        )
+    
     # Create feedback record
     audio_url = f"/uploads/{store_id}/{date_str}/{unique_filename}"
     
@@ -107,7 +140,7 @@ async def upload_feedback(
         "store_id": store_id,
         "store_name": store_name,
         "feedback_date": datetime.combine(feedback_date, datetime.min.time()),
-        "submitted_at": datetime.utcnow(),
+        "submitted_at": datetime.now(UTC),
         "submitted_by": current_user["username"],
         "notes": notes,
         
@@ -124,6 +157,7 @@ async def upload_feedback(
     }
     
     result = await db.feedbacks.insert_one(feedback_doc)
+    invalidate_dashboard_cache()
     
     return {
         "id": str(result.inserted_id),
@@ -147,23 +181,36 @@ async def get_my_feedbacks(
     """
     query = {"submitted_by": current_user["username"]}
     
-    total = await db.feedbacks.count_documents(query)
-    
-    feedbacks = await db.feedbacks.find(query)\
-        .sort("submitted_at", -1)\
-        .skip(offset)\
-        .limit(limit)\
-        .to_list(length=None)
+    # Page of feedbacks and total count in a single round-trip
+    pipeline = [
+        {"$match": query},
+        {
+            "$facet": {
+                "rows": [
+                    {"$sort": {"submitted_at": -1}},
+                    {"$skip": offset},
+                    {"$limit": limit},
+                    {"$project": MY_FEEDBACKS_PROJECTION}
+                ],
+                "total": [{"$count": "n"}]
+            }
+        }
+    ]
+    cursor = await db.feedbacks.aggregate(pipeline)
+    results = await cursor.to_list(length=1)
+    page = results[0] if results else {"rows": [], "total": []}
+    total = page["total"][0]["n"] if page["total"] else 0
     
+    store_names = await get_store_names(db)
     items = []
-    for fb in feedbacks:
+    for fb in page["rows"]:
         analysis = fb.get("analysis", {})
         items.append({
             "id": str(fb["_id"]),
             "store_id": fb["store_id"],
-            "store_name": fb.get("store_name", ""),
+            "store_name": store_names.get(fb["store_id"], fb.get("store_name", "")),
             "feedback_date": fb["feedback_date"].date().isoformat() if fb.get("feedback_date") else None,
-            "submitted_at": fb["submitted_at"].isoformat() if fb.get("submitted_at") else None,
+            "submitted_at": fb.get("submitted_at"),
             "tone": analysis.get("tone"),
             "summary": analysis.get("summary"),
             "transcription_status": fb.get("transcription_status", "pending"),
@@ -178,17 +225,14 @@ async def get_my_feedbacks(
 
 @router.get("/{feedback_id}")
 async def get_feedback_detail(
-    feedback_id: str,
+    feedback_id: FeedbackId,
     db = Depends(get_database),
     current_user: dict = Depends(require_staff)
 ):
     """
     Get detailed feedback information including transcription and analysis
     """
-    if not ObjectId.is_valid(feedback_id):
-        raise HTTPException(status_code=400, detail="Invalid feedback ID")
-    
-    feedback = await db.feedbacks.find_one({"_id": ObjectId(feedback_id)})
+    feedback = await db.feedbacks.find_one({"_id": feedback_id})
     
     if not feedback:
         raise HTTPException(status_code=404, detail="Feedback not found")
@@ -219,17 +263,14 @@ async def get_feedback_detail(
 
 @router.get("/{feedback_id}/audio")
 async def get_feedback_audio(
-    feedback_id: str,
+    feedback_id: FeedbackId,
     db = Depends(get_database),
     current_user: dict = Depends(require_staff)
 ):
     """
     Stream the audio file for a feedback
     """
-    if not ObjectId.is_valid(feedback_id):
-        raise HTTPException(status_code=400, detail="Invalid feedback ID")
-    
-    feedback = await db.feedbacks.find_one({"_id": ObjectId(feedback_id)})
+    feedback = await db.feedbacks.find_one({"_id": feedback_id})
     
     if not feedback:
         raise HTTPException(status_code=404, detail="Feedback not found")
@@ -239,7 +280,8 @@ async def get_feedback_audio(
         raise HTTPException(status_code=404, detail="Audio file not found")
     
     # Convert URL to file path
-    file_path = Path(settings.UPLOAD_DIR) / audio_url.replace("/uploads/", "")
+    relative_path = audio_url.replace("/uploads/", "")
+    file_path = Path(settings.UPLOAD_DIR) / relative_path
     
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Audio file not found on disk")
@@ -257,28 +299,42 @@ async def get_feedback_audio(
         ".aac": "audio/aac"
     }
     content_type = content_types.get(ext, "application/octet-stream")
+    filename = feedback.get("audio_filename", file_path.name)
+    
+    # Behind Nginx, hand the transfer off to it instead of streaming from Python
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        quoted_filename = quote(filename)
+        if quoted_filename != filename:
+            content_disposition = f"attachment; filename*=utf-8''{quoted_filename}"
+        else:
+            content_disposition = f'attachment; filename="{filename}"'
+        
+        return Response(
+            media_type=content_type,
+            headers={
+                "X-Accel-Redirect": f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(relative_path)}",
+                "Content-Disposition": content_disposition
+            }
+        )
     
     return FileResponse(
         file_path,
         media_type=content_type,
-        filename=feedback.get("audio_filename", file_path.name)
+        filename=filename
     )
 
 
 @router.post("/{feedback_id}/retry-transcription")
 async def retry_transcription(
-    feedback_id: str,
+    feedback_id: FeedbackId,
     db = Depends(get_database),
     current_user: dict = Depends(require_manager)
 ):
     """
     Retry failed transcription (manager only)
     """
-    if not ObjectId.is_valid(feedback_id):
-        raise HTTPException(status_code=400, detail="Invalid feedback ID")
-    
     result = await db.feedbacks.update_one(
-        {"_id": ObjectId(feedback_id)},
+        {"_id": feedback_id},
         {
             "$set": {
                 "transcription_status": ProcessingStatus.PENDING.value,
@@ -290,32 +346,34 @@ async def retry_transcription(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Feedback not found")
     
+    invalidate_dashboard_cache()
     return {"status": "queued", "message": "Transcription will be retried"}
 
 
 @router.post("/{feedback_id}/retry-analysis")
 async def retry_analysis(
-    feedback_id: str,
+    feedback_id: FeedbackId,
     db = Depends(get_database),
     current_user: dict = Depends(require_manager)
 ):
     """
     Retry failed LLM analysis (manager only)
     """
-    if not ObjectId.is_valid(feedback_id):
-        raise HTTPException(status_code=400, detail="Invalid feedback ID")
-    
-    result = await db.feedbacks.update_one(
-        {"_id": ObjectId(feedback_id)},
+    feedback = await db.feedbacks.find_one_and_update(
+        {"_id": feedback_id},
         {
             "$set": {
                 "analysis_status": ProcessingStatus.PENDING.value,
                 "analysis_error": None
             }
-        }
+        },
+        projection={"feedback_date": 1, "store_id": 1}
     )
     
-    if result.matched_count == 0:
+    if not feedback:
         raise HTTPException(status_code=404, detail="Feedback not found")
     
+    # A previously completed analysis drops out of the rollups until re-analyzed
+    await refresh_daily_analytics(db, [rollup_key(feedback)])
+    invalidate_dashboard_cache()
     return {"status": "queued", "message": "Analysis will be retried"}
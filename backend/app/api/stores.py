@@ -3,9 +3,13 @@ Stores management API routes
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 from app.models.schemas import Store, StoreCreate
+from app.services.analytics import set_rollup_store_name
 from app.services.auth import require_manager, require_admin
+from app.services.cache import stores_cache, invalidate_stores_cache
 from app.services.database import get_database
 
 router = APIRouter(prefix="/stores", tags=["Stores"])
@@ -20,6 +24,11 @@ async def list_stores(
     """
     List all stores
     """
+    cache_key = ("list", active_only)
+    cached = stores_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     query = {"active": True} if active_only else {}
     
     stores = await db.stores.find(query).sort("store_id", 1).to_list(length=None)
@@ -27,6 +36,7 @@ async def list_stores(
     for store in stores:
         store["id"] = str(store.pop("_id"))
     
+    stores_cache[cache_key] = stores
     return stores
 
 
@@ -39,12 +49,18 @@ async def get_store(
     """
     Get a specific store by ID
     """
+    cache_key = ("store", store_id)
+    cached = stores_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     store = await db.stores.find_one({"store_id": store_id})
     
     if not store:
         raise HTTPException(status_code=404, detail="Store not found")
     
     store["id"] = str(store.pop("_id"))
+    stores_cache[cache_key] = store
     return store
 
 
@@ -67,6 +83,9 @@ async def create_store(
     
     store_doc = store_data.model_dump()
     result = await db.stores.insert_one(store_doc)
+    # Rollup rows of earlier feedbacks fell back to the store id for a name
+    await set_rollup_store_name(db, store_data.store_id, store_data.store_name)
+    invalidate_stores_cache()
     
     return {
         "id": str(result.inserted_id),
@@ -92,6 +111,11 @@ async def update_store(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Store not found")
     
+    # Rows whose store was given a new id lose the name, like unknown stores
+    await set_rollup_store_name(
+        db, store_id, store_data.store_name if store_data.store_id == store_id else store_id
+    )
+    invalidate_stores_cache()
     return {"status": "updated", "store_id": store_id}
 
 
@@ -112,6 +136,7 @@ async def deactivate_store(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Store not found")
     
+    invalidate_stores_cache()
     return {"status": "deactivated", "store_id": store_id}
 
 
@@ -124,18 +149,28 @@ async def bulk_import_stores(
     """
     Bulk import stores (admin only)
     """
-    imported = 0
-    skipped = 0
+    # Existing stores are left untouched; only missing ones are inserted
+    ops = [
+        UpdateOne({"store_id": s.store_id}, {"$setOnInsert": s.model_dump()}, upsert=True)
+        for s in stores
+    ]
     
-    for store_data in stores:
-        existing = await db.stores.find_one({"store_id": store_data.store_id})
-        if existing:
-            skipped += 1
-            continue
-        
-        await db.stores.insert_one(store_data.model_dump())
-        imported += 1
+    imported = 0
+    upserted_indexes = []
+    if ops:
+        try:
+            result = await db.stores.bulk_write(ops, ordered=False)
+            imported = result.upserted_count
+            upserted_indexes = list(result.upserted_ids)
+        except BulkWriteError as e:
+            # Concurrent upserts of the same store_id hit the unique index and are skipped
+            imported = e.details.get("nUpserted", 0)
+            upserted_indexes = [u["index"] for u in e.details.get("upserted", [])]
+    for index in upserted_indexes:
+        await set_rollup_store_name(db, stores[index].store_id, stores[index].store_name)
+    skipped = len(stores) - imported
     
+    invalidate_stores_cache()
     return {
         "imported": imported,
         "skipped": skipped,
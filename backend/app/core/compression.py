@@ -0,0 +1,39 @@
+"""
+GZip compression that skips already-compressed media
+
+Audio, video and image bodies gain nothing from gzip but still cost a full
+compression pass on the event loop (and break Range requests for playback),
+so responses with those content types, and anything under /media, are sent
+as-is.
+"""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+PRECOMPRESSED_CONTENT_TYPES = ("audio/", "video/", "image/", "application/zip", "application/gzip")
+
+
+class MediaAwareGZipResponder(GZipResponder):
+    """GZipResponder treating precompressed content types like an existing Content-Encoding"""
+
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith(PRECOMPRESSED_CONTENT_TYPES):
+                self.content_encoding_set = True  # pass the body through untouched
+
+
+class MediaAwareGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that never compresses /media or precompressed responses"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not scope["path"].startswith("/media/"):
+            headers = Headers(scope=scope)
+            if "gzip" in headers.get("Accept-Encoding", ""):
+                responder = MediaAwareGZipResponder(
+                    self.app, self.minimum_size, compresslevel=self.compresslevel
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
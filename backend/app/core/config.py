@@ -1,8 +1,8 @@
 """
 Core configuration for Store Feedback System
 """
-from pydantic_settings import BaseSettings
-from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import cache
 from pathlib import Path
 import os
 
@@ -20,6 +20,15 @@ def find_env_file():
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
+    # Frozen: one shared, read-only instance per process (see get_settings)
+    model_config = SettingsConfigDict(
+        env_file=find_env_file(),
+        env_file_encoding='utf-8',
+        case_sensitive=True,
+        extra='ignore',  # Ignore extra fields in .env
+        frozen=True,
+    )
+    
     # Application
     APP_NAME: str = "Store Feedback System"
     DEBUG: bool = False
@@ -28,25 +37,50 @@ class Settings(BaseSettings):
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    WORKERS: int = os.cpu_count() or 1  # Ignored when DEBUG (auto-reload)
     
     # MongoDB
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "store_feedback"
+    MONGODB_MAX_POOL_SIZE: int = 100  # Total across WORKERS processes
+    MONGODB_MIN_POOL_SIZE: int = 10  # Total across WORKERS processes
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 3000
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 2000
+    MONGODB_COMPRESSORS: str = "zstd,zlib"  # Wire compression, first supported wins
     
     # JWT Authentication
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
+    BCRYPT_ROUNDS: int = 12  # Cost of new password hashes; lower only for tests
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
+    AUTH_CACHE_TTL_SECONDS: int = 30  # Verified-token cache; 0 disables it
+    AUTH_CACHE_MAXSIZE: int = 10_000  # Distinct tokens kept per worker process
+    USER_CACHE_TTL_SECONDS: int = 60  # User documents looked up for new tokens; 0 disables it
     
     # File Storage
     UPLOAD_DIR: str = "./uploads"  # Default to local uploads directory
     MAX_FILE_SIZE_MB: int = 50
-    ALLOWED_EXTENSIONS: set = {".mp3", ".mp4", ".m4a", ".wav", ".webm", ".ogg", ".flac", ".aac", ".mpeg", ".mpga"}
+    UPLOAD_FSYNC: bool = True  # fdatasync each upload once before it is recorded
+    ALLOWED_EXTENSIONS: frozenset = frozenset({".mp3", ".mp4", ".m4a", ".wav", ".webm", ".ogg", ".flac", ".aac", ".mpeg", ".mpga"})
+    # Internal Nginx location aliased to UPLOAD_DIR (e.g. "/internal-uploads/").
+    # When set, audio downloads are served by Nginx via X-Accel-Redirect.
+    MEDIA_ACCEL_REDIRECT_PREFIX: str = ""
+    # Mount /media on the app (local dev); disable where Nginx serves UPLOAD_DIR
+    SERVE_MEDIA: bool = True
     
     # Whisper Transcription
     WHISPER_CLI_PATH: str = os.path.expanduser("~/whisper.cpp/build/bin/whisper-cli")
     WHISPER_MODEL_PATH: str = os.path.expanduser("~/whisper.cpp/models/ggml-medium.bin")
     WHISPER_LANGUAGE: str = "hi"  # Hindi
+    # Beam search width; 1 (greedy) decodes several times faster on short clips.
+    # Quantized models (e.g. ggml-medium-q5_0.bin) also cut load and decode time
+    WHISPER_BEAM_SIZE: int = 5
+    # "cli": ffmpeg + whisper-cli subprocesses; "faster-whisper": in-process PyAV
+    # decode and CTranslate2 inference (pip install -r requirements-faster-whisper.txt)
+    WHISPER_BACKEND: str = "cli"
+    FASTER_WHISPER_MODEL: str = "medium"  # Model size or path to a CTranslate2 model directory
+    WHISPER_COMPUTE_TYPE: str = "int8"  # CTranslate2 quantization (int8 uses VNNI/AVX2 int8 kernels)
+    WHISPER_THREADS: int = 0  # CPU threads per model, 0 = CTranslate2 default
     
     # Qwen3 LLM API
     QWEN_API_URL: str = "https://kwen.tarsyer.com/v1/chat/completions"
@@ -55,20 +89,19 @@ class Settings(BaseSettings):
     QWEN_MAX_TOKENS: int = 1000
     
     # Background Processing
-    PROCESS_INTERVAL_SECONDS: int = 30
-    MAX_CONCURRENT_TRANSCRIPTIONS: int = 2
+    BACKGROUND_PROCESSING: bool = False  # Run transcription/analysis loops in one API worker process (Mongo lease)
+    PROCESS_INTERVAL_SECONDS: int = 30  # Poll interval when change streams are unavailable
+    MAX_CONCURRENT_TRANSCRIPTIONS: int = 2  # Also the faster-whisper process count; CPU-bound, keep below the core count
+    MAX_CONCURRENT_ANALYSES: int = 8  # Remote LLM calls, I/O-bound
     
-    # CORS
-    CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173", "https://store-feedback.tarsyer.com"]
+    # Caching
+    DASHBOARD_CACHE_TTL_SECONDS: int = 45
     
-    class Config:
-        env_file = find_env_file()
-        env_file_encoding = 'utf-8'
-        case_sensitive = True
-        extra = 'ignore'  # Ignore extra fields in .env
+    # CORS
+    CORS_ORIGINS: tuple = ("http://localhost:3000", "http://localhost:5173", "https://store-feedback.tarsyer.com")
 
 
-@lru_cache()
+@cache
 def get_settings() -> Settings:
     """Cached settings instance"""
     return Settings()
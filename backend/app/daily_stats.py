@@ -0,0 +1,99 @@
+"""
+Per-day, per-store feedback rollups for the legacy dashboard
+
+Each daily_stats row holds the feedback total plus tone and mention counts
+(completed feedbacks only) for one recorded_date and store_code, so
+/api/v1/dashboard/stats sums a few rows per day instead of scanning every
+feedback in its window. Rows are recomputed rather than incremented, so
+writers only need to say which row they touched.
+"""
+from datetime import UTC, datetime, timedelta
+
+# Dashboard stats cover at most this many days back (the /dashboard/stats `days` limit)
+DAILY_STATS_WINDOW_DAYS = 90
+
+# analysis.<field> list -> daily_stats [{name, count}] list
+DAILY_STATS_MENTIONS = {
+    "products": "top_products",
+    "issues": "top_issues",
+    "actions": "top_actions",
+}
+
+
+def mention_counts(field: str) -> dict:
+    """Expression turning pushed analysis.<field> lists into [{name, count}]"""
+    names = {
+        "$filter": {
+            "input": {"$reduce": {
+                "input": f"${field}",
+                "initialValue": [],
+                "in": {"$concatArrays": [
+                    "$$value",
+                    {"$cond": [{"$isArray": "$$this"}, "$$this", []]}
+                ]}
+            }},
+            "cond": {"$ne": ["$$this", None]}
+        }
+    }
+    return {"$let": {
+        "vars": {"names": names},
+        "in": {"$map": {
+            "input": {"$setUnion": ["$$names", []]},
+            "as": "name",
+            "in": {
+                "name": "$$name",
+                "count": {"$size": {"$filter": {"input": "$$names", "cond": {"$eq": ["$$this", "$$name"]}}}}
+            }
+        }}
+    }}
+
+
+async def refresh_daily_stats(db, match: dict):
+    """Recompute the daily_stats rows covering the feedbacks matching `match`"""
+    refreshed_at = datetime.now(UTC)
+    completed = {"$eq": ["$status", "completed"]}
+    cursor = await db.feedbacks.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"recorded_date": "$recorded_date", "store_code": "$store_code"},
+            "total": {"$sum": 1},
+            # tone is a scalar: wrap it so mention_counts sees a list like the others
+            "tones": {"$push": {"$cond": [completed, ["$analysis.tone"], None]}},
+            **{
+                field: {"$push": {"$cond": [completed, f"$analysis.{field}", None]}}
+                for field in DAILY_STATS_MENTIONS
+            }
+        }},
+        {"$project": {
+            "_id": 0,
+            "recorded_date": "$_id.recorded_date",
+            "store_code": "$_id.store_code",
+            "total": 1,
+            "tone_distribution": mention_counts("tones"),
+            **{target: mention_counts(field) for field, target in DAILY_STATS_MENTIONS.items()},
+            "refreshed_at": {"$literal": refreshed_at}
+        }},
+        {"$merge": {
+            "into": "daily_stats",
+            "on": ["recorded_date", "store_code"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ])
+    await cursor.to_list(length=None)
+    return refreshed_at
+
+
+async def refresh_daily_stats_for(db, recorded_date: str, store_code: str):
+    """Recompute the single daily_stats row a feedback write touched"""
+    await refresh_daily_stats(db, {"recorded_date": recorded_date, "store_code": store_code})
+
+
+async def rebuild_daily_stats(db):
+    """Recompute every daily_stats row the dashboard can ask for (one-off backfill)"""
+    since = (datetime.now(UTC).date() - timedelta(days=DAILY_STATS_WINDOW_DAYS)).isoformat()
+    refreshed_at = await refresh_daily_stats(db, {"recorded_date": {"$gte": since}})
+    await db.daily_stats.delete_many({
+        "recorded_date": {"$gte": since},
+        "refreshed_at": {"$lt": refreshed_at}
+    })
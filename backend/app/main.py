@@ -3,24 +3,37 @@
 Store Feedback API - Main Application with JWT Authentication
 Handles audio/video uploads, transcription, AI analysis, and dashboard data
 """
+import asyncio
+import functools
+import hashlib
 import os
+import time
 import uuid
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
 from typing import Optional, List
 from contextlib import asynccontextmanager
 from pathlib import Path
 
+import aiofiles
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient, ReturnDocument, UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import PyMongoError
 from bson import ObjectId
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import jwt
+from jwt import PyJWTError
+import bcrypt
+
+from app.daily_stats import DAILY_STATS_WINDOW_DAYS, rebuild_daily_stats, refresh_daily_stats, refresh_daily_stats_for
+from app.media_files import MediaFiles
+from app.startup_jobs import run_once
 
 # Load environment variables from .env file
 load_dotenv()
@@ -28,39 +41,111 @@ load_dotenv()
 # Configuration
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "store_feedback")
+# uvicorn --workers runs one client per process; by default the pools split a
+# 100-connection (10 idle) budget between them
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", str(max(100 // WEB_CONCURRENCY, 10))))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", str(max(10 // WEB_CONCURRENCY, 1))))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,zlib")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/data/uploads")
 BASE_URL = os.getenv("BASE_URL", "https://store-feedback.tarsyer.com")
+# Comma-separated list of browser origins allowed to call the API
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv(
+        "CORS_ORIGINS",
+        "https://store-feedback.tarsyer.com,http://localhost:3000,http://localhost:5173"
+    ).split(",")
+    if origin.strip()
+]
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+UPLOAD_FSYNC = os.getenv("UPLOAD_FSYNC", "true").lower() == "true"
+# Serve /media from the app (local dev); set to false where Nginx serves it
+SERVE_MEDIA = os.getenv("SERVE_MEDIA", "true").lower() == "true"
+# A transcription claim older than this is treated as abandoned and handed out again
+CLAIM_TIMEOUT_SECONDS = int(os.getenv("CLAIM_TIMEOUT_SECONDS", "1800"))
+# How often a watch stream at its in-flight limit checks for finished jobs
+STREAM_CAPACITY_POLL_SECONDS = 1.0
+# Accepted uploads: top-level MIME type and file extension
+ALLOWED_MEDIA_TYPES = frozenset(("audio", "video"))
+ALLOWED_MEDIA_EXTENSIONS = frozenset((
+    ".mp3", ".mp4", ".m4a", ".wav", ".webm", ".ogg", ".oga", ".opus",
+    ".flac", ".aac", ".mpeg", ".mpga", ".mov", ".3gp"
+))
 
 # JWT Configuration
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "480"))
+# Cost of new password hashes; lower only for tests
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Verified-token cache lifetime; bounds how long role changes take to apply (0 disables)
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAXSIZE = int(os.getenv("AUTH_CACHE_MAXSIZE", "10000"))
+# User documents looked up for newly seen tokens (0 disables)
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# Dashboard stats cache: served fresh for STATS_CACHE_TTL seconds, then served
+# stale for up to STATS_CACHE_STALE more seconds while a refresh runs
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "30"))
+STATS_CACHE_STALE = int(os.getenv("STATS_CACHE_STALE", "60"))
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # MongoDB client
-db_client: Optional[AsyncIOMotorClient] = None
+db_client: Optional[AsyncMongoClient] = None
+db_handle: Optional[AsyncDatabase] = None  # db_client[DB_NAME], built once per process
+
+# (days, store_code) -> (computed_at, DashboardStats-shaped dict)
+stats_cache = TTLCache(maxsize=128, ttl=STATS_CACHE_TTL + STATS_CACHE_STALE)
+stats_refreshes: dict = {}  # in-flight background refresh tasks by cache key
+stats_generation = 0  # bumped on every feedback write
 
 # Auth setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+# SHA-256 of verified bearer tokens -> (user document, token expiry timestamp)
+auth_cache = TTLCache(maxsize=AUTH_CACHE_MAXSIZE, ttl=max(AUTH_CACHE_TTL_SECONDS, 1))
+# username -> user document, shared by all of a user's tokens
+user_cache = TTLCache(maxsize=5_000, ttl=max(USER_CACHE_TTL_SECONDS, 1))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle - DB connections"""
-    global db_client
-    db_client = AsyncIOMotorClient(MONGO_URI)
+    global db_client, db_handle
+    db_client = AsyncMongoClient(
+        MONGO_URI,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        compressors=MONGO_COMPRESSORS,
+    )
+    # Connect now (handshake, minPoolSize warm-up) instead of on the first request
+    await db_client.admin.command("ping")
+    db_handle = db = db_client[DB_NAME]
     # Create indexes
-    db = db_client[DB_NAME]
     await db.feedbacks.create_index([("store_code", 1), ("recorded_date", -1)])
     await db.feedbacks.create_index([("created_at", -1)])
-    await db.feedbacks.create_index([("status", 1)])
+    # The (status, created_at) index below also serves status-only lookups
+    if "status_1" in await db.feedbacks.index_information():
+        await db.feedbacks.drop_index("status_1")
+    # Oldest-first pending polls and claims by the transcription worker
+    await db.feedbacks.create_index([("status", 1), ("created_at", 1)])
+    # Dashboard $match: recorded_date range, optional store_code, status for the completed-only facets
+    await db.feedbacks.create_index([("recorded_date", -1), ("store_code", 1), ("status", 1)])
     await db.users.create_index([("username", 1)], unique=True)
+    await db.daily_stats.create_index([("recorded_date", 1), ("store_code", 1)], unique=True)
+    await run_once(db, "backfill_store_counters", lambda: backfill_store_counters(db))
+    # Full backfill once per deployment, not per worker; writes refresh their rows after
+    await run_once(db, "rebuild_daily_stats", lambda: rebuild_daily_stats(db))
     print("✓ Connected to MongoDB")
     yield
-    db_client.close()
+    db_handle = None
+    await db_client.close()
     print("✓ Disconnected from MongoDB")
 
 
@@ -68,26 +153,33 @@ app = FastAPI(
     title="Store Feedback API",
     description="API for collecting and analyzing retail store staff feedback",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS for PWA
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure for production
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=600,  # Cache preflight requests for 10 minutes
 )
 
 # Serve uploaded media files
-app.mount("/media", StaticFiles(directory=UPLOAD_DIR), name="media")
+if SERVE_MEDIA:
+    app.mount("/media", MediaFiles(directory=UPLOAD_DIR), name="media")
 
 
 # ============ Pydantic Models ============
 
+# Shared by the model field and the form/query params; pydantic compiles it once
+STORE_CODE_PATTERN = r'^W\d{3}$'
+
+
 class StoreInfo(BaseModel):
-    store_code: str = Field(..., pattern=r'^W\d{3}$', description="Store code in WXXX format")
+    store_code: str = Field(..., pattern=STORE_CODE_PATTERN, description="Store code in WXXX format")
     store_name: Optional[str] = None
 
 
@@ -101,6 +193,16 @@ class AnalysisResult(BaseModel):
     keywords: List[str] = []
 
 
+class AnalysisUpdate(BaseModel):
+    id: str
+    analysis: AnalysisResult
+
+
+class ErrorUpdate(BaseModel):
+    id: str
+    error_message: str
+
+
 class FeedbackCreate(BaseModel):
     store_code: str
     recorded_date: str  # YYYY-MM-DD
@@ -122,9 +224,6 @@ class FeedbackResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        json_encoders = {ObjectId: str}
-
 
 class DashboardStats(BaseModel):
     total_feedbacks: int
@@ -146,28 +245,48 @@ class LoginRequest(BaseModel):
     password: str
 
 
+# ============ Database ============
+
+def get_db() -> AsyncDatabase:
+    return db_handle
+
+
+async def get_database() -> AsyncDatabase:
+    """FastAPI dependency for the shared database handle"""
+    return db_handle
+
+
 # ============ Auth Helper Functions ============
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    except ValueError:  # missing or malformed hash
+        return False
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in a worker thread so bcrypt doesn't block the event loop"""
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
 
+    # exp as epoch seconds, which is what the JWT carries anyway
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time() + expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = int(time.time()) + ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
-    to_encode.update({"exp": expire})
+    to_encode["exp"] = expire
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
@@ -177,17 +296,29 @@ async def get_user_by_username(db, username: str) -> Optional[dict]:
     return await db.users.find_one({"username": username})
 
 
+async def get_cached_user(db, username: str) -> Optional[dict]:
+    """get_user_by_username behind user_cache (unknown usernames are not cached)"""
+    if USER_CACHE_TTL_SECONDS <= 0:
+        return await get_user_by_username(db, username)
+    user = user_cache.get(username)
+    if user is None:
+        user = await get_user_by_username(db, username)
+        if user is not None:
+            user_cache[username] = user
+    return user
+
+
 async def authenticate_user(db, username: str, password: str) -> Optional[dict]:
     """Authenticate user with username and password"""
     user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.get("password_hash", "")):
+    if not await verify_password_async(password, user.get("password_hash", "")):
         return None
     return user
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get_database)) -> dict:
     """Get current user from JWT token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -195,20 +326,30 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    db = get_db()
+    # Cache hit skips the JWT decode and the user lookup
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = auth_cache.get(cache_key) if AUTH_CACHE_TTL_SECONDS > 0 else None
+    if cached is not None:
+        user, expires_at = cached
+        if expires_at > time.time():
+            return user
+        auth_cache.pop(cache_key, None)
+        raise credentials_exception
 
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+    except PyJWTError:
         raise credentials_exception
 
-    user = await get_user_by_username(db, username)
+    user = await get_cached_user(db, username)
     if user is None:
         raise credentials_exception
 
+    if AUTH_CACHE_TTL_SECONDS > 0:
+        auth_cache[cache_key] = (user, payload.get("exp", float("inf")))
     return user
 
 
@@ -239,8 +380,127 @@ require_admin = require_role(["admin"])
 
 # ============ Helper Functions ============
 
-def get_db():
-    return db_client[DB_NAME]
+def invalidate_stats_cache():
+    """Drop cached dashboard stats after a feedback is created or updated"""
+    global stats_generation
+    stats_generation += 1
+    stats_cache.clear()
+
+
+async def backfill_store_counters(db):
+    """
+    Recompute each store's feedback_count / last_feedback (store_counters, keyed
+    by store code) from the feedbacks. Run once; upload_feedback keeps the
+    counters current afterwards.
+    """
+    cursor = await db.feedbacks.aggregate([
+        {"$group": {
+            "_id": "$store_code",
+            "feedback_count": {"$sum": 1},
+            "last_feedback": {"$max": "$created_at"}
+        }},
+        {"$merge": {"into": "store_counters", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ])
+    await cursor.to_list(length=None)
+
+
+async def claim_feedback(
+    db, status: str, claimed_status: str, feedback_id: Optional[ObjectId] = None
+) -> Optional[dict]:
+    """
+    Atomically move the oldest feedback in `status` (or the given one) to
+    `claimed_status`, so concurrent workers never get the same job.
+    """
+    now = datetime.now(UTC)
+    query = {"$or": [
+        {"status": status},
+        {"status": claimed_status, "claimed_at": {"$lt": now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)}},
+    ]}
+    if feedback_id is not None:
+        query["_id"] = feedback_id
+    return await db.feedbacks.find_one_and_update(
+        query,
+        {"$set": {"status": claimed_status, "claimed_at": now, "updated_at": now}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def stream_claimed_feedbacks(
+    db, status: str, claimed_status: str, change_match: dict, max_in_flight: int
+) -> StreamingResponse:
+    """
+    NDJSON stream of feedbacks claimed from `status`: the current backlog,
+    then each feedback a change stream reports entering `status`.
+    At most `max_in_flight` of the stream's feedbacks are claimed and not yet
+    finished at once, so jobs the worker can't start yet stay unclaimed for
+    other workers instead of waiting in socket buffers.
+    Needs a replica set for change streams; without one the stream ends
+    after the backlog and the worker falls back to polling.
+    """
+    in_flight = set()
+
+    async def claim(feedback_id: Optional[ObjectId] = None) -> Optional[dict]:
+        # Wait until the worker has finished (moved out of claimed_status) enough jobs
+        while len(in_flight) >= max_in_flight:
+            in_flight.intersection_update(await db.feedbacks.distinct(
+                "_id", {"_id": {"$in": list(in_flight)}, "status": claimed_status}
+            ))
+            if len(in_flight) >= max_in_flight:
+                await asyncio.sleep(STREAM_CAPACITY_POLL_SECONDS)
+        doc = await claim_feedback(db, status, claimed_status, feedback_id)
+        if doc:
+            in_flight.add(doc["_id"])
+            invalidate_stats_cache()
+        return doc
+
+    async def generate():
+        stream = None
+        try:
+            # Open the stream before reading the backlog so no change falls in between
+            stream = await db.feedbacks.watch([{"$match": change_match}])
+        except PyMongoError as e:
+            print(f"⚠ Change stream unavailable, workers will poll: {e}")
+
+        try:
+            while doc := await claim():
+                yield orjson.dumps(serialize_feedback(doc)) + b"\n"
+
+            if stream is not None:
+                async for change in stream:
+                    # Another worker may have claimed it already
+                    doc = await claim(change["documentKey"]["_id"])
+                    if doc:
+                        yield orjson.dumps(serialize_feedback(doc)) + b"\n"
+        finally:
+            if stream is not None:
+                await stream.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+# Leading bytes of the audio/video containers we accept
+MEDIA_MAGIC_PREFIXES = (
+    b"\x1a\x45\xdf\xa3",  # WebM / Matroska
+    b"OggS",              # Ogg (Opus, Vorbis)
+    b"fLaC",              # FLAC
+    b"ID3",               # MP3 with ID3 tag
+    b"\x00\x00\x01\xba",  # MPEG program stream
+)
+# Box types found at offset 4 of MP4 / M4A / MOV / 3GP files
+MEDIA_ISO_BOXES = frozenset((b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"))
+
+
+def looks_like_media(head: bytes) -> bool:
+    """Check the first bytes of an upload against known audio/video signatures"""
+    if head.startswith(MEDIA_MAGIC_PREFIXES):
+        return True
+    if head[:4] == b"RIFF" and head[8:12] in (b"WAVE", b"AVI "):
+        return True
+    if head[4:8] in MEDIA_ISO_BOXES:
+        return True
+    # Bare MPEG audio frame or ADTS AAC: 11-bit frame sync
+    return len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
 
 
 def serialize_feedback(doc: dict) -> dict:
@@ -254,6 +514,7 @@ def serialize_feedback(doc: dict) -> dict:
         "media_url": doc.get("media_url"),
         "media_type": doc.get("media_type"),
         "transcription": doc.get("transcription"),
+        "transcription_partial": doc.get("transcription_partial"),  # while transcribing
         "analysis": doc.get("analysis"),
         "status": doc.get("status", "pending"),
         "error_message": doc.get("error_message"),
@@ -262,20 +523,64 @@ def serialize_feedback(doc: dict) -> dict:
     }
 
 
+# Exactly the fields serialize_feedback reads; skips notes, media_filename, etc.
+FEEDBACK_PROJECTION = {
+    "store_code": 1,
+    "store_name": 1,
+    "recorded_date": 1,
+    "recorded_time": 1,
+    "media_url": 1,
+    "media_type": 1,
+    "transcription": 1,
+    "transcription_partial": 1,
+    "analysis": 1,
+    "status": 1,
+    "error_message": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+# serialize_feedback as a $project stage, so list endpoints get response-shaped
+# documents straight from MongoDB (missing fields become null, like .get())
+FEEDBACK_RESPONSE_STAGE = {
+    "$project": {
+        "_id": 0,
+        "id": {"$toString": "$_id"},
+        **{field: {"$ifNull": [f"${field}", None]} for field in FEEDBACK_PROJECTION},
+        "recorded_time": {"$ifNull": ["$recorded_time", ""]},
+        "status": {"$ifNull": ["$status", "pending"]},
+    }
+}
+
+# List cards only show tone and summary: same shape, but the transcription and
+# the rest of the analysis never leave MongoDB
+FEEDBACK_SUMMARY_STAGE = {
+    "$project": {
+        **FEEDBACK_RESPONSE_STAGE["$project"],
+        "transcription": {"$literal": None},
+        "transcription_partial": {"$literal": None},
+        "analysis": {"$cond": [
+            {"$eq": [{"$type": "$analysis"}, "object"]},
+            {"tone": "$analysis.tone", "summary": "$analysis.summary"},
+            None
+        ]},
+    }
+}
+
+
 # ============ API Endpoints ============
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    return {"status": "healthy", "timestamp": datetime.now(UTC).isoformat()}
 
 
 # ============ Authentication Endpoints ============
 
 @app.post("/api/v1/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_database)):
     """Login with username and password (form data)"""
-    db = get_db()
     user = await authenticate_user(db, form_data.username, form_data.password)
 
     if not user:
@@ -300,9 +605,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 
 @app.post("/api/v1/auth/login/json", response_model=Token)
-async def login_json(login_data: LoginRequest):
+async def login_json(login_data: LoginRequest, db = Depends(get_database)):
     """Login with JSON body (for web/mobile apps)"""
-    db = get_db()
     user = await authenticate_user(db, login_data.username, login_data.password)
 
     if not user:
@@ -338,55 +642,71 @@ async def get_current_user_info(current_user: dict = Depends(get_current_active_
 
 # ============ Feedback Endpoints ============
 
-@app.post("/api/v1/feedback", response_model=FeedbackResponse)
+@app.post(
+    "/api/v1/feedback",
+    status_code=status.HTTP_201_CREATED,
+    response_model=None,
+    responses={201: {"model": FeedbackResponse}}
+)
 async def upload_feedback(
-    store_code: str = Form(..., pattern=r'^W\d{3}$'),
+    store_code: str = Form(..., pattern=STORE_CODE_PATTERN),
     recorded_date: str = Form(...),  # YYYY-MM-DD
     notes: Optional[str] = Form(None),
-    media: UploadFile = File(...)
+    media: UploadFile = File(...),
+    db = Depends(get_database)
 ):
     """
     Upload a new feedback recording from store staff.
     Accepts audio/video files and queues for transcription.
     """
-    db = get_db()
-
     # Validate file type
-    allowed_types = {
-        'audio/mpeg', 'audio/mp3', 'audio/mp4', 'audio/wav', 'audio/webm',
-        'audio/ogg', 'audio/flac', 'audio/aac', 'audio/m4a',
-        'video/mp4', 'video/webm', 'video/quicktime'
-    }
+    media_type = (media.content_type or "").split("/", 1)[0]
+    if media_type not in ALLOWED_MEDIA_TYPES:
+        raise HTTPException(400, "Invalid file type. Only audio/video files allowed.")
+
+    ext = os.path.splitext(media.filename or "")[1].lower() or '.mp3'
+    if ext not in ALLOWED_MEDIA_EXTENSIONS:
+        raise HTTPException(400, f"Invalid file extension: {ext}")
 
-    content_type = media.content_type or ""
-    if not any(t in content_type for t in ['audio', 'video']):
+    # Sniff the first chunk so spoofed content types are rejected before anything is written
+    first_chunk = await media.read(UPLOAD_CHUNK_SIZE)
+    if not looks_like_media(first_chunk):
         raise HTTPException(400, "Invalid file type. Only audio/video files allowed.")
 
     # Generate unique filename
-    ext = os.path.splitext(media.filename)[1] or '.mp3'
     unique_id = uuid.uuid4().hex[:12]
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    timestamp = datetime.now(UTC).strftime("%Y%m%d_%H%M%S")
     filename = f"{store_code}_{timestamp}_{unique_id}{ext}"
     filepath = os.path.join(UPLOAD_DIR, filename)
 
-    # Save file
+    # Save file in chunks so memory stays flat regardless of upload size
+    file_size = len(first_chunk)
     try:
-        content = await media.read()
-        with open(filepath, "wb") as f:
-            f.write(content)
+        async with aiofiles.open(filepath, "wb") as f:
+            await f.write(first_chunk)
+            while chunk := await media.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                await f.write(chunk)
+            if UPLOAD_FSYNC:
+                # One sync per file, off the event loop, before the DB record points at it
+                await f.flush()
+                await asyncio.to_thread(os.fdatasync, f.fileno())
     except Exception as e:
+        if os.path.exists(filepath):
+            os.remove(filepath)
         raise HTTPException(500, f"Failed to save file: {str(e)}")
 
     # Create feedback document
-    now = datetime.utcnow()
+    now = datetime.now(UTC)
     feedback_doc = {
         "store_code": store_code.upper(),
         "store_name": None,  # Can be enriched from store master
         "recorded_date": recorded_date,
-        "recorded_time": now.strftime("%H:%M:%S"),
+        "recorded_time": now.time().isoformat(timespec="seconds"),
         "media_filename": filename,
         "media_url": f"{BASE_URL}/media/{filename}",
-        "media_type": "audio" if "audio" in content_type else "video",
+        "media_type": media_type,
+        "file_size_bytes": file_size,
         "notes": notes,
         "transcription": None,
         "analysis": None,
@@ -398,38 +718,43 @@ async def upload_feedback(
 
     result = await db.feedbacks.insert_one(feedback_doc)
     feedback_doc["_id"] = result.inserted_id
+    await db.store_counters.update_one(
+        {"_id": feedback_doc["store_code"]},
+        {"$inc": {"feedback_count": 1}, "$max": {"last_feedback": now}},
+        upsert=True
+    )
+    await refresh_daily_stats_for(db, recorded_date, feedback_doc["store_code"])
+    invalidate_stats_cache()
 
     return serialize_feedback(feedback_doc)
 
 
-@app.get("/api/v1/feedback/{feedback_id}", response_model=FeedbackResponse)
-async def get_feedback(feedback_id: str):
+@app.get("/api/v1/feedback/{feedback_id}", response_model=None, responses={200: {"model": FeedbackResponse}})
+async def get_feedback(feedback_id: str, db = Depends(get_database)):
     """Get a specific feedback by ID"""
-    db = get_db()
-
-    try:
-        doc = await db.feedbacks.find_one({"_id": ObjectId(feedback_id)})
-    except:
+    if not ObjectId.is_valid(feedback_id):
         raise HTTPException(400, "Invalid feedback ID")
 
+    doc = await db.feedbacks.find_one({"_id": ObjectId(feedback_id)}, FEEDBACK_PROJECTION)
+
     if not doc:
         raise HTTPException(404, "Feedback not found")
 
     return serialize_feedback(doc)
 
 
-@app.get("/api/v1/feedbacks", response_model=List[FeedbackResponse])
+@app.get("/api/v1/feedbacks", response_model=None, responses={200: {"model": List[FeedbackResponse]}})
 async def list_feedbacks(
-    store_code: Optional[str] = Query(None, pattern=r'^W\d{3}$'),
+    store_code: Optional[str] = Query(None, pattern=STORE_CODE_PATTERN),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     limit: int = Query(50, le=200),
-    skip: int = Query(0)
+    skip: int = Query(0),
+    summary: bool = Query(False, description="Return list-card fields only (no transcription, tone/summary analysis)"),
+    db = Depends(get_database)
 ):
     """List feedbacks with optional filters"""
-    db = get_db()
-
     query = {}
     if store_code:
         query["store_code"] = store_code.upper()
@@ -444,26 +769,23 @@ async def list_feedbacks(
         if date_query:
             query["recorded_date"] = date_query
 
-    cursor = db.feedbacks.find(query).sort("created_at", -1).skip(skip).limit(limit)
-    docs = await cursor.to_list(length=limit)
-
-    return [serialize_feedback(doc) for doc in docs]
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"created_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        FEEDBACK_SUMMARY_STAGE if summary else FEEDBACK_RESPONSE_STAGE
+    ]
+    cursor = await db.feedbacks.aggregate(pipeline)
+    return await cursor.to_list(length=limit)
 
 
-@app.get("/api/v1/dashboard/stats", response_model=DashboardStats)
-async def get_dashboard_stats(
-    days: int = Query(15, le=90),
-    store_code: Optional[str] = Query(None),
-    current_user: dict = Depends(require_manager)
-):
-    """
-    Get dashboard statistics for the last N days.
-    Requires manager or admin role.
-    """
+async def compute_dashboard_stats(days: int, store_code: Optional[str]) -> dict:
+    """Aggregate dashboard statistics for the last N days"""
     db = get_db()
 
     # Date range
-    end_date = datetime.utcnow().date()
+    end_date = datetime.now(UTC).date()
     start_date = end_date - timedelta(days=days)
 
     # Base match
@@ -474,117 +796,124 @@ async def get_dashboard_stats(
         }
     }
     if store_code:
-        match_stage["store_code"] = store_code.upper()
-
-    # Total count
-    total = await db.feedbacks.count_documents(match_stage)
-
-    # Feedbacks by day
-    by_day_pipeline = [
-        {"$match": match_stage},
-        {"$group": {
-            "_id": "$recorded_date",
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"_id": 1}}
-    ]
-    by_day = await db.feedbacks.aggregate(by_day_pipeline).to_list(length=days+1)
-
-    # Feedbacks by store
-    by_store_pipeline = [
+        match_stage["store_code"] = store_code
+
+    def top_items(field: str, limit: Optional[int] = 5) -> list:
+        stages = [
+            {"$unwind": f"${field}"},
+            {"$group": {
+                "_id": f"${field}.name",
+                "count": {"$sum": f"${field}.count"}
+            }},
+            {"$sort": {"count": -1}}
+        ]
+        return stages + [{"$limit": limit}] if limit else stages
+
+    # One pass over the precomputed per-day, per-store rows feeds every dashboard metric
+    pipeline = [
         {"$match": match_stage},
-        {"$group": {
-            "_id": "$store_code",
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"count": -1}},
-        {"$limit": 20}
-    ]
-    by_store = await db.feedbacks.aggregate(by_store_pipeline).to_list(length=20)
-
-    # Tone distribution (only completed feedbacks)
-    tone_match = {**match_stage, "status": "completed", "analysis.tone": {"$exists": True}}
-    tone_pipeline = [
-        {"$match": tone_match},
-        {"$group": {
-            "_id": "$analysis.tone",
-            "count": {"$sum": 1}
+        {"$facet": {
+            "total": [{"$group": {"_id": None, "n": {"$sum": "$total"}}}],
+            # Feedbacks by day
+            "by_day": [
+                {"$group": {
+                    "_id": "$recorded_date",
+                    "count": {"$sum": "$total"}
+                }},
+                {"$sort": {"_id": 1}}
+            ],
+            # Feedbacks by store
+            "by_store": [
+                {"$group": {
+                    "_id": "$store_code",
+                    "count": {"$sum": "$total"}
+                }},
+                {"$sort": {"count": -1}},
+                {"$limit": 20}
+            ],
+            # Tone distribution (only completed feedbacks)
+            "tone": top_items("tone_distribution", limit=None),
+            "top_products": top_items("top_products"),
+            "top_issues": top_items("top_issues"),
+            "top_actions": top_items("top_actions"),
         }}
     ]
-    tone_results = await db.feedbacks.aggregate(tone_pipeline).to_list(length=10)
-    tone_dist = {item["_id"]: item["count"] for item in tone_results}
+    cursor = await db.daily_stats.aggregate(pipeline)
+    results = await cursor.to_list(length=1)
+    facets = results[0]
+
+    total = facets["total"][0]["n"] if facets["total"] else 0
+    by_day = facets["by_day"]
+    by_store = facets["by_store"]
+    tone_dist = {item["_id"]: item["count"] for item in facets["tone"]}
+    top_products = facets["top_products"]
+    top_issues = facets["top_issues"]
+    top_actions = facets["top_actions"]
 
-    # Top products
-    products_pipeline = [
-        {"$match": {**match_stage, "status": "completed"}},
-        {"$unwind": "$analysis.products"},
-        {"$group": {
-            "_id": "$analysis.products",
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
-    ]
-    top_products = await db.feedbacks.aggregate(products_pipeline).to_list(length=5)
+    return {
+        "total_feedbacks": total,
+        "feedbacks_by_day": [{"date": d["_id"], "count": d["count"]} for d in by_day],
+        "feedbacks_by_store": [{"store": s["_id"], "count": s["count"]} for s in by_store],
+        "tone_distribution": tone_dist,
+        "top_products": [{"name": p["_id"], "count": p["count"]} for p in top_products],
+        "top_issues": [{"name": i["_id"], "count": i["count"]} for i in top_issues],
+        "top_actions": [{"name": a["_id"], "count": a["count"]} for a in top_actions],
+    }
 
-    # Top issues
-    issues_pipeline = [
-        {"$match": {**match_stage, "status": "completed"}},
-        {"$unwind": "$analysis.issues"},
-        {"$group": {
-            "_id": "$analysis.issues",
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
-    ]
-    top_issues = await db.feedbacks.aggregate(issues_pipeline).to_list(length=5)
 
-    # Top actions
-    actions_pipeline = [
-        {"$match": {**match_stage, "status": "completed"}},
-        {"$unwind": "$analysis.actions"},
-        {"$group": {
-            "_id": "$analysis.actions",
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
-    ]
-    top_actions = await db.feedbacks.aggregate(actions_pipeline).to_list(length=5)
-
-    return DashboardStats(
-        total_feedbacks=total,
-        feedbacks_by_day=[{"date": d["_id"], "count": d["count"]} for d in by_day],
-        feedbacks_by_store=[{"store": s["_id"], "count": s["count"]} for s in by_store],
-        tone_distribution=tone_dist,
-        top_products=[{"name": p["_id"], "count": p["count"]} for p in top_products],
-        top_issues=[{"name": i["_id"], "count": i["count"]} for i in top_issues],
-        top_actions=[{"name": a["_id"], "count": a["count"]} for a in top_actions],
-    )
+async def refresh_dashboard_stats(key: tuple) -> dict:
+    """Recompute stats for a cache key and store them unless data changed meanwhile"""
+    generation = stats_generation
+    stats = await compute_dashboard_stats(*key)
+    if generation == stats_generation:
+        stats_cache[key] = (time.monotonic(), stats)
+    return stats
 
 
-@app.get("/api/v1/stores")
-async def list_stores(current_user: dict = Depends(require_manager)):
-    """Get list of all stores (requires manager role)"""
-    db = get_db()
+def stats_refresh_done(key: tuple, task: asyncio.Task):
+    """Clear a finished background refresh and report its failure, if any"""
+    stats_refreshes.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        # The stale entry stays until it expires; the next request retries
+        print(f"⚠ Dashboard stats refresh failed for {key}: {task.exception()!r}")
 
-    pipeline = [
-        {"$group": {
-            "_id": "$store_code",
-            "feedback_count": {"$sum": 1},
-            "last_feedback": {"$max": "$created_at"}
-        }},
-        {"$sort": {"_id": 1}}
-    ]
 
-    stores = await db.feedbacks.aggregate(pipeline).to_list(length=500)
+@app.get("/api/v1/dashboard/stats", response_model=None, responses={200: {"model": DashboardStats}})
+async def get_dashboard_stats(
+    days: int = Query(15, le=DAILY_STATS_WINDOW_DAYS),
+    store_code: Optional[str] = Query(None),
+    current_user: dict = Depends(require_manager)
+):
+    """
+    Get dashboard statistics for the last N days.
+    Requires manager or admin role.
+    """
+    key = (days, store_code.upper() if store_code else None)
+    cached = stats_cache.get(key)
+    if cached is None:
+        return await refresh_dashboard_stats(key)
+
+    computed_at, stats = cached
+    if time.monotonic() - computed_at > STATS_CACHE_TTL and key not in stats_refreshes:
+        # Stale: answer now, refresh in the background
+        task = asyncio.create_task(refresh_dashboard_stats(key))
+        stats_refreshes[key] = task
+        task.add_done_callback(functools.partial(stats_refresh_done, key))
+    return stats
+
+
+@app.get("/api/v1/stores", response_model=None)
+async def list_stores(current_user: dict = Depends(require_manager), db = Depends(get_database)):
+    """Get list of all stores (requires manager role)"""
+    # Counters are maintained per store code by upload_feedback
+    cursor = db.store_counters.find({"feedback_count": {"$gt": 0}}).sort("_id", 1)
+    stores = await cursor.to_list(length=500)
 
     return [
         {
             "store_code": s["_id"],
             "feedback_count": s["feedback_count"],
-            "last_feedback": s["last_feedback"].isoformat() if s["last_feedback"] else None
+            "last_feedback": s["last_feedback"].isoformat() if s.get("last_feedback") else None
         }
         for s in stores
     ]
@@ -593,20 +922,75 @@ async def list_stores(current_user: dict = Depends(require_manager)):
 # ============ Internal Endpoints (for worker services) ============
 
 @app.get("/api/internal/pending")
-async def get_pending_feedbacks(limit: int = 10):
+async def get_pending_feedbacks(limit: int = 10, db = Depends(get_database)):
     """Get feedbacks pending transcription (for worker)"""
-    db = get_db()
+    pipeline = [
+        {"$match": {"status": "pending"}},
+        {"$sort": {"created_at": 1}},
+        {"$limit": limit},
+        FEEDBACK_RESPONSE_STAGE
+    ]
+    cursor = await db.feedbacks.aggregate(pipeline)
+    return await cursor.to_list(length=limit)
+
+
+async def claim_feedbacks(db, status: str, claimed_status: str, limit: int) -> List[dict]:
+    """Claim up to `limit` feedbacks from `status`, oldest first"""
+    claimed = []
+    for _ in range(limit):
+        doc = await claim_feedback(db, status, claimed_status)
+        if not doc:
+            break
+        claimed.append(serialize_feedback(doc))
+
+    if claimed:
+        invalidate_stats_cache()
+    return claimed
+
+
+@app.post("/api/internal/claim")
+async def claim_pending_feedbacks(limit: int = 5, db = Depends(get_database)):
+    """Claim up to `limit` pending feedbacks for transcription (for worker)"""
+    return await claim_feedbacks(db, "pending", "transcribing", limit)
 
-    cursor = db.feedbacks.find({"status": "pending"}).limit(limit)
-    docs = await cursor.to_list(length=limit)
 
-    return [serialize_feedback(doc) for doc in docs]
+@app.post("/api/internal/claim-transcribed")
+async def claim_transcribed_feedbacks(limit: int = 5, db = Depends(get_database)):
+    """Claim up to `limit` transcribed feedbacks for analysis (for worker)"""
+    return await claim_feedbacks(db, "transcribed", "analyzing", limit)
+
+
+@app.get("/api/internal/watch-pending")
+async def watch_pending_feedbacks(max_in_flight: int = Query(1, ge=1, le=100), db = Depends(get_database)):
+    """
+    Stream pending feedbacks to the transcription worker as they are uploaded,
+    at most `max_in_flight` (the worker's concurrency) unfinished at once (for worker)
+    """
+    return stream_claimed_feedbacks(
+        db, "pending", "transcribing",
+        {"operationType": "insert", "fullDocument.status": "pending"},
+        max_in_flight
+    )
+
+
+@app.get("/api/internal/watch-transcribed")
+async def watch_transcribed_feedbacks(max_in_flight: int = Query(1, ge=1, le=100), db = Depends(get_database)):
+    """
+    Stream transcribed feedbacks to the analysis worker as they are transcribed,
+    at most `max_in_flight` (the worker's concurrency) unfinished at once (for worker)
+    """
+    return stream_claimed_feedbacks(
+        db, "transcribed", "analyzing",
+        {"operationType": "update", "updateDescription.updatedFields.status": "transcribed"},
+        max_in_flight
+    )
 
 
 @app.patch("/api/internal/feedback/{feedback_id}/transcription")
-async def update_transcription(feedback_id: str, transcription: str = Form(...)):
+async def update_transcription(feedback_id: str, transcription: str = Form(...), db = Depends(get_database)):
     """Update feedback with transcription result"""
-    db = get_db()
+    if not ObjectId.is_valid(feedback_id):
+        raise HTTPException(400, "Invalid feedback ID")
 
     result = await db.feedbacks.update_one(
         {"_id": ObjectId(feedback_id)},
@@ -614,7 +998,7 @@ async def update_transcription(feedback_id: str, transcription: str = Form(...))
             "$set": {
                 "transcription": transcription,
                 "status": "transcribed",
-                "updated_at": datetime.utcnow()
+                "updated_at": datetime.now(UTC)
             }
         }
     )
@@ -622,35 +1006,41 @@ async def update_transcription(feedback_id: str, transcription: str = Form(...))
     if result.matched_count == 0:
         raise HTTPException(404, "Feedback not found")
 
+    invalidate_stats_cache()
     return {"status": "updated"}
 
 
 @app.patch("/api/internal/feedback/{feedback_id}/analysis")
-async def update_analysis(feedback_id: str, analysis: AnalysisResult):
+async def update_analysis(feedback_id: str, analysis: AnalysisResult, db = Depends(get_database)):
     """Update feedback with AI analysis result"""
-    db = get_db()
+    if not ObjectId.is_valid(feedback_id):
+        raise HTTPException(400, "Invalid feedback ID")
 
-    result = await db.feedbacks.update_one(
+    doc = await db.feedbacks.find_one_and_update(
         {"_id": ObjectId(feedback_id)},
         {
             "$set": {
                 "analysis": analysis.model_dump(),
                 "status": "completed",
-                "updated_at": datetime.utcnow()
+                "updated_at": datetime.now(UTC)
             }
-        }
+        },
+        projection={"_id": 0, "recorded_date": 1, "store_code": 1}
     )
 
-    if result.matched_count == 0:
+    if doc is None:
         raise HTTPException(404, "Feedback not found")
 
+    await refresh_daily_stats_for(db, doc.get("recorded_date"), doc.get("store_code"))
+    invalidate_stats_cache()
     return {"status": "updated"}
 
 
 @app.patch("/api/internal/feedback/{feedback_id}/error")
-async def mark_error(feedback_id: str, error_message: str = Form(...)):
+async def mark_error(feedback_id: str, error_message: str = Form(...), db = Depends(get_database)):
     """Mark feedback as errored"""
-    db = get_db()
+    if not ObjectId.is_valid(feedback_id):
+        raise HTTPException(400, "Invalid feedback ID")
 
     result = await db.feedbacks.update_one(
         {"_id": ObjectId(feedback_id)},
@@ -658,7 +1048,7 @@ async def mark_error(feedback_id: str, error_message: str = Form(...)):
             "$set": {
                 "status": "error",
                 "error_message": error_message,
-                "updated_at": datetime.utcnow()
+                "updated_at": datetime.now(UTC)
             }
         }
     )
@@ -666,9 +1056,65 @@ async def mark_error(feedback_id: str, error_message: str = Form(...)):
     if result.matched_count == 0:
         raise HTTPException(404, "Feedback not found")
 
+    invalidate_stats_cache()
     return {"status": "updated"}
 
 
+@app.post("/api/internal/feedback/bulk-analysis")
+async def bulk_update_analysis(updates: List[AnalysisUpdate], db = Depends(get_database)):
+    """Record several AI analysis results in one round trip (for worker)"""
+    analyses = {ObjectId(u.id): u.analysis.model_dump() for u in updates if ObjectId.is_valid(u.id)}
+    if not analyses:
+        return {"updated": 0}
+
+    now = datetime.now(UTC)
+    result = await db.feedbacks.bulk_write([
+        UpdateOne(
+            {"_id": feedback_id},
+            {"$set": {"analysis": analysis, "status": "completed", "updated_at": now}}
+        )
+        for feedback_id, analysis in analyses.items()
+    ], ordered=False)
+
+    # One rollup refresh for every (day, store) row the batch touched
+    cursor = db.feedbacks.find(
+        {"_id": {"$in": list(analyses)}},
+        {"_id": 0, "recorded_date": 1, "store_code": 1}
+    )
+    rows = {(doc.get("recorded_date"), doc.get("store_code")) async for doc in cursor}
+    if rows:
+        await refresh_daily_stats(db, {"$or": [
+            {"recorded_date": recorded_date, "store_code": store_code}
+            for recorded_date, store_code in rows
+        ]})
+
+    invalidate_stats_cache()
+    return {"updated": result.matched_count}
+
+
+@app.post("/api/internal/feedback/bulk-error")
+async def bulk_mark_error(updates: List[ErrorUpdate], db = Depends(get_database)):
+    """Mark several feedbacks as errored in one round trip (for worker)"""
+    errors = {ObjectId(u.id): u.error_message for u in updates if ObjectId.is_valid(u.id)}
+    if not errors:
+        return {"updated": 0}
+
+    now = datetime.now(UTC)
+    result = await db.feedbacks.bulk_write([
+        UpdateOne(
+            {"_id": feedback_id},
+            {"$set": {"status": "error", "error_message": error_message, "updated_at": now}}
+        )
+        for feedback_id, error_message in errors.items()
+    ], ordered=False)
+
+    invalidate_stats_cache()
+    return {"updated": result.matched_count}
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools",
+        timeout_keep_alive=75, backlog=2048
+    )
@@ -0,0 +1,20 @@
+"""
+/media static files with long-lived cache headers
+
+Uploads are written once under a unique (uuid) filename and never modified,
+so browsers and proxies can keep them without revalidating. This only
+matters where the app serves /media itself (SERVE_MEDIA); in production
+Nginx serves the upload directory directly.
+"""
+from starlette.staticfiles import StaticFiles
+
+MEDIA_CACHE_CONTROL = "public, max-age=86400, immutable"
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles adding MEDIA_CACHE_CONTROL to every file it serves"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = MEDIA_CACHE_CONTROL
+        return response
@@ -1,22 +1,37 @@
 """
 Pydantic models for MongoDB collections and API schemas
 """
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
-from datetime import datetime, date
+from pydantic import BaseModel, Field, GetCoreSchemaHandler, GetJsonSchemaHandler
+from pydantic_core import core_schema
+from typing import Any, Optional, List, Dict
+from datetime import UTC, datetime, date
 from enum import Enum
 from bson import ObjectId
 
 
+# Shared validation patterns (single source of truth for models and query params)
+STORE_ID_PATTERN = r'^W\d{3}$'
+TONE_PATTERN = r'^(positive|negative|neutral)$'
+STATUS_FILTER_PATTERN = r'^(pending|completed|failed)$'
+
+
 # Custom ObjectId type for Pydantic
 class PyObjectId(str):
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+    def __get_pydantic_core_schema__(cls, source_type: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.to_string_ser_schema()
+        )
 
     @classmethod
-    def validate(cls, v, info):
-        if isinstance(v, ObjectId):
+    def __get_pydantic_json_schema__(cls, schema: core_schema.CoreSchema, handler: GetJsonSchemaHandler) -> dict:
+        return {"type": "string", "pattern": "^[0-9a-fA-F]{24}$"}
+
+    @staticmethod
+    def validate(v: Any) -> str:
+        # Documents read from MongoDB carry real ObjectIds: one type check, no re-parse
+        if type(v) is ObjectId:
             return str(v)
         if isinstance(v, str) and ObjectId.is_valid(v):
             return v
@@ -46,7 +61,7 @@ class UserRole(str, Enum):
 # ============ Store Models ============
 
 class StoreBase(BaseModel):
-    store_id: str = Field(..., pattern=r'^W\d{3}$', description="Store ID in WXXX format")
+    store_id: str = Field(..., pattern=STORE_ID_PATTERN, description="Store ID in WXXX format")
     store_name: str
     region: Optional[str] = None
     zone: Optional[str] = None
@@ -62,7 +77,6 @@ class Store(StoreBase):
     
     class Config:
         populate_by_name = True
-        json_encoders = {ObjectId: str}
 
 
 # ============ User Models ============
@@ -80,11 +94,10 @@ class UserCreate(UserBase):
 
 class User(UserBase):
     id: Optional[PyObjectId] = Field(default=None, alias="_id")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
     
     class Config:
         populate_by_name = True
-        json_encoders = {ObjectId: str}
 
 
 class UserInDB(User):
@@ -107,7 +120,7 @@ class FeedbackAnalysis(BaseModel):
 # ============ Feedback Models ============
 
 class FeedbackBase(BaseModel):
-    store_id: str = Field(..., pattern=r'^W\d{3}$')
+    store_id: str = Field(..., pattern=STORE_ID_PATTERN)
     feedback_date: date
     notes: Optional[str] = None
 
@@ -123,7 +136,7 @@ class Feedback(FeedbackBase):
     store_name: Optional[str] = None
     
     # Submission info
-    submitted_at: datetime = Field(default_factory=datetime.utcnow)
+    submitted_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
     submitted_by: Optional[str] = None
     
     # Audio file info
@@ -149,7 +162,6 @@ class Feedback(FeedbackBase):
     
     class Config:
         populate_by_name = True
-        json_encoders = {ObjectId: str, date: lambda v: v.isoformat()}
 
 
 class FeedbackListItem(BaseModel):
@@ -163,9 +175,6 @@ class FeedbackListItem(BaseModel):
     summary: Optional[str] = None
     transcription_status: ProcessingStatus
     analysis_status: ProcessingStatus
-    
-    class Config:
-        json_encoders = {date: lambda v: v.isoformat()}
 
 
 # ============ Daily Analytics Models ============
@@ -181,6 +190,7 @@ class DailyAnalytics(BaseModel):
     id: Optional[PyObjectId] = Field(default=None, alias="_id")
     date: date
     store_id: Optional[str] = None  # None for global aggregation
+    store_name: Optional[str] = None
     
     total_feedbacks: int = 0
     tone_breakdown: ToneBreakdown = Field(default_factory=ToneBreakdown)
@@ -189,9 +199,10 @@ class DailyAnalytics(BaseModel):
     issues_mentioned: Dict[str, int] = {}
     actions_suggested: Dict[str, int] = {}
     
+    refreshed_at: Optional[datetime] = None  # last recompute from feedbacks
+    
     class Config:
         populate_by_name = True
-        json_encoders = {ObjectId: str, date: lambda v: v.isoformat()}
 
 
 # ============ Dashboard Response Models ============
@@ -3,18 +3,24 @@
 Store Feedback API - Secure Server with JWT Authentication
 Production-ready FastAPI application with security middleware
 """
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 import secrets
 
 from app.core.config import get_settings, init_directories
+from app.core.compression import MediaAwareGZipMiddleware
+from app.media_files import MediaFiles
 from app.services.database import Database, get_database
+from app.services.analytics import rebuild_daily_analytics
+from app.startup_jobs import run_once
+from app.services.llm_analysis import LLMAnalysisService
+from app.services.background import start_background_processing
+from app.services.transcription import TranscriptionService
 from app.api import auth, feedback, dashboard, stores
 
 settings = get_settings()
@@ -26,10 +32,22 @@ async def lifespan(app: FastAPI):
     # Startup
     await Database.connect()
     init_directories()
+    try:
+        # Full backfill once per deployment, not per worker; writes refresh their rows after
+        db = Database.get_db()
+        await run_once(db, "rebuild_daily_analytics", lambda: rebuild_daily_analytics(db))
+    except Exception as e:
+        print(f"⚠ Daily analytics rebuild failed: {e}")
+    background_tasks = start_background_processing() if settings.BACKGROUND_PROCESSING else []
     print(f"✓ {settings.APP_NAME} started successfully")
     print(f"✓ API available at: {settings.API_V1_PREFIX}")
     yield
     # Shutdown
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await LLMAnalysisService.close_client()
+    TranscriptionService.shutdown_executor()
     await Database.disconnect()
     print("✓ Application shutdown complete")
 
@@ -40,6 +58,7 @@ app = FastAPI(
     description="Secure API for collecting and analyzing retail store staff feedback",
     version="2.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # orjson encodes large list/summary payloads much faster
     docs_url="/api/docs" if settings.DEBUG else None,  # Disable docs in production
     redoc_url="/api/redoc" if settings.DEBUG else None,
 )
@@ -75,30 +94,20 @@ app.add_middleware(
     https_only=not settings.DEBUG,  # HTTPS only in production
 )
 
-# 4. GZip Middleware - Compress responses
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# 4. GZip Middleware - Compress JSON responses; skips media and small bodies,
+# and a lower level keeps large list payloads from stalling the event loop
+app.add_middleware(MediaAwareGZipMiddleware, minimum_size=4096, compresslevel=4)
 
 
 # ============ Security Headers Middleware ============
 
-@app.middleware("http")
-async def add_security_headers(request, call_next):
-    """Add security headers to all responses"""
-    response = await call_next(request)
-
-    # Security headers for production
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-
-    # Strict Transport Security (HSTS) - only over HTTPS
-    if not settings.DEBUG and request.url.scheme == "https":
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
-
-    # Content Security Policy
-    response.headers["Content-Security-Policy"] = (
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Permissions-Policy": "geolocation=(), microphone=(), camera=()",
+    "Content-Security-Policy": (
         "default-src 'self'; "
         "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
         "style-src 'self' 'unsafe-inline'; "
@@ -109,7 +118,29 @@ async def add_security_headers(request, call_next):
         "frame-ancestors 'none'; "
         "base-uri 'self'; "
         "form-action 'self'"
-    )
+    ),
+}
+HSTS_HEADER = "max-age=31536000; includeSubDomains; preload"
+
+# Pre-encoded once; routes never set these, so they are appended to the raw
+# header list instead of going through MutableHeaders' scan-and-replace
+_SECURITY_HEADERS_RAW = [
+    (name.lower().encode("latin-1"), value.encode("latin-1"))
+    for name, value in SECURITY_HEADERS.items()
+]
+_HSTS_HEADER_RAW = (b"strict-transport-security", HSTS_HEADER.encode("latin-1"))
+
+
+@app.middleware("http")
+async def add_security_headers(request, call_next):
+    """Add security headers to all responses"""
+    response = await call_next(request)
+
+    response.raw_headers.extend(_SECURITY_HEADERS_RAW)
+
+    # Strict Transport Security (HSTS) - only over HTTPS
+    if not settings.DEBUG and request.url.scheme == "https":
+        response.raw_headers.append(_HSTS_HEADER_RAW)
 
     return response
 
@@ -126,10 +157,11 @@ app.include_router(stores.router, prefix=settings.API_V1_PREFIX)
 # ============ Static Files ============
 
 # Serve uploaded media files (authentication handled in routes)
-try:
-    app.mount("/media", StaticFiles(directory=settings.UPLOAD_DIR), name="media")
-except RuntimeError:
-    print(f"⚠ Warning: Upload directory not found: {settings.UPLOAD_DIR}")
+if settings.SERVE_MEDIA:
+    try:
+        app.mount("/media", MediaFiles(directory=settings.UPLOAD_DIR), name="media")
+    except RuntimeError:
+        print(f"⚠ Warning: Upload directory not found: {settings.UPLOAD_DIR}")
 
 
 # ============ Health Check ============
@@ -160,7 +192,7 @@ async def root():
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
     """Custom 404 handler"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={"detail": "Resource not found"}
     )
@@ -169,7 +201,7 @@ async def not_found_handler(request, exc):
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
     """Custom 500 handler"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
     )
@@ -182,6 +214,9 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        workers=None if settings.DEBUG else settings.WORKERS,
+        loop="uvloop",
+        http="httptools",
         log_level="info",
         access_log=True,
         server_header=False,  # Hide server header
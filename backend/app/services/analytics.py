@@ -0,0 +1,182 @@
+"""
+Daily analytics rollups for the dashboard
+
+Completed feedbacks are rolled up per (day, store) into the daily_analytics
+collection, so the dashboard summary reads a handful of rows per day instead
+of every analyzed feedback in the window. Rows are recomputed (not
+incremented) so re-analysis and retries never double count.
+"""
+import logging
+from datetime import UTC, datetime, date, timedelta
+from typing import Iterable, Optional, Tuple
+
+from app.models.schemas import ProcessingStatus, ToneType
+
+logger = logging.getLogger(__name__)
+
+# Rollup rows older than this are never read by the dashboard
+ROLLUP_WINDOW_DAYS = 90
+
+# Tone bucket for a document; missing or unexpected LLM tones count as neutral
+TONE_EXPR = {
+    "$cond": [
+        {"$in": ["$analysis.tone", [ToneType.POSITIVE.value, ToneType.NEGATIVE.value]]},
+        "$analysis.tone",
+        ToneType.NEUTRAL.value
+    ]
+}
+
+# analysis.<field> list -> daily_analytics {name: count} map
+MENTION_FIELDS = {
+    "products": "products_mentioned",
+    "issues": "issues_mentioned",
+    "actions": "actions_suggested",
+}
+
+
+def store_name_lookup(local_field: str = "store_id") -> list:
+    """Stages setting store_name from the stores collection, falling back to the id"""
+    return [
+        {"$lookup": {"from": "stores", "localField": local_field, "foreignField": "store_id", "as": "_store"}},
+        {"$set": {"store_name": {"$ifNull": [{"$first": "$_store.store_name"}, f"${local_field}"]}}},
+        {"$unset": "_store"}
+    ]
+
+
+def _mention_counts(field: str) -> dict:
+    """Expression turning the pushed analysis.<field> lists into a {name: count} map"""
+    names = {
+        "$filter": {
+            "input": {
+                "$map": {
+                    "input": {
+                        "$reduce": {
+                            "input": f"${field}",
+                            "initialValue": [],
+                            "in": {"$concatArrays": ["$$value", {"$ifNull": ["$$this", []]}]}
+                        }
+                    },
+                    "as": "name",
+                    "in": {
+                        "$cond": [
+                            {"$eq": [{"$type": "$$name"}, "string"]},
+                            {"$toLower": {"$trim": {"input": "$$name"}}},
+                            ""
+                        ]
+                    }
+                }
+            },
+            "cond": {"$ne": ["$$this", ""]}
+        }
+    }
+    return {
+        "$let": {
+            "vars": {"names": names},
+            "in": {
+                "$arrayToObject": {
+                    "$map": {
+                        "input": {"$setUnion": ["$$names", []]},
+                        "as": "name",
+                        "in": {
+                            "k": "$$name",
+                            "v": {"$size": {"$filter": {"input": "$$names", "cond": {"$eq": ["$$this", "$$name"]}}}}
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+
+def _rollup_pipeline(match: dict, refreshed_at: datetime) -> list:
+    """Aggregate completed feedbacks matching `match` into daily_analytics rows"""
+    return [
+        {"$match": {**match, "analysis_status": ProcessingStatus.COMPLETED.value}},
+        {
+            "$group": {
+                "_id": {
+                    "date": {"$dateTrunc": {"date": "$feedback_date", "unit": "day"}},
+                    "store_id": {"$ifNull": ["$store_id", "unknown"]}
+                },
+                "total_feedbacks": {"$sum": 1},
+                **{
+                    tone.value: {"$sum": {"$cond": [{"$eq": [TONE_EXPR, tone.value]}, 1, 0]}}
+                    for tone in ToneType
+                },
+                **{field: {"$push": f"$analysis.{field}"} for field in MENTION_FIELDS}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "date": "$_id.date",
+                "store_id": "$_id.store_id",
+                "total_feedbacks": 1,
+                "tone_breakdown": {tone.value: f"${tone.value}" for tone in ToneType},
+                **{target: _mention_counts(field) for field, target in MENTION_FIELDS.items()},
+                "refreshed_at": {"$literal": refreshed_at}
+            }
+        },
+        *store_name_lookup(),
+        {
+            "$merge": {
+                "into": "daily_analytics",
+                "on": ["date", "store_id"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }
+        }
+    ]
+
+
+def rollup_key(feedback: dict) -> Optional[Tuple[datetime, Optional[str]]]:
+    """(day, store_id) rollup row a feedback document contributes to"""
+    feedback_date = feedback.get("feedback_date")
+    if not feedback_date:
+        return None
+    return datetime.combine(feedback_date.date(), datetime.min.time()), feedback.get("store_id")
+
+
+async def refresh_daily_analytics(db, keys: Iterable[Optional[Tuple[datetime, Optional[str]]]]):
+    """Recompute the rollup rows for the given (day, store_id) pairs"""
+    keys = {key for key in keys if key}
+    if not keys:
+        return
+
+    refreshed_at = datetime.now(UTC)
+    match = {
+        "$or": [
+            {"feedback_date": {"$gte": day, "$lt": day + timedelta(days=1)}, "store_id": store_id}
+            for day, store_id in keys
+        ]
+    }
+    cursor = await db.feedbacks.aggregate(_rollup_pipeline(match, refreshed_at))
+    await cursor.to_list(length=None)
+
+    # Rows not rewritten above no longer have any completed feedback
+    await db.daily_analytics.delete_many({
+        "$or": [{"date": day, "store_id": store_id or "unknown"} for day, store_id in keys],
+        "refreshed_at": {"$lt": refreshed_at}
+    })
+
+
+async def set_rollup_store_name(db, store_id: str, store_name: str):
+    """Rename a store in its rollup rows (names are copied in when rows are built)"""
+    await db.daily_analytics.update_many({"store_id": store_id}, {"$set": {"store_name": store_name}})
+
+
+async def rebuild_daily_analytics(db, days: int = ROLLUP_WINDOW_DAYS):
+    """Recompute every rollup row in the last `days` days (one-off backfill)"""
+    since = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+    refreshed_at = datetime.now(UTC)
+
+    cursor = await db.feedbacks.aggregate(
+        _rollup_pipeline({"feedback_date": {"$gte": since}}, refreshed_at)
+    )
+    await cursor.to_list(length=None)
+    await db.daily_analytics.delete_many({
+        "date": {"$gte": since},
+        "refreshed_at": {"$lt": refreshed_at}
+    })
+
+    logger.info(f"Daily analytics rebuilt for the last {days} days")
@@ -1,42 +1,69 @@
 """
 Authentication service with JWT tokens
 """
-from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import time
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from cachetools import TTLCache
+import jwt
+from jwt import PyJWTError
+import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.core.config import get_settings
-from app.models.schemas import TokenData, User, UserRole
+from app.models.schemas import User, UserRole
 from app.services.database import get_database
 
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/login")
 
+# SHA-256 of recently verified bearer tokens -> (user document, token expiry).
+# Skips the JWT decode and user lookup on hot dashboard routes; the short TTL
+# bounds how long role changes or deactivations take to apply.
+_token_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAXSIZE, ttl=max(settings.AUTH_CACHE_TTL_SECONDS, 1))
+# username -> user document, shared by all of a user's tokens so a fresh token
+# (new login, other device) doesn't cost a users lookup either; user writes
+# show up once the entry expires (USER_CACHE_TTL_SECONDS)
+_user_cache = TTLCache(maxsize=5_000, ttl=max(settings.USER_CACHE_TTL_SECONDS, 1))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    except ValueError:  # missing or malformed hash
+        return False
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(settings.BCRYPT_ROUNDS)).decode()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in a worker thread so bcrypt doesn't block the event loop"""
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in a worker thread so bcrypt doesn't block the event loop"""
+    return await asyncio.to_thread(get_password_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
     
+    # exp as epoch seconds, which is what the JWT carries anyway
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time() + expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = int(time.time()) + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
     
-    to_encode.update({"exp": expire})
+    to_encode["exp"] = expire
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
@@ -46,12 +73,24 @@ async def get_user_by_username(db, username: str) -> Optional[dict]:
     return await db.users.find_one({"username": username})
 
 
+async def get_cached_user(db, username: str) -> Optional[dict]:
+    """get_user_by_username behind the user cache (unknown usernames are not cached)"""
+    if settings.USER_CACHE_TTL_SECONDS <= 0:
+        return await get_user_by_username(db, username)
+    user = _user_cache.get(username)
+    if user is None:
+        user = await get_user_by_username(db, username)
+        if user is not None:
+            _user_cache[username] = user
+    return user
+
+
 async def authenticate_user(db, username: str, password: str) -> Optional[dict]:
     """Authenticate user with username and password"""
     user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.get("password_hash", "")):
+    if not await verify_password_async(password, user.get("password_hash", "")):
         return None
     return user
 
@@ -67,19 +106,29 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(cache_key) if settings.AUTH_CACHE_TTL_SECONDS > 0 else None
+    if cached is not None:
+        user, expires_at = cached
+        if expires_at > time.time():
+            return user
+        _token_cache.pop(cache_key, None)
+        raise credentials_exception
+    
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username, role=payload.get("role"))
-    except JWTError:
+    except PyJWTError:
         raise credentials_exception
     
-    user = await get_user_by_username(db, token_data.username)
+    user = await get_cached_user(db, username)
     if user is None:
         raise credentials_exception
     
+    if settings.AUTH_CACHE_TTL_SECONDS > 0:
+        _token_cache[cache_key] = (user, payload.get("exp", float("inf")))
     return user
 
 
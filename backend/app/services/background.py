@@ -0,0 +1,156 @@
+"""
+Event-driven background processing for transcriptions and analyses
+
+Each loop drains its backlog, then sleeps on a MongoDB change stream and runs
+again as soon as new work is written, so idle workers issue no queries and
+new feedback starts processing immediately. Without a replica set (no change
+streams) the loops fall back to polling every PROCESS_INTERVAL_SECONDS.
+
+Every uvicorn worker runs the app lifespan, so the loops (and the faster-whisper
+process pool) run only in the worker holding a lease in the leases collection;
+the others take over when it stops renewing.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Awaitable, Callable, List
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.core.config import get_settings
+from app.models.schemas import ProcessingStatus
+from app.services.database import Database
+from app.services.llm_analysis import process_pending_analyses
+from app.services.transcription import TranscriptionService, process_pending_transcriptions
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# New uploads and transcription retries
+TRANSCRIPTION_CHANGES = {
+    "$or": [
+        {"operationType": "insert"},
+        {"updateDescription.updatedFields.transcription_status": ProcessingStatus.PENDING.value}
+    ]
+}
+
+# Finished transcriptions and analysis retries
+ANALYSIS_CHANGES = {
+    "$or": [
+        {"updateDescription.updatedFields.transcription_status": ProcessingStatus.COMPLETED.value},
+        {"updateDescription.updatedFields.analysis_status": ProcessingStatus.PENDING.value}
+    ]
+}
+
+LEASE_ID = "background_processing"
+# A holder that has not renewed for this long is taken to have died with its process
+LEASE_SECONDS = 30
+LEASE_RENEW_SECONDS = LEASE_SECONDS / 3
+
+
+async def _drain(process: Callable[[], Awaitable[int]]):
+    """Run `process` until a pass claims nothing: one pass takes only a batch"""
+    while await process():
+        pass
+
+
+async def _poll(name: str, process: Callable[[], Awaitable[int]]):
+    """Fallback: drain the queue every PROCESS_INTERVAL_SECONDS"""
+    while True:
+        try:
+            await _drain(process)
+        except Exception:
+            logger.exception("%s pass failed", name)
+        await asyncio.sleep(settings.PROCESS_INTERVAL_SECONDS)
+
+
+async def run_on_changes(name: str, process: Callable[[], Awaitable[int]], change_match: dict):
+    """Drain the backlog with `process`, then again whenever a matching change arrives"""
+    db = Database.get_db()
+    while True:
+        try:
+            # Open the stream before draining the backlog so no write falls in between
+            stream = await db.feedbacks.watch([{"$match": change_match}])
+        except PyMongoError as e:
+            logger.warning("%s: change stream unavailable, polling instead: %s", name, e)
+            await _poll(name, process)
+            return
+        try:
+            async with stream:
+                await _drain(process)
+                async for _ in stream:
+                    await _drain(process)
+        except Exception:
+            logger.exception("%s pass failed", name)
+            await asyncio.sleep(settings.PROCESS_INTERVAL_SECONDS)
+
+
+async def _acquire_lease(db, holder: str) -> bool:
+    """Take or renew the processing lease; returns whether `holder` has it"""
+    now = datetime.now(UTC)
+    try:
+        # A lease held by another live process matches nothing and the upsert hits the _id
+        await db.leases.update_one(
+            {"_id": LEASE_ID, "$or": [{"holder": holder}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=LEASE_SECONDS)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def _start_loops() -> List[asyncio.Task]:
+    if settings.WHISPER_BACKEND == "faster-whisper":
+        # Start a worker (and load its model) before the first upload instead of on it
+        await asyncio.get_running_loop().run_in_executor(TranscriptionService.get_executor(), int)
+    return [
+        asyncio.create_task(run_on_changes("Transcription", process_pending_transcriptions, TRANSCRIPTION_CHANGES)),
+        asyncio.create_task(run_on_changes("Analysis", process_pending_analyses, ANALYSIS_CHANGES)),
+    ]
+
+
+async def _stop_loops(tasks: List[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    TranscriptionService.shutdown_executor()
+
+
+async def run_while_leased():
+    """Run the loops while this process holds the lease, and keep trying for it otherwise"""
+    db = Database.get_db()
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    tasks: List[asyncio.Task] = []
+    held_until = 0.0
+    try:
+        while True:
+            try:
+                held = await _acquire_lease(db, holder)
+                if held:
+                    held_until = time.monotonic() + LEASE_SECONDS
+            except PyMongoError as e:
+                logger.warning("Background processing lease check failed: %s", e)
+                # Keep running only until the last renewal would have expired
+                held = bool(tasks) and time.monotonic() < held_until
+            if held and not tasks:
+                logger.info("Background processing lease taken by %s", holder)
+                tasks = await _start_loops()
+            elif tasks and not held:
+                logger.warning("Background processing lease lost by %s", holder)
+                await _stop_loops(tasks)
+                tasks = []
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+    finally:
+        if tasks:
+            await _stop_loops(tasks)
+            # Hand over now instead of after LEASE_SECONDS
+            await db.leases.delete_one({"_id": LEASE_ID, "holder": holder})
+
+
+def start_background_processing() -> List[asyncio.Task]:
+    """Start processing in whichever worker holds the lease (cancel the tasks on shutdown)"""
+    return [asyncio.create_task(run_while_leased())]
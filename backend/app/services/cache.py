@@ -0,0 +1,43 @@
+"""
+In-process TTL caches for read-heavy endpoints
+"""
+from typing import Dict
+
+from cachetools import TTLCache
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Dashboard aggregations keyed by (endpoint, *query params).
+# Each API worker keeps its own copy; the TTL bounds cross-worker staleness.
+dashboard_cache = TTLCache(maxsize=256, ttl=settings.DASHBOARD_CACHE_TTL_SECONDS)
+
+# Single entry holding {store_id: store_name} for all active stores
+store_names_cache = TTLCache(maxsize=1, ttl=60)
+
+# Store master responses keyed by (endpoint, *query params); stores change
+# only through the admin endpoints, which clear this on every write
+stores_cache = TTLCache(maxsize=512, ttl=300)
+
+
+def invalidate_dashboard_cache():
+    """Drop cached dashboard results after feedback data changes"""
+    dashboard_cache.clear()
+
+
+async def get_store_names(db) -> Dict[str, str]:
+    """Active store names by store_id, re-read from MongoDB at most once a minute"""
+    names = store_names_cache.get("names")
+    if names is None:
+        names = {}
+        async for store in db.stores.find({"active": True}, {"store_id": 1, "store_name": 1}):
+            names[store["store_id"]] = store.get("store_name", "")
+        store_names_cache["names"] = names
+    return names
+
+
+def invalidate_stores_cache():
+    """Drop cached store names and store responses after a store is created or changed"""
+    store_names_cache.clear()
+    stores_cache.clear()
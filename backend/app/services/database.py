@@ -1,11 +1,14 @@
 """
 MongoDB database service
 """
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import OperationFailure
 from typing import Optional
 import logging
 
 from app.core.config import get_settings
+from app.models.schemas import ProcessingStatus
 
 logger = logging.getLogger(__name__)
 
@@ -13,15 +16,25 @@ logger = logging.getLogger(__name__)
 class Database:
     """MongoDB connection manager"""
     
-    client: Optional[AsyncIOMotorClient] = None
-    db: Optional[AsyncIOMotorDatabase] = None
+    client: Optional[AsyncMongoClient] = None
+    db: Optional[AsyncDatabase] = None
     
     @classmethod
     async def connect(cls):
         """Connect to MongoDB"""
         settings = get_settings()
+        # The pool sizes are budgets for the whole server: split them across worker processes
+        workers = 1 if settings.DEBUG else max(settings.WORKERS, 1)
         try:
-            cls.client = AsyncIOMotorClient(settings.MONGODB_URL)
+            # One pooled client per worker process, created from the app lifespan
+            cls.client = AsyncMongoClient(
+                settings.MONGODB_URL,
+                maxPoolSize=max(settings.MONGODB_MAX_POOL_SIZE // workers, 10),
+                minPoolSize=max(settings.MONGODB_MIN_POOL_SIZE // workers, 1),
+                serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+                compressors=settings.MONGODB_COMPRESSORS,
+            )
             cls.db = cls.client[settings.MONGODB_DB_NAME]
             
             # Verify connection
@@ -39,7 +52,7 @@ class Database:
     async def disconnect(cls):
         """Disconnect from MongoDB"""
         if cls.client:
-            cls.client.close()
+            await cls.client.close()
             logger.info("Disconnected from MongoDB")
     
     @classmethod
@@ -51,10 +64,31 @@ class Database:
         # Feedbacks collection indexes
         await cls.db.feedbacks.create_index([("store_id", 1), ("feedback_date", -1)])
         await cls.db.feedbacks.create_index([("feedback_date", -1)])
-        await cls.db.feedbacks.create_index([("transcription_status", 1)])
-        await cls.db.feedbacks.create_index([("analysis_status", 1)])
+        # Unfinished transcriptions only: serves the worker's oldest-first claim and
+        # the queue counters while completed feedbacks (the bulk) stay out of it
+        if "transcription_status_1" in await cls.db.feedbacks.index_information():
+            await cls.db.feedbacks.drop_index("transcription_status_1")
+        await cls.db.feedbacks.create_index(
+            [("transcription_status", 1), ("submitted_at", 1)],
+            partialFilterExpression={"transcription_status": {"$in": [
+                ProcessingStatus.PENDING.value,
+                ProcessingStatus.PROCESSING.value,
+                ProcessingStatus.FAILED.value
+            ]}}
+        )
         await cls.db.feedbacks.create_index([("submitted_at", -1)])
         
+        # Compound indexes backing the dashboard filters and sorted lists
+        # (analysis_status prefix also serves plain analysis_status lookups,
+        # so the old single-field index only costs writes)
+        try:
+            await cls.db.feedbacks.drop_index("analysis_status_1")
+        except OperationFailure:
+            pass  # already dropped, or never created
+        await cls.db.feedbacks.create_index([("analysis_status", 1), ("feedback_date", -1)])
+        await cls.db.feedbacks.create_index([("analysis.tone", 1), ("feedback_date", -1)])
+        await cls.db.feedbacks.create_index([("submitted_by", 1), ("submitted_at", -1)])
+        
         # Stores collection indexes
         await cls.db.stores.create_index([("store_id", 1)], unique=True)
         
@@ -67,7 +101,7 @@ class Database:
         logger.info("Database indexes created/verified")
     
     @classmethod
-    def get_db(cls) -> AsyncIOMotorDatabase:
+    def get_db(cls) -> AsyncDatabase:
         """Get database instance"""
         if cls.db is None:
             raise RuntimeError("Database not connected. Call Database.connect() first.")
@@ -75,6 +109,6 @@ class Database:
 
 
 # Dependency for FastAPI
-async def get_database() -> AsyncIOMotorDatabase:
+async def get_database() -> AsyncDatabase:
     """FastAPI dependency to get database"""
     return Database.get_db()
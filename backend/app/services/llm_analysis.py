@@ -2,19 +2,29 @@
 LLM Analysis service using Qwen3 API
 Extracts tone, products, issues, and actions from transcriptions
 """
+import asyncio
+import hashlib
+import re
 import httpx
-import json
+import orjson
 import logging
-from datetime import datetime
-from typing import Tuple, Optional
+from datetime import UTC, datetime
+from typing import Dict, Tuple, Optional
+
+from pymongo import ReturnDocument
 
 from app.core.config import get_settings
 from app.services.database import Database
+from app.services.cache import invalidate_dashboard_cache
+from app.services.analytics import refresh_daily_analytics, rollup_key
 from app.models.schemas import FeedbackAnalysis, ProcessingStatus, ToneType
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Outermost {...} in a reply that wraps its JSON in prose
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.S)
+
 # System prompt for structured extraction
 ANALYSIS_SYSTEM_PROMPT = """You are an AI assistant analyzing retail store staff feedback transcriptions.
 Extract the following information in a structured JSON format:
@@ -42,8 +52,34 @@ Respond ONLY with valid JSON, no other text. Example:
 class LLMAnalysisService:
     """Service for analyzing transcriptions using Qwen3 API"""
     
-    @staticmethod
-    async def analyze_transcription(transcription: str) -> Tuple[bool, FeedbackAnalysis | str]:
+    # Shared across calls so concurrent analyses reuse pooled HTTP/2 connections
+    # instead of paying a TCP + TLS handshake each
+    _client: Optional[httpx.AsyncClient] = None
+    
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """Shared Qwen3 API client, created on first use"""
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                timeout=60.0,
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=32)
+            )
+        return cls._client
+    
+    @classmethod
+    async def close_client(cls):
+        """Close the shared client (application shutdown)"""
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+    
+    # In-flight API calls keyed by sha256(transcription), so concurrent analyses
+    # of the same text (retries, duplicate uploads) share one Qwen3 call
+    _inflight: Dict[bytes, asyncio.Task] = {}
+    
+    @classmethod
+    async def analyze_transcription(cls, transcription: str) -> Tuple[bool, FeedbackAnalysis | str]:
         """
         Analyze a transcription using Qwen3 API
         
@@ -56,6 +92,18 @@ class LLMAnalysisService:
         if not transcription or len(transcription.strip()) < 10:
             return False, "Transcription too short to analyze"
         
+        key = hashlib.sha256(transcription.encode()).digest()
+        task = cls._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(cls._request_analysis(transcription))
+            cls._inflight[key] = task
+            task.add_done_callback(lambda _: cls._inflight.pop(key, None))
+        # Shielded: one cancelled caller must not cancel the call for the others
+        return await asyncio.shield(task)
+    
+    @staticmethod
+    async def _request_analysis(transcription: str) -> Tuple[bool, FeedbackAnalysis | str]:
+        """Call the Qwen3 API and parse its reply into a FeedbackAnalysis"""
         try:
             # Prepare the API request
             payload = {
@@ -79,21 +127,20 @@ class LLMAnalysisService:
                 "X-API-Key": settings.QWEN_API_KEY
             }
             
-            logger.debug(f"Calling Qwen3 API for analysis...")
+            logger.debug("Calling Qwen3 API for analysis...")
+            
+            response = await LLMAnalysisService.get_client().post(
+                settings.QWEN_API_URL,
+                content=orjson.dumps(payload),  # faster than httpx's stdlib json encoding
+                headers=headers
+            )
+            
+            if response.status_code != 200:
+                error_msg = f"API returned status {response.status_code}: {response.text}"
+                logger.error(error_msg)
+                return False, error_msg
             
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    settings.QWEN_API_URL,
-                    json=payload,
-                    headers=headers
-                )
-                
-                if response.status_code != 200:
-                    error_msg = f"API returned status {response.status_code}: {response.text}"
-                    logger.error(error_msg)
-                    return False, error_msg
-                
-                result = response.json()
+            result = orjson.loads(response.content)
             
             # Extract the content from the response
             content = ""
@@ -123,7 +170,10 @@ class LLMAnalysisService:
                 keywords=analysis_data.get("keywords", [])[:10]
             )
             
-            logger.info(f"Analysis completed: tone={analysis.tone}, {len(analysis.products)} products, {len(analysis.issues)} issues")
+            logger.info(
+                "Analysis completed: tone=%s, %d products, %d issues",
+                analysis.tone, len(analysis.products), len(analysis.issues)
+            )
             
             return True, analysis
             
@@ -131,7 +181,7 @@ class LLMAnalysisService:
             logger.error("Qwen3 API request timed out")
             return False, "API request timed out"
         except httpx.RequestError as e:
-            logger.error(f"Qwen3 API request error: {e}")
+            logger.error("Qwen3 API request error: %s", e)
             return False, f"API request error: {str(e)}"
         except Exception as e:
             logger.exception("Unexpected error during analysis")
@@ -140,30 +190,18 @@ class LLMAnalysisService:
     @staticmethod
     def _parse_json_response(content: str) -> Optional[dict]:
         """Parse JSON from API response, handling markdown code blocks"""
-        content = content.strip()
-        
         # Remove markdown code blocks if present
-        if content.startswith("```json"):
-            content = content[7:]
-        elif content.startswith("```"):
-            content = content[3:]
-        
-        if content.endswith("```"):
-            content = content[:-3]
-        
-        content = content.strip()
+        content = content.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
         
         try:
-            return json.loads(content)
-        except json.JSONDecodeError:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
             # Try to find JSON object in the response
-            start_idx = content.find("{")
-            end_idx = content.rfind("}") + 1
-            
-            if start_idx >= 0 and end_idx > start_idx:
+            match = JSON_OBJECT_RE.search(content)
+            if match:
                 try:
-                    return json.loads(content[start_idx:end_idx])
-                except json.JSONDecodeError:
+                    return orjson.loads(match.group())
+                except orjson.JSONDecodeError:
                     pass
         
         return None
@@ -181,58 +219,90 @@ class LLMAnalysisService:
             return ToneType.NEUTRAL
 
 
-async def process_pending_analyses():
+async def claim_pending_analyses(db, limit: int) -> list:
+    """
+    Atomically move up to `limit` transcribed feedbacks awaiting analysis (oldest
+    first) to processing, so concurrent workers never pick up the same feedback
+    """
+    claimed = []
+    for _ in range(limit):
+        feedback = await db.feedbacks.find_one_and_update(
+            {
+                "analysis_status": ProcessingStatus.PENDING.value,
+                "transcription_status": ProcessingStatus.COMPLETED.value,
+                "transcription": {"$exists": True, "$ne": None}
+            },
+            {"$set": {"analysis_status": ProcessingStatus.PROCESSING.value}},
+            sort=[("submitted_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if feedback is None:
+            break
+        claimed.append(feedback)
+    return claimed
+
+
+async def _analyze_feedback(db, feedback: dict):
+    """Analyze one claimed feedback; returns its rollup key when analysis succeeded"""
+    feedback_id = feedback["_id"]
+    transcription = feedback.get("transcription", "")
+    
+    # Analyze
+    success, result = await LLMAnalysisService.analyze_transcription(transcription)
+    
+    if success:
+        await db.feedbacks.update_one(
+            {"_id": feedback_id},
+            {
+                "$set": {
+                    "analysis": result.model_dump(),
+                    "analysis_status": ProcessingStatus.COMPLETED.value,
+                    "analyzed_at": datetime.now(UTC)
+                }
+            }
+        )
+        logger.info("Analysis completed for feedback %s", feedback_id)
+        return rollup_key(feedback)
+    
+    await db.feedbacks.update_one(
+        {"_id": feedback_id},
+        {
+            "$set": {
+                "analysis_status": ProcessingStatus.FAILED.value,
+                "analysis_error": result
+            }
+        }
+    )
+    logger.error("Analysis failed for feedback %s: %s", feedback_id, result)
+    return None
+
+
+async def process_pending_analyses() -> int:
     """
     Background worker to process pending LLM analyses
-    Called periodically by the scheduler
+    Returns how many feedbacks this pass claimed (0 once the queue is empty)
     """
     db = Database.get_db()
     
-    # Find feedbacks that have completed transcription but pending analysis
-    pending = await db.feedbacks.find({
-        "transcription_status": ProcessingStatus.COMPLETED.value,
-        "analysis_status": ProcessingStatus.PENDING.value,
-        "transcription": {"$exists": True, "$ne": None}
-    }).limit(5).to_list(length=None)
+    # LLM calls are remote I/O, so a batch of them runs concurrently
+    pending = await claim_pending_analyses(db, settings.MAX_CONCURRENT_ANALYSES)
     
     if not pending:
-        return
+        return 0
     
-    logger.info(f"Processing {len(pending)} pending analyses")
+    logger.info("Processing %d pending analyses", len(pending))
     
-    for feedback in pending:
-        feedback_id = feedback["_id"]
-        transcription = feedback.get("transcription", "")
-        
-        # Mark as processing
-        await db.feedbacks.update_one(
-            {"_id": feedback_id},
-            {"$set": {"analysis_status": ProcessingStatus.PROCESSING.value}}
-        )
-        
-        # Analyze
-        success, result = await LLMAnalysisService.analyze_transcription(transcription)
-        
-        if success:
-            await db.feedbacks.update_one(
-                {"_id": feedback_id},
-                {
-                    "$set": {
-                        "analysis": result.model_dump(),
-                        "analysis_status": ProcessingStatus.COMPLETED.value,
-                        "analyzed_at": datetime.utcnow()
-                    }
-                }
-            )
-            logger.info(f"Analysis completed for feedback {feedback_id}")
+    results = await asyncio.gather(
+        *(_analyze_feedback(db, feedback) for feedback in pending),
+        return_exceptions=True
+    )
+    rollup_keys = set()
+    for feedback, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.error("Analysis crashed for feedback %s: %s", feedback['_id'], result)
         else:
-            await db.feedbacks.update_one(
-                {"_id": feedback_id},
-                {
-                    "$set": {
-                        "analysis_status": ProcessingStatus.FAILED.value,
-                        "analysis_error": result
-                    }
-                }
-            )
-            logger.error(f"Analysis failed for feedback {feedback_id}: {result}")
+            rollup_keys.add(result)
+    
+    await refresh_daily_analytics(db, rollup_keys)
+    invalidate_dashboard_cache()
+    return len(pending)
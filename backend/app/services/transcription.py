@@ -3,13 +3,18 @@ Transcription service using whisper.cpp
 Adapted from audio-service.py for server-side processing
 """
 import os
+import importlib.util
 import subprocess
 import asyncio
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from datetime import datetime
+from datetime import UTC, datetime
 from typing import Optional, Tuple
 
+from pymongo import ReturnDocument
+
 from app.core.config import get_settings
 from app.services.database import Database
 from app.models.schemas import ProcessingStatus
@@ -19,11 +24,21 @@ settings = get_settings()
 
 
 class TranscriptionService:
-    """Service for transcribing audio files using whisper.cpp"""
+    """Service for transcribing audio files using whisper.cpp or faster-whisper"""
+    
+    _model = None  # faster-whisper model, loaded on first use
+    _executor: Optional[ProcessPoolExecutor] = None  # faster-whisper worker processes
     
     @staticmethod
     def check_dependencies() -> Tuple[bool, str]:
-        """Check if whisper.cpp and model are available"""
+        """Check if the configured whisper backend and model are available"""
+        if settings.WHISPER_BACKEND == "faster-whisper":
+            # Only look the packages up: importing them loads heavy native libraries
+            missing = [name for name in ("av", "faster_whisper") if importlib.util.find_spec(name) is None]
+            if missing:
+                return False, f"faster-whisper backend unavailable: missing {', '.join(missing)} (requirements-faster-whisper.txt)"
+            return True, "OK"
+        
         if not os.path.exists(settings.WHISPER_CLI_PATH):
             return False, f"whisper-cli not found at {settings.WHISPER_CLI_PATH}"
         
@@ -32,10 +47,73 @@ class TranscriptionService:
         
         return True, "OK"
     
+    @staticmethod
+    def decode_audio(audio_path: str):
+        """Decode any ffmpeg-readable file to 16kHz mono float32 samples in memory (PyAV)"""
+        import av
+        import numpy as np
+        
+        chunks = []
+        with av.open(audio_path) as container:
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=16000)
+            for frame in container.decode(audio=0):
+                for resampled in resampler.resample(frame):
+                    chunks.append(resampled.to_ndarray().reshape(-1))
+            for resampled in resampler.resample(None):  # flush
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        
+        if not chunks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(chunks).astype(np.float32) / 32768.0
+    
+    @classmethod
+    def get_model(cls):
+        """The faster-whisper model, loaded once and reused for every file"""
+        if cls._model is None:
+            from faster_whisper import WhisperModel
+            cls._model = WhisperModel(
+                settings.FASTER_WHISPER_MODEL,
+                device="cpu",
+                compute_type=settings.WHISPER_COMPUTE_TYPE,
+                cpu_threads=settings.WHISPER_THREADS
+            )
+        return cls._model
+    
+    @classmethod
+    def _transcribe_in_process(cls, audio_path: str) -> str:
+        """Decode and transcribe without temp files or subprocesses (blocking)"""
+        samples = cls.decode_audio(audio_path)
+        segments, _ = cls.get_model().transcribe(
+            samples,
+            language=settings.WHISPER_LANGUAGE,
+            task="translate",  # Same as whisper-cli -tr
+            beam_size=settings.WHISPER_BEAM_SIZE
+        )
+        return " ".join(segment.text.strip() for segment in segments).strip()
+    
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        """Worker processes running faster-whisper, each loading the model once on start"""
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=settings.MAX_CONCURRENT_TRANSCRIPTIONS,
+                # spawn: never fork the API process with its Mongo/HTTP client threads
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_whisper_model
+            )
+        return cls._executor
+    
+    @classmethod
+    def shutdown_executor(cls):
+        """Stop the faster-whisper worker processes"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+    
     @staticmethod
     async def transcribe_file(audio_path: str) -> Tuple[bool, str]:
         """
-        Transcribe a single audio file using whisper-cli
+        Transcribe a single audio file using whisper-cli or faster-whisper
         
         Args:
             audio_path: Path to the audio file
@@ -43,11 +121,25 @@ class TranscriptionService:
         Returns:
             Tuple of (success, transcription_or_error)
         """
+        if settings.WHISPER_BACKEND == "faster-whisper":
+            try:
+                logger.info("Starting transcription: %s", Path(audio_path).name)
+                # CPU-bound inference runs in worker processes so it never competes
+                # with request handling for the API process' GIL
+                transcription = await asyncio.get_running_loop().run_in_executor(
+                    TranscriptionService.get_executor(), _transcribe_in_worker, audio_path
+                )
+                logger.info("Transcription completed: %d characters", len(transcription))
+                return True, transcription
+            except Exception as e:
+                logger.exception("Unexpected error transcribing %s", Path(audio_path).name)
+                return False, f"Transcription error: {str(e)}"
+        
         audio_path = Path(audio_path)
         temp_wav = None
         
         try:
-            logger.info(f"Starting transcription: {audio_path.name}")
+            logger.info("Starting transcription: %s", audio_path.name)
             
             # Convert to WAV format (16kHz mono) for whisper
             temp_wav = audio_path.parent / f"{audio_path.stem}_temp_{os.getpid()}.wav"
@@ -55,20 +147,23 @@ class TranscriptionService:
             logger.debug("Converting to WAV format...")
             
             # Run ffmpeg conversion
+            # Errors only on stderr (no banner or progress stats)
             convert_process = await asyncio.create_subprocess_exec(
-                "ffmpeg", "-i", str(audio_path),
+                "ffmpeg", "-nostdin", "-nostats", "-v", "error",
+                "-i", str(audio_path),
                 "-ar", "16000", "-ac", "1",
                 "-c:a", "pcm_s16le",
                 str(temp_wav), "-y",
-                stdout=asyncio.subprocess.PIPE,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
                 stderr=asyncio.subprocess.PIPE
             )
             
             _, stderr = await convert_process.communicate()
             
             if convert_process.returncode != 0:
-                error_msg = stderr.decode() if stderr else "Unknown ffmpeg error"
-                logger.error(f"FFmpeg conversion failed: {error_msg}")
+                error_msg = stderr[-2000:].decode(errors="replace") if stderr else "Unknown ffmpeg error"
+                logger.error("FFmpeg conversion failed: %s", error_msg)
                 return False, f"Audio conversion failed: {error_msg}"
             
             logger.debug("Running whisper transcription...")
@@ -81,7 +176,7 @@ class TranscriptionService:
                 "-f", str(temp_wav),
                 "-nt",  # No timestamps
                 "-l", settings.WHISPER_LANGUAGE,
-                "-bs", "5",  # Beam size
+                "-bs", str(settings.WHISPER_BEAM_SIZE),  # Beam size
                 "--max-context", "0",
                 "--entropy-thold", "2.8",
                 "-tr",  # Translate to English
@@ -93,16 +188,16 @@ class TranscriptionService:
             
             if whisper_process.returncode != 0:
                 error_msg = stderr.decode() if stderr else "Unknown whisper error"
-                logger.error(f"Whisper transcription failed: {error_msg}")
+                logger.error("Whisper transcription failed: %s", error_msg)
                 return False, f"Transcription failed: {error_msg}"
             
             transcription = stdout.decode().strip()
-            logger.info(f"Transcription completed: {len(transcription)} characters")
+            logger.info("Transcription completed: %d characters", len(transcription))
             
             return True, transcription
             
         except Exception as e:
-            logger.exception(f"Unexpected error transcribing {audio_path.name}")
+            logger.exception("Unexpected error transcribing %s", audio_path.name)
             return False, f"Transcription error: {str(e)}"
             
         finally:
@@ -111,7 +206,7 @@ class TranscriptionService:
                 try:
                     temp_wav.unlink()
                 except Exception as e:
-                    logger.warning(f"Failed to delete temp file: {e}")
+                    logger.warning("Failed to delete temp file: %s", e)
     
     @staticmethod
     async def get_audio_duration(audio_path: str) -> Optional[float]:
@@ -131,84 +226,117 @@ class TranscriptionService:
             if process.returncode == 0:
                 return float(stdout.decode().strip())
         except Exception as e:
-            logger.warning(f"Could not get audio duration: {e}")
+            logger.warning("Could not get audio duration: %s", e)
         
         return None
 
 
-async def process_pending_transcriptions():
+def _load_whisper_model():
+    """ProcessPoolExecutor initializer: load the model once per worker process"""
+    TranscriptionService.get_model()
+
+
+def _transcribe_in_worker(audio_path: str) -> str:
+    """Picklable entry point for the worker processes"""
+    return TranscriptionService._transcribe_in_process(audio_path)
+
+
+async def claim_pending_transcriptions(db, limit: int) -> list:
     """
-    Background worker to process pending transcriptions
-    Called periodically by the scheduler
+    Atomically move up to `limit` pending feedbacks (oldest first) to processing,
+    so concurrent workers never pick up the same feedback
     """
-    db = Database.get_db()
+    claimed = []
+    for _ in range(limit):
+        feedback = await db.feedbacks.find_one_and_update(
+            {"transcription_status": ProcessingStatus.PENDING.value},
+            {"$set": {"transcription_status": ProcessingStatus.PROCESSING.value}},
+            sort=[("submitted_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if feedback is None:
+            break
+        claimed.append(feedback)
+    return claimed
+
+
+async def _transcribe_feedback(db, feedback: dict):
+    """Transcribe one claimed feedback and record the result"""
+    feedback_id = feedback["_id"]
+    audio_path = feedback.get("audio_url", "")
     
-    # Find pending transcriptions
-    pending = await db.feedbacks.find({
-        "transcription_status": ProcessingStatus.PENDING.value
-    }).limit(settings.MAX_CONCURRENT_TRANSCRIPTIONS).to_list(length=None)
+    # Convert URL path to file system path
+    if audio_path.startswith("/uploads/"):
+        file_path = Path(settings.UPLOAD_DIR) / audio_path.replace("/uploads/", "")
+    else:
+        file_path = Path(audio_path)
     
-    if not pending:
+    if not file_path.exists():
+        logger.error("Audio file not found: %s", file_path)
+        await db.feedbacks.update_one(
+            {"_id": feedback_id},
+            {
+                "$set": {
+                    "transcription_status": ProcessingStatus.FAILED.value,
+                    "transcription_error": f"Audio file not found: {file_path}"
+                }
+            }
+        )
         return
     
-    logger.info(f"Processing {len(pending)} pending transcriptions")
+    # Transcribe
+    success, result = await TranscriptionService.transcribe_file(str(file_path))
     
-    for feedback in pending:
-        feedback_id = feedback["_id"]
-        audio_path = feedback.get("audio_url", "")
-        
-        # Convert URL path to file system path
-        if audio_path.startswith("/uploads/"):
-            file_path = Path(settings.UPLOAD_DIR) / audio_path.replace("/uploads/", "")
-        else:
-            file_path = Path(audio_path)
-        
-        if not file_path.exists():
-            logger.error(f"Audio file not found: {file_path}")
-            await db.feedbacks.update_one(
-                {"_id": feedback_id},
-                {
-                    "$set": {
-                        "transcription_status": ProcessingStatus.FAILED.value,
-                        "transcription_error": f"Audio file not found: {file_path}"
-                    }
-                }
-            )
-            continue
+    if success:
+        # Get audio duration
+        duration = await TranscriptionService.get_audio_duration(str(file_path))
         
-        # Mark as processing
         await db.feedbacks.update_one(
             {"_id": feedback_id},
-            {"$set": {"transcription_status": ProcessingStatus.PROCESSING.value}}
-        )
-        
-        # Transcribe
-        success, result = await TranscriptionService.transcribe_file(str(file_path))
-        
-        if success:
-            # Get audio duration
-            duration = await TranscriptionService.get_audio_duration(str(file_path))
-            
-            await db.feedbacks.update_one(
-                {"_id": feedback_id},
-                {
-                    "$set": {
-                        "transcription": result,
-                        "transcription_status": ProcessingStatus.COMPLETED.value,
-                        "transcribed_at": datetime.utcnow(),
-                        "audio_duration_seconds": duration
-                    }
+            {
+                "$set": {
+                    "transcription": result,
+                    "transcription_status": ProcessingStatus.COMPLETED.value,
+                    "transcribed_at": datetime.now(UTC),
+                    "audio_duration_seconds": duration
                 }
-            )
-            logger.info(f"Transcription completed for feedback {feedback_id}")
-        else:
-            await db.feedbacks.update_one(
-                {"_id": feedback_id},
-                {
-                    "$set": {
-                        "transcription_status": ProcessingStatus.FAILED.value,
-                        "transcription_error": result
-                    }
+            }
+        )
+        logger.info("Transcription completed for feedback %s", feedback_id)
+    else:
+        await db.feedbacks.update_one(
+            {"_id": feedback_id},
+            {
+                "$set": {
+                    "transcription_status": ProcessingStatus.FAILED.value,
+                    "transcription_error": result
                 }
-            )
-            logger.error(f"Transcription failed for feedback {feedback_id}: {result}")
+            }
+        )
+        logger.error("Transcription failed for feedback %s: %s", feedback_id, result)
+
+
+async def process_pending_transcriptions() -> int:
+    """
+    Background worker to process pending transcriptions
+    Returns how many feedbacks this pass claimed (0 once the queue is empty)
+    """
+    db = Database.get_db()
+    
+    pending = await claim_pending_transcriptions(db, settings.MAX_CONCURRENT_TRANSCRIPTIONS)
+    
+    if not pending:
+        return 0
+    
+    # whisper-cli is CPU-bound: run as many at once as were claimed
+    # (MAX_CONCURRENT_TRANSCRIPTIONS, sized below the core count)
+    logger.info("Processing %d pending transcriptions", len(pending))
+    
+    results = await asyncio.gather(
+        *(_transcribe_feedback(db, feedback) for feedback in pending),
+        return_exceptions=True
+    )
+    for feedback, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.error("Transcription crashed for feedback %s: %s", feedback['_id'], result)
+    return len(pending)
@@ -0,0 +1,39 @@
+"""
+One-off startup jobs (backfills, rebuilds) shared by every API process
+
+Each uvicorn worker runs the app lifespan, so a job started from there would
+run once per worker, concurrently. run_once records jobs in the startup_jobs
+collection: the first process to reach a job runs it, every other process
+(now or on later starts) skips it. Rename a job's id to run it again.
+"""
+from datetime import UTC, datetime, timedelta
+from typing import Awaitable, Callable
+
+from pymongo.errors import DuplicateKeyError
+
+# A job started this long ago without finishing is taken to have died with its process
+JOB_LOCK_TIMEOUT = timedelta(hours=1)
+
+
+async def run_once(db, job_id: str, job: Callable[[], Awaitable[None]]) -> bool:
+    """Run `job` unless another process has run or is running `job_id`; returns whether it ran"""
+    started_at = datetime.now(UTC)
+    try:
+        # Inserts the lock, or takes over an abandoned one; a finished or
+        # running job matches nothing and the upsert hits the _id
+        await db.startup_jobs.update_one(
+            {"_id": job_id, "finished_at": None, "started_at": {"$lt": started_at - JOB_LOCK_TIMEOUT}},
+            {"$set": {"started_at": started_at}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+
+    try:
+        await job()
+    except BaseException:
+        # Let the next start retry
+        await db.startup_jobs.delete_one({"_id": job_id, "started_at": started_at})
+        raise
+    await db.startup_jobs.update_one({"_id": job_id}, {"$set": {"finished_at": datetime.now(UTC)}})
+    return True
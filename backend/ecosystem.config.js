@@ -1,29 +1,34 @@
 // PM2 Ecosystem Configuration for Store Feedback System
 // Deploy with: pm2 start ecosystem.config.js
 
+const apiWorkers = '2';
+
 module.exports = {
   apps: [
     {
       name: 'feedback-api',
       script: 'uvicorn',
-      args: 'app.main:app --host 0.0.0.0 --port 8000',
+      args: `app.main:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools --workers ${apiWorkers}`,
       cwd: '/opt/store-feedback/backend',
       interpreter: 'none',
       env: {
         MONGO_URI: 'mongodb://localhost:27017',
         DB_NAME: 'store_feedback',
         UPLOAD_DIR: '/data/store-feedback/uploads',
-        BASE_URL: 'https://store-feedback.tarsyer.com'
+        BASE_URL: 'https://store-feedback.tarsyer.com',
+        WEB_CONCURRENCY: apiWorkers  // match --workers so each process takes its share of the Mongo pool
       },
       env_production: {
         NODE_ENV: 'production',
         MONGO_URI: 'mongodb://localhost:27017',
         DB_NAME: 'store_feedback',
         UPLOAD_DIR: '/data/store-feedback/uploads',
-        BASE_URL: 'https://store-feedback.tarsyer.com'
+        BASE_URL: 'https://store-feedback.tarsyer.com',
+        WEB_CONCURRENCY: apiWorkers
       },
-      instances: 2,
-      exec_mode: 'cluster',
+      // PM2 cluster mode only applies to Node apps; uvicorn forks its own workers
+      instances: 1,
+      exec_mode: 'fork',
       watch: false,
       max_memory_restart: '500M',
       error_file: '/var/log/pm2/feedback-api-error.log',
@@ -1,15 +1,30 @@
 #!/usr/bin/env python3
 """
 AI Analysis Worker Service
-Polls for transcribed feedbacks and analyzes them using Qwen3 API
+Receives transcribed feedbacks (pushed by the API, or polled as a fallback)
+and analyzes them using Qwen3 API
 Extracts: summary, tone, products, issues, actions
+
+Throughput knobs (match them to the Qwen rate limit; raise gradually while
+watching latency):
+  QWEN_CONCURRENCY  Qwen calls in flight at once (default 4)
+  ANALYSIS_BATCH    feedbacks claimed per poll when streaming is unavailable (default 20)
+  QWEN_BATCH_SIZE   transcriptions per Qwen call (default 1, no batching)
 """
 import os
 import sys
-import time
+import atexit
+import queue
+import logging
+import logging.handlers
 import json
-import requests
-from datetime import datetime
+import time
+import random
+import asyncio
+import hashlib
+import re
+import httpx
+import orjson
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -21,14 +36,38 @@ QWEN_API_URL = os.getenv("QWEN_API_URL", "https://kwen.tarsyer.com/v1/chat/compl
 QWEN_API_KEY = os.getenv("QWEN_API_KEY", "Tarsyer-key-1")
 QWEN_TARGET_SERVER = os.getenv("QWEN_TARGET_SERVER", "BK")
 POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", "10"))
+MIN_POLL = float(os.getenv("MIN_POLL", str(POLL_INTERVAL)))  # first wait once the queue is empty
+MAX_POLL = float(os.getenv("MAX_POLL", "60"))  # longest wait while idle
+QWEN_CONCURRENCY = int(os.getenv("QWEN_CONCURRENCY", "4"))  # Qwen calls in flight at once
+ANALYSIS_BATCH = int(os.getenv("ANALYSIS_BATCH", "20"))  # feedbacks claimed per poll
+BATCH_DELAY_MS = int(os.getenv("BATCH_DELAY_MS", "500"))  # How long results wait to share one bulk update
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", "2048"))
 LOG_QWEN_RESPONSES = os.getenv("LOG_QWEN_RESPONSES", "true").lower() == "true"
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1000"))  # 0 disables the cache
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "86400"))  # seconds
+MIN_ANALYSIS_WORDS = int(os.getenv("MIN_ANALYSIS_WORDS", "5"))  # shorter transcriptions are not sent to Qwen
+QWEN_BATCH_SIZE = int(os.getenv("QWEN_BATCH_SIZE", "1"))  # transcriptions per Qwen call; 1 disables batching
+QWEN_BATCH_MAX_CHARS = int(os.getenv("QWEN_BATCH_MAX_CHARS", "12000"))  # keeps batched prompts inside the context window
+
+
+# Log records go through a queue to a background thread that formats and
+# writes them, so logging never blocks the worker on stdout
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.setFormatter(logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)  # drain what's queued before exiting
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+logger.setLevel(logging.DEBUG)
+logger.propagate = False
 
 
 def log(message: str, level: str = "INFO"):
-    """Simple logging with timestamp"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] [{level}] {message}", flush=True)
+    """Log a message at the given level name (INFO, WARNING, ERROR, DEBUG)"""
+    logger.log(logging.getLevelName(level), message)
 
 
 # Get prompts from environment variables (configurable)
@@ -69,19 +108,235 @@ Remember to respond with valid JSON only."""
 ANALYSIS_SYSTEM_PROMPT = os.getenv("QWEN_SYSTEM_PROMPT", DEFAULT_SYSTEM_PROMPT)
 ANALYSIS_USER_PROMPT = os.getenv("QWEN_USER_PROMPT", DEFAULT_USER_PROMPT)
 
+# System prompt for batched calls (QWEN_BATCH_SIZE > 1): same analysis, one array
+BATCH_SYSTEM_PROMPT = ANALYSIS_SYSTEM_PROMPT + """
+
+You will receive several numbered transcriptions ([1], [2], ...). Respond with a
+JSON array containing exactly one object per transcription, in the same order,
+each with the structure above."""
+
+# System prompts are fixed per process and sent byte-identical on every call, so
+# a prefix-caching gateway (e.g. vLLM) can reuse their prefill; the key names
+# the shared prefix for gateways that route or cache by it
+PROMPT_CACHE_KEYS = {
+    prompt: hashlib.sha1(prompt.encode()).hexdigest()
+    for prompt in (ANALYSIS_SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT)
+}
+
+
+# Request bodies are encoded with orjson and sent as raw content
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Fields every analysis must have (missing ones are filled in)
+TEXT_FIELDS = ("summary", "tone", "tone_score")
+LIST_FIELDS = ("products", "issues", "actions", "keywords")
+TONES = frozenset({"positive", "negative", "neutral"})
+
+ERROR_BODY_LIMIT = 1024  # bytes of an error response kept in logs and error messages
+
+# Body of a ```json fenced block; the closing fence is optional because
+# streaming stops reading at the end of the JSON value
+CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|$)", re.DOTALL)
+
+
+class QwenError(Exception):
+    """Qwen API returned an error or an empty reply"""
+
+# One pooled client for the Qwen API and the internal API, so calls reuse
+# keep-alive connections instead of paying a TCP/TLS handshake each
+client = httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_keepalive_connections=16))
+
+# Finished results waiting for the next bulk update
+pending_analyses: list = []
+pending_errors: list = []
 
-def analyze_with_qwen(transcription: str) -> tuple[bool, dict]:
+# Transcriptions (with their callers' futures) waiting to share one batched call
+batch_queue: list = []
+batch_tasks: set = set()
+
+# Successful analyses by prompt hash -> (expires_at, analysis); duplicate uploads
+# and re-processed feedbacks skip the Qwen call. Oldest entries are evicted first.
+analysis_cache: dict = {}
+
+
+def analysis_cache_key(transcription: str) -> str:
+    """Hash of exactly what is sent to Qwen for this transcription"""
+    prompt = json.dumps(
+        {"sys": ANALYSIS_SYSTEM_PROMPT, "user": transcription[:4000]},
+        sort_keys=True
+    )
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+def unanalyzable_reason(transcription: str) -> str | None:
+    """Why a transcription isn't worth a Qwen call (None if it is)"""
+    text = transcription.strip() if transcription else ""
+    if len(text) < 10 or len(text.split()) < MIN_ANALYSIS_WORDS:
+        return "Transcription too short for analysis"
+    # Mostly punctuation/digits/noise markers, e.g. whisper's "[Music] ..." or "... ... ..."
+    if sum(char.isalpha() for char in text) / len(text) <= 0.3:
+        return "Transcription has too little text for analysis"
+    return None
+
+
+async def analyze_with_qwen(transcription: str) -> tuple[bool, dict]:
     """
-    Send transcription to Qwen3 API for analysis
+    Analyze a transcription, reusing a cached result for identical input
     Returns (success, analysis_result_or_error)
     """
-    if not transcription or len(transcription.strip()) < 10:
-        return False, {"error": "Transcription too short for analysis"}
+    reason = unanalyzable_reason(transcription)
+    if reason:
+        return False, {"error": reason}
+    
+    if ANALYSIS_CACHE_SIZE <= 0:
+        return await request_analysis(transcription)
     
+    key = analysis_cache_key(transcription)
+    cached = analysis_cache.get(key)
+    if cached and cached[0] > time.time():
+        log("Analysis cache hit, skipping Qwen call")
+        return True, dict(cached[1])
+    
+    success, result = await request_analysis(transcription)
+    if success:
+        analysis_cache.pop(key, None)
+        analysis_cache[key] = (time.time() + ANALYSIS_CACHE_TTL, result)
+        while len(analysis_cache) > ANALYSIS_CACHE_SIZE:
+            del analysis_cache[next(iter(analysis_cache))]
+    return success, result
+
+
+async def read_streamed_content(response: httpx.Response, opener: str = "{") -> str:
+    """
+    Accumulate the streamed (SSE) completion, and stop reading as soon as the
+    first top-level JSON value starting with `opener` is closed instead of
+    waiting for the model to finish generating
+    """
+    closer = "}" if opener == "{" else "]"
+    chunks = []
+    depth = 0
+    in_string = escaped = False
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        choices = orjson.loads(data).get("choices") or [{}]
+        delta = choices[0].get("delta", {}).get("content") or ""
+        chunks.append(delta)
+        
+        # Depth of `opener` outside JSON strings
+        for char in delta:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"' and depth:
+                in_string = True
+            elif char == opener:
+                depth += 1
+            elif char == closer and depth:
+                depth -= 1
+                if not depth:
+                    return "".join(chunks)
+    return "".join(chunks)
+
+
+async def read_error_body(response: httpx.Response) -> str:
+    """The start of an error response body, for logs; the rest is never downloaded"""
+    body = b""
+    async for chunk in response.aiter_bytes():
+        body += chunk
+        if len(body) >= ERROR_BODY_LIMIT:
+            break
+    return body[:ERROR_BODY_LIMIT].decode(errors="replace")
+
+
+async def fetch_qwen_content(messages: list, max_tokens: int, opener: str = "{") -> str:
+    """
+    Run one Qwen3 completion and return its text content
+    Raises QwenError for API errors and empty replies
+    """
+    payload = {
+        "target_server": QWEN_TARGET_SERVER,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0.0,  # Deterministic structured output, so cached results stay valid
+        "stream": True
+    }
+    
+    headers = {
+        "Content-Type": "application/json",
+        "X-API-Key": QWEN_API_KEY
+    }
+    cache_key = PROMPT_CACHE_KEYS.get(messages[0]["content"])
+    if cache_key:
+        headers["X-Prompt-Cache-Key"] = cache_key
+    
+    async with client.stream("POST", QWEN_API_URL, headers=headers, content=orjson.dumps(payload)) as response:
+        if response.status_code != 200:
+            raise QwenError(f"Qwen API error: {response.status_code} - {await read_error_body(response)}")
+        
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            content = await read_streamed_content(response, opener)
+        else:
+            # Endpoint ignored "stream": a regular JSON completion
+            await response.aread()
+            result = orjson.loads(response.content)
+
+            # Log full Qwen response if enabled
+            if LOG_QWEN_RESPONSES:
+                log(f"Qwen API Response: {json.dumps(result, indent=2)}", "DEBUG")
+
+            # Extract content from response
+            content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+    if not content:
+        raise QwenError("Empty response from Qwen API")
+
+    # Log extracted content
+    if LOG_QWEN_RESPONSES:
+        log(f"Extracted content: {content}", "DEBUG")
+
+    # Handle potential markdown code blocks
+    fenced = CODE_FENCE_RE.search(content)
+    return fenced.group(1) if fenced else content.strip()
+
+
+def normalize_analysis(analysis: dict) -> dict:
+    """Fill in missing fields and clamp tone/tone_score to the expected values"""
+    # Validate required fields
+    for field in TEXT_FIELDS:
+        analysis.setdefault(field, "")
+    for field in LIST_FIELDS:
+        analysis.setdefault(field, [])
+    
+    # Normalize tone
+    if analysis.get("tone") not in TONES:
+        analysis["tone"] = "neutral"
+    
+    # Ensure tone_score is a float in [0, 1]
     try:
-        payload = {
-            "target_server": QWEN_TARGET_SERVER,
-            "messages": [
+        analysis["tone_score"] = max(0.0, min(1.0, float(analysis.get("tone_score", 0.5))))
+    except (TypeError, ValueError):
+        analysis["tone_score"] = 0.5
+    
+    return analysis
+
+
+async def request_qwen_analysis(transcription: str) -> tuple[bool, dict]:
+    """
+    Send transcription to Qwen3 API for analysis
+    Returns (success, analysis_result_or_error)
+    """
+    content = ""
+    try:
+        content = await fetch_qwen_content(
+            [
                 {
                     "role": "system",
                     "content": ANALYSIS_SYSTEM_PROMPT
@@ -91,101 +346,139 @@ def analyze_with_qwen(transcription: str) -> tuple[bool, dict]:
                     "content": ANALYSIS_USER_PROMPT.format(transcription=transcription[:4000])  # Limit input
                 }
             ],
-            "max_tokens": MAX_TOKENS,
-            "temperature": 0.3  # Lower for more consistent structured output
-        }
-        
-        headers = {
-            "Content-Type": "application/json",
-            "X-API-Key": QWEN_API_KEY
-        }
-        
-        response = requests.post(
-            QWEN_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=120
+            MAX_TOKENS
         )
+        return True, normalize_analysis(orjson.loads(content))
         
-        if response.status_code != 200:
-            return False, {"error": f"Qwen API error: {response.status_code} - {response.text}"}
-        
-        result = response.json()
-
-        # Log full Qwen response if enabled
-        if LOG_QWEN_RESPONSES:
-            log(f"Qwen API Response: {json.dumps(result, indent=2)}", "DEBUG")
-
-        # Extract content from response
-        content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-
-        if not content:
-            return False, {"error": "Empty response from Qwen API"}
-
-        # Log extracted content
-        if LOG_QWEN_RESPONSES:
-            log(f"Extracted content: {content}", "DEBUG")
-
-        # Parse JSON from response
-        # Handle potential markdown code blocks
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        
-        analysis = json.loads(content.strip())
-        
-        # Validate required fields
-        required_fields = ["summary", "tone", "tone_score", "products", "issues", "actions", "keywords"]
-        for field in required_fields:
-            if field not in analysis:
-                analysis[field] = [] if field in ["products", "issues", "actions", "keywords"] else ""
-        
-        # Normalize tone
-        if analysis.get("tone") not in ["positive", "negative", "neutral"]:
-            analysis["tone"] = "neutral"
-        
-        # Ensure tone_score is float
-        try:
-            analysis["tone_score"] = float(analysis.get("tone_score", 0.5))
-            analysis["tone_score"] = max(0.0, min(1.0, analysis["tone_score"]))
-        except:
-            analysis["tone_score"] = 0.5
-        
-        return True, analysis
-        
+    except QwenError as e:
+        return False, {"error": str(e)}
     except json.JSONDecodeError as e:
         log(f"JSON parse error: {e}", "ERROR")
         log(f"Raw content: {content[:500]}", "DEBUG")
         return False, {"error": f"Failed to parse Qwen response as JSON: {str(e)}"}
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         return False, {"error": "Qwen API request timed out"}
     except Exception as e:
         return False, {"error": f"Qwen API error: {str(e)}"}
 
 
-def get_transcribed_feedbacks(limit: int = 5) -> list:
-    """Fetch feedbacks that have been transcribed but not analyzed"""
+async def request_qwen_batch(transcriptions: list) -> list | None:
+    """
+    Analyze several transcriptions with one Qwen3 call (the system prompt is
+    sent once instead of per feedback)
+    Returns one analysis per transcription, or None if the reply is unusable
+    """
+    user_prompt = f"Analyze the following {len(transcriptions)} store staff feedback transcriptions:\n\n" + "\n\n".join(
+        f"[{i}]\n---\n{transcription[:4000]}\n---" for i, transcription in enumerate(transcriptions, 1)
+    )
+    try:
+        content = await fetch_qwen_content(
+            [
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            MAX_TOKENS * len(transcriptions),
+            opener="["
+        )
+        analyses = orjson.loads(content)
+    except Exception as e:
+        log(f"Batched Qwen analysis failed, analyzing one by one: {e}", "WARNING")
+        return None
+    
+    if not isinstance(analyses, list) or len(analyses) != len(transcriptions) \
+            or not all(isinstance(analysis, dict) for analysis in analyses):
+        log("Batched Qwen reply did not match the batch, analyzing one by one", "WARNING")
+        return None
+    return [normalize_analysis(analysis) for analysis in analyses]
+
+
+async def run_batch(batch: list):
+    """Analyze a dispatched batch and resolve each caller's future"""
     try:
-        response = requests.get(
-            f"{API_BASE_URL}/api/v1/feedbacks",
-            params={"status": "transcribed", "limit": limit},
+        results = await request_qwen_batch([transcription for transcription, _ in batch]) if len(batch) > 1 else None
+        if results is not None:
+            outcomes = [(True, analysis) for analysis in results]
+        else:
+            outcomes = await asyncio.gather(*(request_qwen_analysis(transcription) for transcription, _ in batch))
+    except Exception as e:
+        outcomes = [(False, {"error": f"Qwen API error: {str(e)}"})] * len(batch)
+    for (_, future), outcome in zip(batch, outcomes):
+        if not future.done():
+            future.set_result(outcome)
+
+
+def dispatch_batch():
+    """Send the queued transcriptions (up to QWEN_BATCH_SIZE / QWEN_BATCH_MAX_CHARS) as one call"""
+    global batch_queue
+    size = chars = 0
+    for transcription, _ in batch_queue[:QWEN_BATCH_SIZE]:
+        chars += min(len(transcription), 4000)
+        if size and chars > QWEN_BATCH_MAX_CHARS:
+            break
+        size += 1
+    if not size:
+        return
+    batch, batch_queue = batch_queue[:size], batch_queue[size:]
+    task = asyncio.create_task(run_batch(batch))
+    batch_tasks.add(task)
+    task.add_done_callback(batch_tasks.discard)
+    if batch_queue:
+        asyncio.get_running_loop().call_later(BATCH_DELAY_MS / 1000, dispatch_batch)
+
+
+async def request_analysis(transcription: str) -> tuple[bool, dict]:
+    """Analyze one transcription, sharing a Qwen call with others queued at the same time"""
+    if QWEN_BATCH_SIZE <= 1:
+        return await request_qwen_analysis(transcription)
+    
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    batch_queue.append((transcription, future))
+    if len(batch_queue) >= QWEN_BATCH_SIZE:
+        dispatch_batch()
+    elif len(batch_queue) == 1:
+        # Give concurrent analyses BATCH_DELAY_MS to join this batch
+        loop.call_later(BATCH_DELAY_MS / 1000, dispatch_batch)
+    return await future
+
+
+async def get_transcribed_feedbacks(limit: int = 5) -> list:
+    """Claim transcribed feedbacks from API (claimed ones are not handed to other workers)"""
+    try:
+        response = await client.post(
+            f"{API_BASE_URL}/api/internal/claim-transcribed",
+            params={"limit": limit},
             timeout=30
         )
         if response.status_code == 200:
-            return response.json()
+            return orjson.loads(response.content)
         return []
     except Exception as e:
         log(f"Failed to fetch transcribed feedbacks: {e}", "ERROR")
         return []
 
 
-def update_analysis(feedback_id: str, analysis: dict) -> bool:
+async def watch_transcribed_feedbacks():
+    """Yield transcribed feedbacks as the API pushes them; returns when the stream ends"""
+    async with client.stream(
+        "GET",
+        f"{API_BASE_URL}/api/internal/watch-transcribed",
+        params={"max_in_flight": QWEN_CONCURRENCY},  # claim only what the slots can start
+        timeout=httpx.Timeout(None, connect=10)  # the stream idles between uploads
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line:
+                yield orjson.loads(line)
+
+
+async def update_analysis(feedback_id: str, analysis: dict) -> bool:
     """Update feedback with analysis result via API"""
     try:
-        response = requests.patch(
+        response = await client.patch(
             f"{API_BASE_URL}/api/internal/feedback/{feedback_id}/analysis",
-            json=analysis,
+            content=orjson.dumps(analysis),
+            headers=JSON_HEADERS,
             timeout=30
         )
         return response.status_code == 200
@@ -194,10 +487,10 @@ def update_analysis(feedback_id: str, analysis: dict) -> bool:
         return False
 
 
-def mark_error(feedback_id: str, error_message: str) -> bool:
+async def mark_error(feedback_id: str, error_message: str) -> bool:
     """Mark feedback as errored via API"""
     try:
-        response = requests.patch(
+        response = await client.patch(
             f"{API_BASE_URL}/api/internal/feedback/{feedback_id}/error",
             data={"error_message": error_message},
             timeout=30
@@ -208,7 +501,52 @@ def mark_error(feedback_id: str, error_message: str) -> bool:
         return False
 
 
-def process_feedback(feedback: dict):
+async def post_bulk(endpoint: str, updates: list) -> bool:
+    """Send a batch of results to a bulk internal endpoint"""
+    try:
+        response = await client.post(
+            f"{API_BASE_URL}/api/internal/feedback/{endpoint}",
+            content=orjson.dumps(updates),
+            headers=JSON_HEADERS,
+            timeout=30
+        )
+        return response.status_code == 200
+    except Exception as e:
+        log(f"Bulk {endpoint} failed: {e}", "ERROR")
+        return False
+
+
+async def flush_results():
+    """Record every pending result with one bulk call per kind"""
+    global pending_analyses, pending_errors
+    analyses, pending_analyses = pending_analyses, []
+    errors, pending_errors = pending_errors, []
+    
+    if analyses:
+        if await post_bulk("bulk-analysis", analyses):
+            log(f"✓ Updated {len(analyses)} feedbacks")
+        else:
+            # One malformed analysis rejects the whole batch; record them one by one
+            for update in analyses:
+                if not await update_analysis(update["id"], update["analysis"]):
+                    log(f"Failed to update feedback {update['id']}", "ERROR")
+    
+    if errors and not await post_bulk("bulk-error", errors):
+        for update in errors:
+            await mark_error(update["id"], update["error_message"])
+
+
+async def flush_periodically():
+    """Flush results every BATCH_DELAY_MS, so results finishing close together share a call"""
+    while True:
+        await asyncio.sleep(BATCH_DELAY_MS / 1000)
+        try:
+            await flush_results()
+        except Exception as e:
+            log(f"Result flush failed: {e}", "ERROR")
+
+
+async def process_feedback(feedback: dict):
     """Process a single feedback - analyze transcription"""
     feedback_id = feedback["id"]
     store_code = feedback.get("store_code", "UNKNOWN")
@@ -219,11 +557,11 @@ def process_feedback(feedback: dict):
     
     if not transcription:
         log("No transcription found, skipping", "WARN")
-        mark_error(feedback_id, "No transcription available for analysis")
+        pending_errors.append({"id": feedback_id, "error_message": "No transcription available for analysis"})
         return
     
     # Analyze with Qwen
-    success, result = analyze_with_qwen(transcription)
+    success, result = await analyze_with_qwen(transcription)
     
     if success:
         log(f"Analysis complete:")
@@ -232,21 +570,18 @@ def process_feedback(feedback: dict):
         log(f"  Issues: {len(result.get('issues', []))}")
         log(f"  Actions: {len(result.get('actions', []))}")
         
-        if update_analysis(feedback_id, result):
-            log(f"✓ Updated feedback {feedback_id}")
-        else:
-            log(f"Failed to update feedback {feedback_id}", "ERROR")
+        pending_analyses.append({"id": feedback_id, "analysis": result})
     else:
         error_msg = result.get("error", "Unknown analysis error")
         log(f"Analysis failed: {error_msg}", "ERROR")
-        mark_error(feedback_id, error_msg)
+        pending_errors.append({"id": feedback_id, "error_message": error_msg})
 
 
-def check_qwen_api():
+async def check_qwen_api():
     """Verify Qwen API is reachable"""
     try:
         # Simple test request
-        response = requests.post(
+        response = await client.post(
             QWEN_API_URL,
             headers={
                 "Content-Type": "application/json",
@@ -270,38 +605,108 @@ def check_qwen_api():
         return False
 
 
-def main():
+def poll_delay(idle_polls: int) -> float:
+    """Back off exponentially while idle, with jitter so workers don't poll in lockstep"""
+    return min(MIN_POLL * 2 ** min(idle_polls, 10), MAX_POLL) * random.uniform(0.8, 1.2)
+
+
+async def analyze_stream(slots: asyncio.Semaphore) -> int:
+    """Analyze streamed feedbacks concurrently, at most QWEN_CONCURRENCY at a time"""
+    tasks = set()
+    started = 0
+    try:
+        # Backlog first, then feedbacks as they finish transcription
+        feedbacks = watch_transcribed_feedbacks()
+        while True:
+            # Take a slot before reading: the next item is claimed as it is sent
+            await slots.acquire()
+            feedback = await anext(feedbacks, None)
+            if feedback is None:
+                slots.release()
+                break
+            task = asyncio.create_task(process_feedback(feedback))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+            started += 1
+    finally:
+        # Finish and record what was already claimed, even if the stream dropped
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await flush_results()
+    return started
+
+
+async def analyze_batch(feedbacks: list, slots: asyncio.Semaphore):
+    """Analyze a polled batch concurrently: wall time is the slowest call, not the sum"""
+    async def run(feedback: dict):
+        async with slots:
+            await process_feedback(feedback)
+    
+    await asyncio.gather(*(run(feedback) for feedback in feedbacks), return_exceptions=True)
+    await flush_results()
+
+
+async def analyze_polled(slots: asyncio.Semaphore) -> int:
+    """Analyze polled batches until none is left, claiming the next batch while one runs"""
+    processed = 0
+    feedbacks = await get_transcribed_feedbacks(limit=ANALYSIS_BATCH)
+    while feedbacks:
+        log(f"Found {len(feedbacks)} feedbacks to analyze")
+        # The claim round-trip overlaps the Qwen calls instead of following them
+        next_batch = asyncio.create_task(get_transcribed_feedbacks(limit=ANALYSIS_BATCH))
+        await analyze_batch(feedbacks, slots)
+        processed += len(feedbacks)
+        feedbacks = await next_batch
+    return processed
+
+
+async def analyze_forever(slots: asyncio.Semaphore):
+    """Follow the transcribed stream, polling whenever it is unavailable"""
+    idle_polls = 0
+    while True:
+        try:
+            processed = 0
+            try:
+                processed = await analyze_stream(slots)
+            except httpx.HTTPError as e:
+                log(f"Transcribed stream unavailable, polling instead: {e}", "WARNING")
+                processed = await analyze_polled(slots)
+            
+            if processed:
+                # More may have queued up meanwhile: look again right away
+                idle_polls = 0
+                continue
+            
+            # Stream ended (no change streams without a replica set, or API restart)
+            await asyncio.sleep(poll_delay(idle_polls))
+            idle_polls += 1
+            
+        except Exception as e:
+            log(f"Worker error: {e}", "ERROR")
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+async def main():
     """Main worker loop"""
     log("=" * 50)
     log("AI Analysis Worker Starting")
     log(f"API URL: {API_BASE_URL}")
     log(f"Qwen API URL: {QWEN_API_URL}")
     log(f"Target Server: {QWEN_TARGET_SERVER}")
+    log(f"Concurrent analyses: {QWEN_CONCURRENCY} (batches of {ANALYSIS_BATCH} when polling)")
     log("=" * 50)
     
-    check_qwen_api()
+    await check_qwen_api()
     
-    log(f"Polling every {POLL_INTERVAL} seconds...")
+    log(f"Watching for transcribed feedbacks (polling fallback every {MIN_POLL:g}-{MAX_POLL:g} seconds)...")
     
-    while True:
-        try:
-            # Get transcribed feedbacks
-            feedbacks = get_transcribed_feedbacks(limit=5)
-            
-            if feedbacks:
-                log(f"Found {len(feedbacks)} feedbacks to analyze")
-                for feedback in feedbacks:
-                    process_feedback(feedback)
-            
-            time.sleep(POLL_INTERVAL)
-            
-        except KeyboardInterrupt:
-            log("Shutting down...")
-            break
-        except Exception as e:
-            log(f"Worker error: {e}", "ERROR")
-            time.sleep(POLL_INTERVAL)
+    # Bounds in-flight Qwen calls so the backend isn't overloaded
+    slots = asyncio.Semaphore(QWEN_CONCURRENCY)
+    await asyncio.gather(analyze_forever(slots), flush_periodically())
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        log("Shutting down...")
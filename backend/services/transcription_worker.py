@@ -1,16 +1,33 @@
 #!/usr/bin/env python3
 """
 Transcription Worker Service
-Polls for pending feedbacks and transcribes audio using whisper.cpp
+Receives pending feedbacks (pushed by the API, or polled as a fallback)
+and transcribes audio using whisper.cpp
+
+Throughput knobs (match them to the box's cores):
+  WHISPER_CONCURRENCY  feedbacks transcribed (and claimed per poll) at once (default 2)
+  WHISPER_THREADS      threads per transcription (default: cores / WHISPER_CONCURRENCY)
 """
 import os
 import sys
+import atexit
+import queue
+import logging
+import logging.handlers
 import time
-import subprocess
+import random
+import uuid
+import hashlib
+import sqlite3
 import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
-from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -22,79 +39,278 @@ UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/data/uploads")
 WHISPER_CLI = os.getenv("WHISPER_CLI", "/opt/whisper.cpp/build/bin/whisper-cli")
 MODEL_PATH = os.getenv("WHISPER_MODEL", "/opt/whisper.cpp/models/ggml-medium.bin")
 POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", "10"))  # seconds
+MIN_POLL = float(os.getenv("MIN_POLL", str(POLL_INTERVAL)))  # first wait once the queue is empty
+MAX_POLL = float(os.getenv("MAX_POLL", "60"))  # longest wait while idle
 LANGUAGE = os.getenv("WHISPER_LANG", "hi")  # Hindi default, use 'en' for English
+# Beam search width; 1 (greedy) decodes several times faster on short clips.
+# Quantized models (e.g. ggml-medium-q5_0.bin) also cut load and decode time
+BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
+# Resident whisper.cpp server (e.g. http://127.0.0.1:8081) that keeps the model loaded
+# between jobs; empty runs whisper-cli, which reloads the model, for every feedback
+WHISPER_SERVER_URL = os.getenv("WHISPER_SERVER_URL", "").rstrip("/")
+ERROR_BODY_LIMIT = 1024  # characters of tool/server output kept in error messages
+UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes of WAV per chunk sent to whisper-server
+WHISPER_CONCURRENCY = int(os.getenv("WHISPER_CONCURRENCY", "2"))  # feedbacks transcribed at once
+# CPU threads per whisper-cli run, so concurrent runs split the cores instead of oversubscribing them
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", str(max(1, (os.cpu_count() or 1) // WHISPER_CONCURRENCY))))
+# faster-whisper (CTranslate2) model size or path, e.g. "medium"; when set it replaces
+# whisper.cpp with an in-process, quantized model (needs the faster-whisper package)
+FASTER_WHISPER_MODEL = os.getenv("FASTER_WHISPER_MODEL", "")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")  # "cuda" for GPU
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")  # "int8_float16" on CUDA
+
+# Transcripts of already-seen audio, keyed by content hash (retries and re-uploads
+# skip whisper); empty disables. Keep it out of UPLOAD_DIR, which is served as /media
+TRANSCRIPT_CACHE_DB = os.getenv("TRANSCRIPT_CACHE_DB", os.path.join(tempfile.gettempdir(), "transcript_cache.sqlite3"))
 
 # Audio extensions supported
 AUDIO_EXTENSIONS = {'.mp3', '.mp4', '.mpeg', '.mpga', '.m4a', '.wav', '.webm', '.ogg', '.flac', '.aac'}
 
 
-def log(message: str, level: str = "INFO"):
-    """Simple logging with timestamp"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] [{level}] {message}", flush=True)
+# Shared session: API calls reuse keep-alive connections instead of opening
+# one per request. Idempotent calls (status PATCHes, the stream GET) are
+# retried on transient gateway errors; claims (POST) are never retried.
+session = requests.Session()
+adapter = HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"GET", "PATCH"})
+    )
+)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
 
 
-def convert_to_wav(input_path: str, output_path: str) -> bool:
-    """Convert audio to 16kHz mono WAV for whisper"""
-    try:
-        subprocess.run(
-            [
-                "ffmpeg", "-i", input_path,
-                "-ar", "16000",  # 16kHz sample rate
-                "-ac", "1",      # Mono
-                "-c:a", "pcm_s16le",  # 16-bit PCM
-                output_path,
-                "-y"  # Overwrite
-            ],
-            capture_output=True,
-            check=True
-        )
-        return True
-    except subprocess.CalledProcessError as e:
-        log(f"FFmpeg conversion failed: {e.stderr.decode()}", "ERROR")
-        return False
+# Loaded once by check_dependencies when FASTER_WHISPER_MODEL is set
+whisper_model = None
+
+# Opened by open_transcript_cache; shared by the executor threads under the lock
+transcript_cache = None
+transcript_cache_lock = threading.Lock()
+
+
+# Log records go through a queue to a background thread that formats and
+# writes them, so logging never blocks the worker on stdout
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.setFormatter(logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)  # drain what's queued before exiting
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+logger.setLevel(logging.DEBUG)
+logger.propagate = False
+
+
+def log(message: str, level: str = "INFO"):
+    """Log a message at the given level name (INFO, WARNING, ERROR, DEBUG)"""
+    logger.log(logging.getLevelName(level), message)
 
 
 def transcribe_audio(audio_path: str) -> tuple[bool, str]:
     """
-    Transcribe audio file using whisper.cpp
+    Transcribe audio file, reusing the cached transcript of identical audio
     Returns (success, transcription_or_error)
     """
     # Check if file exists
     if not os.path.exists(audio_path):
         return False, f"Audio file not found: {audio_path}"
     
-    # Create temp WAV file
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        temp_wav = tmp.name
+    if transcript_cache is None:
+        return run_transcription(audio_path)
     
+    key = transcript_cache_key(audio_path)
+    with transcript_cache_lock:
+        row = transcript_cache.execute("SELECT text FROM transcripts WHERE key = ?", (key,)).fetchone()
+    if row:
+        log(f"Reusing cached transcription of {os.path.basename(audio_path)}")
+        return True, row[0]
+    
+    success, result = run_transcription(audio_path)
+    if success:
+        with transcript_cache_lock, transcript_cache:
+            transcript_cache.execute("INSERT OR REPLACE INTO transcripts (key, text) VALUES (?, ?)", (key, result))
+    return success, result
+
+
+def transcript_cache_key(audio_path: str) -> str:
+    """Content hash of the file plus what changes the output (model, language)"""
+    with open(audio_path, "rb") as f:
+        digest = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+    return f"{digest}:{FASTER_WHISPER_MODEL or MODEL_PATH}:{LANGUAGE}"
+
+
+def open_transcript_cache():
+    """Open (creating if needed) the transcript cache; the worker runs without it on failure"""
+    global transcript_cache
+    if not TRANSCRIPT_CACHE_DB:
+        return
     try:
-        log(f"Converting to WAV: {os.path.basename(audio_path)}")
-        if not convert_to_wav(audio_path, temp_wav):
-            return False, "Failed to convert audio to WAV"
-        
-        log(f"Running whisper transcription (lang={LANGUAGE})")
-        result = subprocess.run(
+        transcript_cache = sqlite3.connect(TRANSCRIPT_CACHE_DB, check_same_thread=False)
+        transcript_cache.execute("CREATE TABLE IF NOT EXISTS transcripts (key TEXT PRIMARY KEY, text TEXT NOT NULL)")
+    except sqlite3.Error as e:
+        log(f"Transcript cache unavailable ({TRANSCRIPT_CACHE_DB}): {e}", "WARNING")
+        transcript_cache = None
+
+
+def run_transcription(audio_path: str) -> tuple[bool, str]:
+    """Transcribe with faster-whisper, whisper-server or whisper-cli, whichever is configured"""
+    if whisper_model is not None:
+        return transcribe_with_faster_whisper(audio_path)
+    
+    if WHISPER_SERVER_URL:
+        try:
+            return transcribe_with_server(audio_path)
+        except requests.ConnectionError as e:
+            log(f"whisper-server unreachable, using whisper-cli: {e}", "WARNING")
+    
+    return transcribe_with_cli(audio_path)
+
+
+def transcribe_with_faster_whisper(audio_path: str) -> tuple[bool, str]:
+    """Transcribe with the resident faster-whisper model (decodes the file itself via PyAV)"""
+    log(f"Running faster-whisper transcription of {os.path.basename(audio_path)} (lang={LANGUAGE})")
+    try:
+        segments, _ = whisper_model.transcribe(
+            audio_path,
+            language=LANGUAGE,
+            task="translate",  # Translate to English, as whisper-cli -tr
+            beam_size=BEAM_SIZE
+        )
+        transcription = " ".join(segment.text.strip() for segment in segments).strip()
+    except Exception as e:
+        return False, f"Transcription error: {str(e)}"
+    
+    if not transcription:
+        return False, "Empty transcription result"
+    
+    return True, transcription
+
+
+def multipart_body(boundary: str, fields: dict, filename: str, content_type: str, stream):
+    """Yield a multipart/form-data body whose "file" part is read from `stream` in chunks"""
+    for name, value in fields.items():
+        yield f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    yield (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: {content_type}\r\n\r\n'
+    ).encode()
+    while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+    yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+def transcribe_with_server(audio_path: str) -> tuple[bool, str]:
+    """Transcribe via the resident whisper-server (model stays loaded between jobs)"""
+    log(f"Sending {os.path.basename(audio_path)} to whisper-server (lang={LANGUAGE})")
+    # Decode to 16kHz mono WAV (the server only reads WAV) and stream it to the
+    # server as ffmpeg produces it: the audio is never held in memory whole
+    ffmpeg = subprocess.Popen(
+        [
+            "ffmpeg", "-nostdin", "-nostats", "-v", "error",
+            "-i", audio_path,
+            "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le",
+            "-f", "wav", "-"
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE  # errors only, so it can't fill up and stall ffmpeg
+    )
+    try:
+        boundary = uuid.uuid4().hex
+        fields = {
+            "language": LANGUAGE,
+            "translate": "true",  # Translate to English, as whisper-cli -tr
+            "beam_size": str(BEAM_SIZE),
+            "response_format": "json"
+        }
+        response = session.post(
+            f"{WHISPER_SERVER_URL}/inference",
+            data=multipart_body(boundary, fields, "audio.wav", "audio/wav", ffmpeg.stdout),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=600
+        )
+        ffmpeg.wait(timeout=10)
+    except (requests.Timeout, subprocess.TimeoutExpired):
+        return False, "Transcription timed out"
+    finally:
+        if ffmpeg.poll() is None:
+            ffmpeg.kill()
+            ffmpeg.wait()
+        ffmpeg.stdout.close()
+        ffmpeg_stderr = ffmpeg.stderr.read()
+        ffmpeg.stderr.close()
+    
+    if ffmpeg.returncode != 0:
+        log(f"FFmpeg conversion failed: {ffmpeg_stderr[-2000:].decode(errors='replace')}", "ERROR")
+        return False, "Failed to convert audio to WAV"
+    if response.status_code != 200:
+        return False, f"whisper-server failed: {response.status_code} - {response.content[:ERROR_BODY_LIMIT].decode(errors='replace')}"
+    
+    transcription = orjson.loads(response.content).get("text", "").strip()
+    if not transcription:
+        return False, "Empty transcription result"
+    
+    return True, transcription
+
+
+def transcribe_with_cli(audio_path: str) -> tuple[bool, str]:
+    """Transcribe with a whisper-cli run (loads the model for this file only)"""
+    ffmpeg = whisper = None
+    try:
+        log(f"Running whisper transcription of {os.path.basename(audio_path)} (lang={LANGUAGE})")
+        # ffmpeg decodes to 16kHz mono PCM WAV on stdout, piped straight into
+        # whisper-cli's stdin: no temp WAV written to disk and read back
+        ffmpeg = subprocess.Popen(
+            [
+                "ffmpeg", "-nostdin", "-nostats", "-v", "error",
+                "-i", audio_path,
+                "-ar", "16000",  # 16kHz sample rate
+                "-ac", "1",      # Mono
+                "-c:a", "pcm_s16le",  # 16-bit PCM
+                "-f", "wav", "-"
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        whisper = subprocess.Popen(
             [
                 WHISPER_CLI,
                 "-m", MODEL_PATH,
-                "-f", temp_wav,
+                "-f", "-",  # Read the WAV from stdin
+                "-t", str(WHISPER_THREADS),
                 "-nt",  # No timestamps
                 "-l", LANGUAGE,
-                "-bs", "5",  # Beam size
+                "-bs", str(BEAM_SIZE),  # Beam size
                 "--max-context", "0",
                 "--entropy-thold", "2.8",
                 "-tr"  # Translate to English (optional, remove if you want original language)
             ],
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minute timeout
+            stdin=ffmpeg.stdout,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
         )
+        # whisper-cli owns the read end now; ffmpeg gets SIGPIPE if whisper exits early
+        ffmpeg.stdout.close()
+        
+        stdout, stderr = whisper.communicate(timeout=600)  # 10 minute timeout
+        ffmpeg_stderr = ffmpeg.stderr.read()
+        ffmpeg.wait()
         
-        if result.returncode != 0:
-            return False, f"Whisper failed: {result.stderr}"
+        if ffmpeg.returncode != 0:
+            log(f"FFmpeg conversion failed: {ffmpeg_stderr[-2000:].decode(errors='replace')}", "ERROR")
+            return False, "Failed to convert audio to WAV"
         
-        transcription = result.stdout.strip()
+        if whisper.returncode != 0:
+            return False, f"Whisper failed: {stderr[-ERROR_BODY_LIMIT:]}"  # the error is at the end of a long model-loading log
+        
+        transcription = stdout.strip()
         if not transcription:
             return False, "Empty transcription result"
         
@@ -105,15 +321,19 @@ def transcribe_audio(audio_path: str) -> tuple[bool, str]:
     except Exception as e:
         return False, f"Transcription error: {str(e)}"
     finally:
-        # Clean up temp file
-        if os.path.exists(temp_wav):
-            os.unlink(temp_wav)
+        # Never leave either side of the pipeline running
+        for process in (whisper, ffmpeg):
+            if process and process.poll() is None:
+                process.kill()
+                process.wait()
+        if ffmpeg:
+            ffmpeg.stderr.close()
 
 
 def update_transcription(feedback_id: str, transcription: str) -> bool:
     """Update feedback with transcription via API"""
     try:
-        response = requests.patch(
+        response = session.patch(
             f"{API_BASE_URL}/api/internal/feedback/{feedback_id}/transcription",
             data={"transcription": transcription},
             timeout=30
@@ -127,7 +347,7 @@ def update_transcription(feedback_id: str, transcription: str) -> bool:
 def mark_error(feedback_id: str, error_message: str) -> bool:
     """Mark feedback as errored via API"""
     try:
-        response = requests.patch(
+        response = session.patch(
             f"{API_BASE_URL}/api/internal/feedback/{feedback_id}/error",
             data={"error_message": error_message},
             timeout=30
@@ -139,21 +359,40 @@ def mark_error(feedback_id: str, error_message: str) -> bool:
 
 
 def get_pending_feedbacks(limit: int = 5) -> list:
-    """Fetch pending feedbacks from API"""
+    """Claim pending feedbacks from API (claimed ones are not handed to other workers)"""
     try:
-        response = requests.get(
-            f"{API_BASE_URL}/api/internal/pending",
+        response = session.post(
+            f"{API_BASE_URL}/api/internal/claim",
             params={"limit": limit},
             timeout=30
         )
         if response.status_code == 200:
-            return response.json()
+            return orjson.loads(response.content)
         return []
     except Exception as e:
         log(f"Failed to fetch pending feedbacks: {e}", "ERROR")
         return []
 
 
+def watch_pending_feedbacks():
+    """Yield pending feedbacks as the API pushes them; returns when the stream ends"""
+    with session.get(
+        f"{API_BASE_URL}/api/internal/watch-pending",
+        params={"max_in_flight": WHISPER_CONCURRENCY},  # claim only what the slots can start
+        stream=True,
+        timeout=(10, None)  # connect timeout only; the stream idles between uploads
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield orjson.loads(line)
+
+
+def poll_delay(idle_polls: int) -> float:
+    """Back off exponentially while idle, with jitter so workers don't poll in lockstep"""
+    return min(MIN_POLL * 2 ** min(idle_polls, 10), MAX_POLL) * random.uniform(0.8, 1.2)
+
+
 def process_feedback(feedback: dict):
     """Process a single feedback - transcribe and update"""
     feedback_id = feedback["id"]
@@ -179,8 +418,68 @@ def process_feedback(feedback: dict):
         mark_error(feedback_id, result)
 
 
+def transcribe_stream(executor: ThreadPoolExecutor) -> int:
+    """Transcribe streamed feedbacks, WHISPER_CONCURRENCY at a time"""
+    slots = threading.BoundedSemaphore(WHISPER_CONCURRENCY)
+    futures = set()
+    try:
+        # Backlog first, then new uploads as they arrive
+        feedbacks = watch_pending_feedbacks()
+        while True:
+            # Take a slot before reading: the next item is claimed as it is sent
+            slots.acquire()
+            feedback = next(feedbacks, None)
+            if feedback is None:
+                slots.release()
+                break
+            future = executor.submit(process_feedback, feedback)
+            future.add_done_callback(lambda _: slots.release())
+            futures.add(future)
+    finally:
+        # Finish what was already claimed, even if the stream dropped
+        wait(futures)
+    return len(futures)
+
+
+def transcribe_polled(executor: ThreadPoolExecutor, fetcher: ThreadPoolExecutor) -> int:
+    """Transcribe polled batches until none is left, claiming the next batch while one runs"""
+    processed = 0
+    feedbacks = get_pending_feedbacks(limit=WHISPER_CONCURRENCY)
+    while feedbacks:
+        log(f"Found {len(feedbacks)} pending feedbacks")
+        # The claim round-trip overlaps transcription instead of following it
+        next_batch = fetcher.submit(get_pending_feedbacks, limit=WHISPER_CONCURRENCY)
+        list(executor.map(process_feedback, feedbacks))
+        processed += len(feedbacks)
+        feedbacks = next_batch.result()
+    return processed
+
+
+def load_faster_whisper() -> bool:
+    """Load the faster-whisper model once; concurrent jobs share it"""
+    global whisper_model
+    try:
+        from faster_whisper import WhisperModel
+        whisper_model = WhisperModel(
+            FASTER_WHISPER_MODEL,
+            device=WHISPER_DEVICE,
+            compute_type=WHISPER_COMPUTE_TYPE,
+            cpu_threads=WHISPER_THREADS,
+            num_workers=WHISPER_CONCURRENCY  # lets the pool's threads transcribe in parallel
+        )
+    except Exception as e:
+        log(f"Cannot load faster-whisper model {FASTER_WHISPER_MODEL}: {e}", "ERROR")
+        return False
+    
+    log(f"✓ faster-whisper model loaded ({FASTER_WHISPER_MODEL}, {WHISPER_DEVICE}, {WHISPER_COMPUTE_TYPE})")
+    return True
+
+
 def check_dependencies():
     """Verify required tools are available"""
+    if FASTER_WHISPER_MODEL:
+        return load_faster_whisper()
+    
     # Check whisper-cli
     if not os.path.exists(WHISPER_CLI):
         log(f"whisper-cli not found at {WHISPER_CLI}", "ERROR")
@@ -195,7 +494,7 @@ def check_dependencies():
     
     # Check ffmpeg
     try:
-        subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
+        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
     except:
         log("ffmpeg not found in PATH", "ERROR")
         return False
@@ -213,24 +512,41 @@ def main():
     log(f"Whisper CLI: {WHISPER_CLI}")
     log(f"Model: {MODEL_PATH}")
     log(f"Language: {LANGUAGE}")
+    log(f"Concurrency: {WHISPER_CONCURRENCY} x {WHISPER_THREADS} threads")
+    if WHISPER_SERVER_URL:
+        log(f"Whisper server: {WHISPER_SERVER_URL}")
     log("=" * 50)
     
     if not check_dependencies():
         sys.exit(1)
     
-    log(f"Polling every {POLL_INTERVAL} seconds...")
+    open_transcript_cache()
+    
+    log(f"Watching for pending feedbacks (polling fallback every {MIN_POLL:g}-{MAX_POLL:g} seconds)...")
     
+    # Threads are enough: each job spends its time waiting on ffmpeg/whisper-cli subprocesses
+    executor = ThreadPoolExecutor(max_workers=WHISPER_CONCURRENCY)
+    # Claims the next polled batch while the executor is busy with the current one
+    fetcher = ThreadPoolExecutor(max_workers=1)
+    
+    idle_polls = 0
     while True:
         try:
-            # Get pending feedbacks
-            feedbacks = get_pending_feedbacks(limit=5)
+            processed = 0
+            try:
+                processed = transcribe_stream(executor)
+            except requests.RequestException as e:
+                log(f"Pending stream unavailable, polling instead: {e}", "WARNING")
+                processed = transcribe_polled(executor, fetcher)
             
-            if feedbacks:
-                log(f"Found {len(feedbacks)} pending feedbacks")
-                for feedback in feedbacks:
-                    process_feedback(feedback)
+            if processed:
+                # More may have queued up meanwhile: look again right away
+                idle_polls = 0
+                continue
             
-            time.sleep(POLL_INTERVAL)
+            # Stream ended (no change streams without a replica set, or API restart)
+            time.sleep(poll_delay(idle_polls))
+            idle_polls += 1
             
         except KeyboardInterrupt:
             log("Shutting down...")
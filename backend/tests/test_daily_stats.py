@@ -0,0 +1,57 @@
+"""
+daily_stats rollups against a real MongoDB (MONGO_URI, skipped when unreachable)
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+
+from app.daily_stats import refresh_daily_stats
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+
+
+async def refresh_and_read(feedbacks: list) -> dict:
+    client = pymongo.AsyncMongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        await client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        await client.close()
+        pytest.skip(f"MongoDB not reachable at {MONGO_URI}")
+
+    db = client[f"test_daily_stats_{uuid.uuid4().hex}"]
+    try:
+        await db.feedbacks.insert_many(feedbacks)
+        await refresh_daily_stats(db, {})
+        return await db.daily_stats.find_one({"recorded_date": "2024-01-15", "store_code": "S001"})
+    finally:
+        await client.drop_database(db.name)
+        await client.close()
+
+
+def test_scalar_tone_is_counted():
+    row = asyncio.run(refresh_and_read([
+        {
+            "recorded_date": "2024-01-15",
+            "store_code": "S001",
+            "status": "completed",
+            "analysis": {"tone": "positive", "products": ["sandals"], "issues": [], "actions": []},
+        },
+        {
+            "recorded_date": "2024-01-15",
+            "store_code": "S001",
+            "status": "completed",
+            "analysis": {"tone": "positive", "products": ["sandals", "school shoes"]},
+        },
+        # Not completed: counted in the total only
+        {"recorded_date": "2024-01-15", "store_code": "S001", "status": "pending"},
+    ]))
+
+    assert row["total"] == 3
+    assert row["tone_distribution"] == [{"name": "positive", "count": 2}]
+    assert sorted((item["name"], item["count"]) for item in row["top_products"]) == [
+        ("sandals", 2), ("school shoes", 1)
+    ]
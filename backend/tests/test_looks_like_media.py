@@ -0,0 +1,39 @@
+"""
+looks_like_media: upload content sniffing on the legacy API
+"""
+import pytest
+
+from app.main import looks_like_media
+
+
+@pytest.mark.parametrize("head", [
+    b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81",              # WebM / Matroska
+    b"OggS\x00\x02\x00\x00",                          # Ogg
+    b"fLaC\x00\x00\x00\x22",                          # FLAC
+    b"ID3\x04\x00\x00\x00\x00",                       # MP3 with ID3 tag
+    b"\x00\x00\x01\xba\x44\x00\x04\x00",              # MPEG program stream
+    b"RIFF\x24\x08\x00\x00WAVEfmt ",                  # WAV
+    b"RIFF\x24\x08\x00\x00AVI LIST",                  # AVI
+    b"\x00\x00\x00\x20ftypM4A \x00\x00\x00\x00",      # M4A
+    b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00",      # MP4
+    b"\x00\x00\x00\x08wide\x00\x00\x00\x00",          # QuickTime
+    b"\xff\xfb\x90\x64\x00\x00\x00\x00",              # MPEG audio frame
+    b"\xff\xf1\x50\x80\x02\x1f\xfc\x00",              # ADTS AAC
+])
+def test_media_signatures_are_accepted(head):
+    assert looks_like_media(head)
+
+
+@pytest.mark.parametrize("head", [
+    b"",
+    b"\xff",
+    b"\xff\xd8\xff\xe0\x00\x10JFIF",                  # JPEG: 0xFF without a frame sync
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0d",             # PNG
+    b"RIFF\x24\x08\x00\x00WEBPVP8 ",                  # RIFF, but a WebP image
+    b"%PDF-1.7\n%\xe2\xe3\xcf\xd3",                   # PDF
+    b"PK\x03\x04\x14\x00\x00\x00",                    # ZIP
+    b"<!DOCTYPE html><html>",                         # HTML
+    b"#!/bin/sh\nrm -rf /tmp/x\n",                    # Script
+])
+def test_other_content_is_rejected(head):
+    assert not looks_like_media(head)
@@ -0,0 +1,55 @@
+"""
+read_streamed_content: stops at the close of the first top-level JSON value
+"""
+import asyncio
+
+import httpx
+import orjson
+
+from services.analysis_worker import read_streamed_content
+
+
+def sse_response(*deltas: str) -> httpx.Response:
+    lines = [
+        b"data: " + orjson.dumps({"choices": [{"delta": {"content": delta}}]})
+        for delta in deltas
+    ]
+    return httpx.Response(200, content=b"\n\n".join(lines + [b"data: [DONE]"]) + b"\n\n")
+
+
+def read(*deltas: str, opener: str = "{") -> str:
+    return asyncio.run(read_streamed_content(sse_response(*deltas), opener))
+
+
+def test_stops_after_the_closing_brace():
+    assert read('{"tone": ', '"positive"}', '\nThat is the analysis.') == '{"tone": "positive"}'
+
+
+def test_braces_and_brackets_inside_strings_are_ignored():
+    content = '{"summary": "asked for {size 9} and [black]", "issues": ["stock}"]}'
+    assert read(content[:20], content[20:], " trailing") == content
+
+
+def test_escaped_quote_does_not_end_the_string():
+    content = r'{"summary": "customer said \"no } thanks\"", "tone": "neutral"}'
+    assert read(content[:30], content[30:], "{}") == content
+
+
+def test_escape_split_across_chunks():
+    content = r'{"summary": "a \"}\" b"}'
+    split = content.index("\\") + 1
+    assert read(content[:split], content[split:], " extra") == content
+
+
+def test_bracket_opener_for_batches():
+    content = '[{"id": 0, "tone": "positive"}, {"id": 1, "tone": "negative"}]'
+    assert read(content[:31], content[31:], "\n[]", opener="[") == content
+
+
+def test_prose_and_code_fence_before_the_json():
+    prefix = 'Here is the analysis:\n```json\n'
+    assert read(prefix, '{"tone": "positive"}', "\n```") == prefix + '{"tone": "positive"}'
+
+
+def test_unclosed_value_reads_to_the_end():
+    assert read('{"tone": ', '"positive"') == '{"tone": "positive"'
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Background Worker for Store Feedback System
-Processes pending transcriptions and LLM analyses
+Processes pending transcriptions and LLM analyses as soon as they are
+written (MongoDB change stream), polling instead without a replica set
 
 Run with: python worker.py
 Or with PM2: pm2 start worker.py --interpreter python3 --name feedback-worker
@@ -10,17 +11,28 @@ import os
 import sys
 import asyncio
 import subprocess
-import json
 import logging
+import re
+import uuid
+import random
+import socket
+import hashlib
+import tempfile
+import time
+import functools
 from pathlib import Path
-from datetime import datetime
-from typing import Optional, Tuple
+from datetime import UTC, datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
 
 from dotenv import load_dotenv
 import httpx
-from motor.motor_asyncio import AsyncIOMotorClient
+import orjson
+from pymongo import AsyncMongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError
 from bson import ObjectId
 
+from app.daily_stats import refresh_daily_stats
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -33,15 +45,67 @@ UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/data/uploads")
 WHISPER_CLI = os.getenv("WHISPER_CLI", os.path.expanduser("~/whisper.cpp/build/bin/whisper-cli"))
 WHISPER_MODEL = os.getenv("WHISPER_MODEL", os.path.expanduser("~/whisper.cpp/models/ggml-medium.bin"))
 WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE", "hi")  # Hindi
+# Beam search width; 1 (greedy) decodes several times faster on short clips.
+# Quantized models (e.g. ggml-medium-q5_0.bin) also cut load and decode time
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
+# faster-whisper model (size like "medium" or a CTranslate2 model dir): decodes
+# (PyAV) and transcribes in this process, with no ffmpeg/whisper-cli processes
+# per clip; needs the faster-whisper package. Empty uses whisper.cpp
+FASTER_WHISPER_MODEL = os.getenv("FASTER_WHISPER_MODEL", "")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")  # "cuda" for GPU
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")  # "int8_float16" on CUDA
+# Resident whisper.cpp server (e.g. http://127.0.0.1:8081, started with
+# `whisper-server -m $WHISPER_MODEL`) that keeps the model loaded between
+# jobs; empty runs whisper-cli, which loads the model on every run
+WHISPER_SERVER_URL = os.getenv("WHISPER_SERVER_URL", "").rstrip("/")
+UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes of WAV per chunk sent to whisper-server
+
+# ffmpeg drops leading silence and pauses over half a second (keeping a short
+# gap between words), so whisper decodes less audio and sees less noise to
+# hallucinate on. Louder background noise than SILENCE_THRESHOLD counts as sound.
+SILENCE_THRESHOLD = os.getenv("SILENCE_THRESHOLD", "-45dB")
+SPEECH_FILTER = (
+    f"silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD}"
+    f":stop_periods=-1:stop_duration=0.5:stop_threshold={SILENCE_THRESHOLD}:stop_silence=0.2"
+)
+MIN_SPEECH_BYTES = 44 + 16000  # WAV header + 0.5s of 16kHz 16-bit mono (32000 bytes/s)
+
+# Directory for the WAVs of batched clips (whisper-cli reads several inputs only
+# from files); a tmpfs such as /dev/shm keeps them in memory, off the disk.
+# Empty uses the system temp dir
+WAV_TEMP_DIR = os.getenv("WAV_TEMP_DIR") or None
+
+# Clips with more speech than LONG_AUDIO_SECONDS are split by whisper-cli into
+# WHISPER_PROCESSORS parts decoded in parallel (one model in memory, shared)
+LONG_AUDIO_SECONDS = int(os.getenv("LONG_AUDIO_SECONDS", "60"))
+WHISPER_PROCESSORS = int(os.getenv("WHISPER_PROCESSORS", "4"))
+# CPU threads per whisper run, split between its processors (whisper.cpp
+# itself defaults to 4 threads, leaving most cores of a big host idle)
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", str(os.cpu_count() or 1)))
+WHISPER_FLASH_ATTN = os.getenv("WHISPER_FLASH_ATTN", "false").lower() == "true"  # GPU builds only
+# Seconds between saves of a clip's transcript so far (transcription_partial)
+# while whisper-cli runs; 0 disables. whisper-cli prints only the first of its
+# -p parts as it decodes (the rest at the end), so clips saving partials run
+# with one processor: live progress on long clips at the cost of their speedup
+PARTIAL_TRANSCRIPT_INTERVAL = int(os.getenv("PARTIAL_TRANSCRIPT_INTERVAL", "0"))
 
 # Qwen3 API configuration
 QWEN_API_URL = os.getenv("QWEN_API_URL", "https://kwen.tarsyer.com/v1/chat/completions")
 QWEN_API_KEY = os.getenv("QWEN_API_KEY", "Tarsyer-key-1")
 QWEN_TARGET_SERVER = os.getenv("QWEN_TARGET_SERVER", "BK")
 
+# Transient Qwen failures (timeouts, connection errors, these statuses) are retried
+QWEN_RETRIES = int(os.getenv("QWEN_RETRIES", "4"))
+QWEN_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Feedbacks whose analysis still fails transiently go back to the queue this many times
+MAX_ANALYSIS_ATTEMPTS = int(os.getenv("MAX_ANALYSIS_ATTEMPTS", "3"))
+
 # Worker settings
-POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", "30"))  # seconds
-MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT", "2"))
+POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", "30"))  # seconds, only without change streams
+MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT", "2"))  # feedbacks transcribed per whisper run
+MAX_CONCURRENT_LLM = int(os.getenv("MAX_CONCURRENT_LLM", "10"))  # Qwen calls in flight at once
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"  # recorded on claimed feedbacks
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "604800"))  # seconds an analysis is reused for
 
 # Logging
 logging.basicConfig(
@@ -51,7 +115,13 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # MongoDB client
-db_client: Optional[AsyncIOMotorClient] = None
+db_client: Optional[AsyncMongoClient] = None
+
+# faster-whisper model, loaded once in main() when FASTER_WHISPER_MODEL is set
+whisper_model = None
+
+# Qwen API client, shared so calls reuse warm keep-alive connections
+http_client: Optional[httpx.AsyncClient] = None
 
 
 # ============ LLM Prompt ============
@@ -81,15 +151,26 @@ Respond ONLY with valid JSON, no other text. Example:
 }"""
 
 
+# Sent byte-identical as the system message of every call (the transcription
+# goes only in the user message), so a prefix-caching gateway (e.g. vLLM) can
+# reuse its prefill; the key names that prefix for gateways that route by it
+SYSTEM_MESSAGE = {"role": "system", "content": ANALYSIS_PROMPT}
+PROMPT_CACHE_KEY = hashlib.sha1(ANALYSIS_PROMPT.encode()).hexdigest()
+
+
 # ============ Transcription ============
 
-async def transcribe_audio(audio_path: str) -> Tuple[bool, str]:
+async def transcribe_audio(
+    audio_path: str,
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Tuple[bool, str]:
     """
     Transcribe audio file using whisper.cpp
+    on_partial, if given, receives the transcript so far while whisper-cli runs
     Returns: (success, transcription_or_error)
     """
     audio_path = Path(audio_path)
-    temp_wav = None
+    convert_proc = whisper_proc = None
     
     try:
         logger.info(f"Transcribing: {audio_path.name}")
@@ -104,44 +185,76 @@ async def transcribe_audio(audio_path: str) -> Tuple[bool, str]:
         if not Path(WHISPER_MODEL).exists():
             return False, f"Whisper model not found: {WHISPER_MODEL}"
         
-        # Convert to WAV (16kHz mono) for whisper
-        temp_wav = audio_path.parent / f"{audio_path.stem}_temp_{os.getpid()}.wav"
-        
-        logger.debug("Converting to WAV...")
-        convert_proc = await asyncio.create_subprocess_exec(
-            "ffmpeg", "-i", str(audio_path),
-            "-ar", "16000", "-ac", "1",
-            "-c:a", "pcm_s16le",
-            str(temp_wav), "-y",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        stream_partials = on_partial is not None and PARTIAL_TRANSCRIPT_INTERVAL > 0
+        # Split long clips across processors, unless their partials should stream
+        processors = 1 if stream_partials else WHISPER_PROCESSORS
+        if processors > 1 and await audio_duration(audio_path) <= LONG_AUDIO_SECONDS:
+            processors = 1
+        
+        # ffmpeg decodes to 16kHz mono WAV into a pipe that whisper-cli reads as
+        # stdin: both run at once and no temp WAV is written to disk and read back
+        logger.debug("Running ffmpeg | whisper...")
+        read_fd, write_fd = os.pipe()
+        try:
+            # Errors only on stderr (no banner or progress stats), read just on failure
+            convert_proc = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-nostdin", "-nostats", "-v", "error",
+                "-i", str(audio_path),
+                "-ar", "16000", "-ac", "1",
+                "-c:a", "pcm_s16le",
+                "-af", SPEECH_FILTER,
+                "-f", "wav", "-",
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=write_fd,
+                stderr=asyncio.subprocess.PIPE
+            )
+            whisper_proc = await asyncio.create_subprocess_exec(
+                WHISPER_CLI,
+                "-m", WHISPER_MODEL,
+                "-f", "-",  # Read the WAV from stdin
+                *whisper_cli_tuning(processors),
+                "-nt",  # No timestamps
+                "-l", WHISPER_LANGUAGE,
+                "-bs", str(WHISPER_BEAM_SIZE),
+                "--max-context", "0",
+                "--entropy-thold", "2.8",
+                "-tr",  # Translate to English
+                stdin=read_fd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        finally:
+            # The children hold their own ends; whisper-cli sees EOF when ffmpeg exits
+            os.close(read_fd)
+            os.close(write_fd)
+        
+        async def read_transcript() -> bytes:
+            # With one processor, segments arrive on stdout as they are decoded
+            text = bytearray()
+            saved_at = time.monotonic()
+            while chunk := await whisper_proc.stdout.read(4096):
+                text += chunk
+                if stream_partials and time.monotonic() - saved_at >= PARTIAL_TRANSCRIPT_INTERVAL:
+                    saved_at = time.monotonic()
+                    try:
+                        await on_partial(text.decode(errors="ignore").strip())
+                    except Exception as e:
+                        logger.warning(f"Could not save partial transcript: {e}")
+            return bytes(text)
+        
+        (_, convert_err), stdout, stderr, _ = await asyncio.gather(
+            convert_proc.communicate(), read_transcript(), whisper_proc.stderr.read(), whisper_proc.wait()
         )
-        _, stderr = await convert_proc.communicate()
         
         if convert_proc.returncode != 0:
-            return False, f"FFmpeg error: {stderr.decode()[:500]}"
-        
-        # Run whisper transcription
-        logger.debug("Running whisper...")
-        whisper_proc = await asyncio.create_subprocess_exec(
-            WHISPER_CLI,
-            "-m", WHISPER_MODEL,
-            "-f", str(temp_wav),
-            "-nt",  # No timestamps
-            "-l", WHISPER_LANGUAGE,
-            "-bs", "5",
-            "--max-context", "0",
-            "--entropy-thold", "2.8",
-            "-tr",  # Translate to English
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await whisper_proc.communicate()
+            return False, f"FFmpeg error: {convert_err[-500:].decode(errors='replace')}"
         
         if whisper_proc.returncode != 0:
-            return False, f"Whisper error: {stderr.decode()[:500]}"
+            return False, f"Whisper error: {stderr[-500:].decode(errors='replace')}"
         
         transcription = stdout.decode().strip()
+        if not transcription:
+            return False, "No speech detected"
         logger.info(f"Transcription complete: {len(transcription)} chars")
         
         return True, transcription
@@ -151,11 +264,269 @@ async def transcribe_audio(audio_path: str) -> Tuple[bool, str]:
         return False, str(e)
         
     finally:
-        if temp_wav and temp_wav.exists():
-            try:
-                temp_wav.unlink()
-            except:
-                pass
+        # Never leave either side of the pipeline running
+        for proc in (whisper_proc, convert_proc):
+            if proc and proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+
+async def transcribe_with_server(audio_path: str) -> Tuple[bool, str]:
+    """
+    Transcribe via the resident whisper-server, streaming ffmpeg's WAV output
+    to it as it is decoded
+    Raises httpx.ConnectError if the server is unreachable
+    """
+    audio_path = Path(audio_path)
+    if not audio_path.exists():
+        return False, f"Audio file not found: {audio_path}"
+    
+    logger.info(f"Transcribing via whisper-server: {audio_path.name}")
+    convert_proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-nostdin", "-nostats", "-v", "error",
+        "-i", str(audio_path),
+        "-ar", "16000", "-ac", "1",
+        "-c:a", "pcm_s16le",
+        "-af", SPEECH_FILTER,
+        "-f", "wav", "-",
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    
+    boundary = uuid.uuid4().hex
+    fields = {
+        "language": WHISPER_LANGUAGE,
+        "translate": "true",  # Translate to English, as whisper-cli -tr
+        "beam_size": str(WHISPER_BEAM_SIZE),
+        "response_format": "json"
+    }
+    
+    async def multipart_body():
+        for name, value in fields.items():
+            yield f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        yield (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="audio.wav"\r\n'
+            f'Content-Type: audio/wav\r\n\r\n'
+        ).encode()
+        while chunk := await convert_proc.stdout.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+        yield f'\r\n--{boundary}--\r\n'.encode()
+    
+    try:
+        response = await http_client.post(
+            f"{WHISPER_SERVER_URL}/inference",
+            content=multipart_body(),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=600
+        )
+        # ffmpeg is done once its output was sent; it only lingers if the server answered early
+        await asyncio.wait_for(convert_proc.wait(), 10)
+        convert_err = await convert_proc.stderr.read()
+    except (httpx.TimeoutException, asyncio.TimeoutError):
+        return False, "Whisper server timeout"
+    finally:
+        if convert_proc.returncode is None:
+            convert_proc.kill()
+            await convert_proc.wait()
+    
+    if convert_proc.returncode != 0:
+        return False, f"FFmpeg error: {convert_err[-500:].decode(errors='replace')}"
+    
+    if response.status_code != 200:
+        return False, f"Whisper server error {response.status_code}: {response.content[:500].decode(errors='replace')}"
+    
+    transcription = orjson.loads(response.content).get("text", "").strip()
+    if not transcription:
+        return False, "No speech detected"
+    logger.info(f"Transcription complete: {len(transcription)} chars")
+    return True, transcription
+
+
+async def transcribe_in_process(audio_path: str) -> Tuple[bool, str]:
+    """Transcribe with the resident faster-whisper model (PyAV decodes the file in-process)"""
+    if not Path(audio_path).exists():
+        return False, f"Audio file not found: {audio_path}"
+    
+    def run() -> str:
+        segments, _ = whisper_model.transcribe(
+            audio_path,
+            language=WHISPER_LANGUAGE,
+            task="translate",  # Translate to English, as whisper-cli -tr
+            beam_size=WHISPER_BEAM_SIZE,
+            vad_filter=True  # Silero VAD skips silence, like the ffmpeg filter does for whisper.cpp
+        )
+        return " ".join(segment.text.strip() for segment in segments).strip()
+    
+    logger.info(f"Transcribing in-process: {Path(audio_path).name}")
+    try:
+        # Off the event loop; CTranslate2 releases the GIL while decoding
+        transcription = await asyncio.to_thread(run)
+    except Exception as e:
+        logger.exception("Transcription error")
+        return False, str(e)
+    
+    if not transcription:
+        return False, "No speech detected"
+    logger.info(f"Transcription complete: {len(transcription)} chars")
+    return True, transcription
+
+
+async def transcribe(
+    audio_path: str,
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Tuple[bool, str]:
+    """Transcribe with faster-whisper or whisper-server when configured, else whisper-cli"""
+    if whisper_model is not None:
+        return await transcribe_in_process(audio_path)
+    
+    if WHISPER_SERVER_URL:
+        try:
+            return await transcribe_with_server(audio_path)
+        except httpx.ConnectError as e:
+            logger.warning(f"whisper-server unreachable, using whisper-cli: {e}")
+    return await transcribe_audio(audio_path, on_partial)
+
+
+async def audio_duration(audio_path: Path) -> float:
+    """Duration of an audio file in seconds (0 if ffprobe can't tell)"""
+    probe_proc = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        str(audio_path),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    stdout, _ = await probe_proc.communicate()
+    try:
+        return float(stdout)
+    except ValueError:
+        return 0.0
+
+
+def whisper_cli_tuning(processors: int) -> List[str]:
+    """whisper-cli processor, thread and flash-attention flags for one run"""
+    args = ["-p", str(processors), "-t", str(max(1, WHISPER_THREADS // processors))]
+    if WHISPER_FLASH_ATTN:
+        args.append("-fa")
+    return args
+
+
+async def run_whisper_cli(wav_paths: List[Path], processors: int = 1) -> str:
+    """Transcribe WAV files into <wav>.txt files with one whisper-cli run; returns the error, if any"""
+    whisper_proc = await asyncio.create_subprocess_exec(
+        WHISPER_CLI,
+        "-m", WHISPER_MODEL,
+        *(arg for wav_path in wav_paths for arg in ("-f", str(wav_path))),
+        *whisper_cli_tuning(processors),
+        "-otxt",  # Each input's text goes to <input>.txt
+        "-np",  # No progress/results on stdout
+        "-nt",  # No timestamps
+        "-l", WHISPER_LANGUAGE,
+        "-bs", str(WHISPER_BEAM_SIZE),
+        "--max-context", "0",
+        "--entropy-thold", "2.8",
+        "-tr",  # Translate to English
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await whisper_proc.communicate()
+    if whisper_proc.returncode != 0:
+        return stderr[-500:].decode(errors="replace")
+    return ""
+
+
+async def convert_to_wav(audio_path: Path, wav_path: Path) -> Optional[str]:
+    """Decode audio to a 16kHz mono WAV file; returns the error on failure"""
+    if not audio_path.exists():
+        return f"Audio file not found: {audio_path}"
+    
+    convert_proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-nostdin", "-nostats", "-v", "error",
+        "-i", str(audio_path),
+        "-ar", "16000", "-ac", "1",
+        "-c:a", "pcm_s16le",
+        "-af", SPEECH_FILTER,
+        str(wav_path), "-y",
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await convert_proc.communicate()
+    
+    if convert_proc.returncode != 0:
+        return f"FFmpeg error: {stderr[-500:].decode(errors='replace')}"
+    if wav_path.stat().st_size < MIN_SPEECH_BYTES:
+        # Silence (or noise under the threshold) only: not worth a whisper pass
+        return "No speech detected"
+    return None
+
+
+async def transcribe_batch(
+    audio_paths: List[str],
+    on_partial: Optional[Callable[[int, str], Awaitable[None]]] = None
+) -> List[Tuple[bool, str]]:
+    """
+    Transcribe several audio files with one whisper-cli run, so the model is
+    loaded once per batch instead of once per file
+    on_partial(index, text) receives partial transcripts of files transcribed
+    on their own
+    Returns: (success, transcription_or_error) per file, in order
+    """
+    if len(audio_paths) == 1 or whisper_model is not None or WHISPER_SERVER_URL:
+        # Nothing to amortize (one file, or the model is resident already):
+        # transcribe each file on its own, without temp files
+        return list(await asyncio.gather(*(
+            transcribe(audio_path, on_partial and functools.partial(on_partial, index))
+            for index, audio_path in enumerate(audio_paths)
+        )))
+    
+    if not Path(WHISPER_CLI).exists():
+        return [(False, f"Whisper CLI not found: {WHISPER_CLI}")] * len(audio_paths)
+    
+    if not Path(WHISPER_MODEL).exists():
+        return [(False, f"Whisper model not found: {WHISPER_MODEL}")] * len(audio_paths)
+    
+    logger.info(f"Transcribing batch of {len(audio_paths)} files")
+    
+    with tempfile.TemporaryDirectory(prefix="transcribe_", dir=WAV_TEMP_DIR) as tmp_dir:
+        wav_paths = [Path(tmp_dir) / f"{i}.wav" for i in range(len(audio_paths))]
+        
+        # whisper-cli takes several inputs only as WAV files: convert them all at once
+        errors = await asyncio.gather(*(
+            convert_to_wav(Path(audio_path), wav_path)
+            for audio_path, wav_path in zip(audio_paths, wav_paths)
+        ))
+        inputs = [wav_path for wav_path, error in zip(wav_paths, errors) if error is None]
+        
+        # Speech left after silence removal (16kHz 16-bit mono = 32000 bytes/s)
+        long_inputs = [wav_path for wav_path in inputs if wav_path.stat().st_size / 32000 > LONG_AUDIO_SECONDS]
+        short_inputs = [wav_path for wav_path in inputs if wav_path not in long_inputs]
+        
+        whisper_errors = {}
+        if short_inputs:
+            error = await run_whisper_cli(short_inputs)
+            whisper_errors.update(dict.fromkeys(short_inputs, error))
+        for wav_path in long_inputs:
+            whisper_errors[wav_path] = await run_whisper_cli([wav_path], WHISPER_PROCESSORS)
+        
+        results = []
+        for wav_path, error in zip(wav_paths, errors):
+            txt_path = wav_path.with_name(wav_path.name + ".txt")
+            if error:
+                results.append((False, error))
+            elif txt_path.exists():
+                # One line per segment
+                lines = txt_path.read_text().splitlines()
+                results.append((True, " ".join(line.strip() for line in lines if line.strip())))
+            else:
+                results.append((False, f"Whisper error: {whisper_errors[wav_path] or 'no output'}"))
+    
+    logger.info(f"Batch transcription complete: {sum(ok for ok, _ in results)}/{len(results)} succeeded")
+    return results
 
 
 # ============ LLM Analysis ============
@@ -172,7 +543,7 @@ async def analyze_transcription(transcription: str) -> Tuple[bool, dict]:
         payload = {
             "target_server": QWEN_TARGET_SERVER,
             "messages": [
-                {"role": "system", "content": ANALYSIS_PROMPT},
+                SYSTEM_MESSAGE,
                 {"role": "user", "content": f"Analyze this store feedback transcription:\n\n{transcription}"}
             ],
             "max_tokens": 1000,
@@ -181,18 +552,38 @@ async def analyze_transcription(transcription: str) -> Tuple[bool, dict]:
         
         headers = {
             "Content-Type": "application/json",
-            "X-API-Key": QWEN_API_KEY
+            "X-API-Key": QWEN_API_KEY,
+            "X-Prompt-Cache-Key": PROMPT_CACHE_KEY
         }
         
         logger.debug("Calling Qwen3 API...")
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(QWEN_API_URL, json=payload, headers=headers)
+        # Encoded once with orjson (not httpx's stdlib json) and reused by retries
+        body = orjson.dumps(payload)
+        for attempt in range(QWEN_RETRIES + 1):
+            try:
+                response = await http_client.post(QWEN_API_URL, content=body, headers=headers)
+            except httpx.TimeoutException:
+                error = "API timeout"
+            except httpx.TransportError as e:
+                error = f"API connection error: {e}"
+            else:
+                if response.status_code not in QWEN_RETRY_STATUSES:
+                    break
+                error = f"API error {response.status_code}: {response.content[:200].decode(errors='replace')}"
+            
+            if attempt < QWEN_RETRIES:
+                # Exponential backoff with jitter so a batch doesn't retry in lockstep
+                delay = min(2 ** attempt, 30) + random.random()
+                logger.warning(f"{error}; retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        else:
+            return False, {"error": error, "retryable": True}
         
         if response.status_code != 200:
-            return False, {"error": f"API error {response.status_code}: {response.text[:200]}"}
+            return False, {"error": f"API error {response.status_code}: {response.content[:200].decode(errors='replace')}"}
         
-        result = response.json()
+        result = orjson.loads(response.content)
         
         # Extract content from response
         content = ""
@@ -215,162 +606,276 @@ async def analyze_transcription(transcription: str) -> Tuple[bool, dict]:
         logger.info(f"Analysis complete: tone={analysis.get('tone')}")
         return True, analysis
         
-    except httpx.TimeoutException:
-        return False, {"error": "API timeout"}
     except Exception as e:
         logger.exception("Analysis error")
         return False, {"error": str(e)}
 
 
-def parse_json_response(content: str) -> Optional[dict]:
-    """Parse JSON from API response, handling markdown blocks"""
-    content = content.strip()
-    
-    # Remove markdown code blocks
-    if content.startswith("```json"):
-        content = content[7:]
-    elif content.startswith("```"):
-        content = content[3:]
-    if content.endswith("```"):
-        content = content[:-3]
-    
-    content = content.strip()
+def analysis_cache_key(transcription: str) -> str:
+    """Hash of the prompt and transcription, so a prompt change never reuses old analyses"""
+    return hashlib.sha256(f"{ANALYSIS_PROMPT}\0{transcription.strip()}".encode()).hexdigest()
+
+
+async def analyze_cached(db, transcription: str) -> Tuple[bool, dict]:
+    """analyze_transcription, reusing the stored analysis of an identical transcription"""
+    key = analysis_cache_key(transcription)
+    cached = await db.analysis_cache.find_one({"_id": key}, {"analysis": 1})
+    if cached:
+        logger.info("Reusing cached analysis")
+        return True, cached["analysis"]
     
+    success, result = await analyze_transcription(transcription)
+    if success:
+        await db.analysis_cache.update_one(
+            {"_id": key},
+            {"$set": {"analysis": result, "created_at": datetime.now(UTC)}},
+            upsert=True
+        )
+    return success, result
+
+
+# Outermost {...} in a reply: skips code fences and any prose around the JSON
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.S)
+
+
+def parse_json_response(content: str) -> Optional[dict]:
+    """Parse the JSON object from an API response, handling markdown blocks"""
+    match = JSON_OBJECT_RE.search(content)
+    if not match:
+        return None
     try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        # Try to find JSON object
-        start = content.find("{")
-        end = content.rfind("}") + 1
-        if start >= 0 and end > start:
-            try:
-                return json.loads(content[start:end])
-            except:
-                pass
-    return None
+        return orjson.loads(match.group())
+    except orjson.JSONDecodeError:
+        return None
+
+
+VALID_TONES = frozenset({"positive", "negative", "neutral"})
+
+
+def clamp_list(items, max_len: int, max_items: int) -> list:
+    """First `max_items` entries as strings of at most `max_len` chars"""
+    if not isinstance(items, list):
+        return []
+    return [str(item)[:max_len] for item in items[:max_items]]
 
 
 def normalize_analysis(analysis: dict) -> dict:
     """Normalize and validate analysis output"""
-    tone = analysis.get("tone", "neutral").lower()
-    if tone not in ["positive", "negative", "neutral"]:
+    tone = str(analysis.get("tone", "neutral")).lower()
+    if tone not in VALID_TONES:
         tone = "neutral"
     
+    try:
+        tone_score = min(1.0, max(0.0, float(analysis.get("tone_score", 0.5))))
+    except (TypeError, ValueError):
+        tone_score = 0.5
+    
     return {
         "summary": str(analysis.get("summary", ""))[:500],
         "tone": tone,
-        "tone_score": min(1.0, max(0.0, float(analysis.get("tone_score", 0.5)))),
-        "products": [str(p)[:100] for p in analysis.get("products", [])][:5],
-        "issues": [str(i)[:200] for i in analysis.get("issues", [])][:5],
-        "actions": [str(a)[:200] for a in analysis.get("actions", [])][:5],
-        "keywords": [str(k)[:50] for k in analysis.get("keywords", [])][:10]
+        "tone_score": tone_score,
+        "products": clamp_list(analysis.get("products"), 100, 5),
+        "issues": clamp_list(analysis.get("issues"), 200, 5),
+        "actions": clamp_list(analysis.get("actions"), 200, 5),
+        "keywords": clamp_list(analysis.get("keywords"), 50, 10)
     }
 
 
 # ============ Worker Loop ============
 
-async def process_pending():
-    """Process all pending feedbacks"""
-    db = db_client[DB_NAME]
-    
-    # Process pending transcriptions
-    pending_transcription = await db.feedbacks.find(
-        {"status": "pending"}
-    ).limit(MAX_CONCURRENT).to_list(length=MAX_CONCURRENT)
-    
-    for doc in pending_transcription:
-        feedback_id = doc["_id"]
-        filename = doc.get("media_filename", "")
-        filepath = Path(UPLOAD_DIR) / filename
-        
-        logger.info(f"Processing transcription for {feedback_id}")
-        
-        # Mark as processing
-        await db.feedbacks.update_one(
-            {"_id": feedback_id},
-            {"$set": {"status": "transcribing", "updated_at": datetime.utcnow()}}
+# New uploads, finished transcriptions and retries (status set back to pending/transcribed)
+WORK_CHANGES = {
+    "$or": [
+        {"operationType": "insert"},
+        {"updateDescription.updatedFields.status": {"$in": ["pending", "transcribed"]}}
+    ]
+}
+
+
+async def claim_feedbacks(db, query: dict, claimed_status: str, limit: int) -> List[dict]:
+    """
+    Atomically move up to `limit` of the oldest feedbacks matching `query` to
+    `claimed_status`, so concurrent workers never get the same feedback
+    """
+    claimed = []
+    now = datetime.now(UTC)
+    for _ in range(limit):
+        doc = await db.feedbacks.find_one_and_update(
+            query,
+            {"$set": {"status": claimed_status, "worker_id": WORKER_ID, "claimed_at": now, "updated_at": now}},
+            sort=[("created_at", 1)],  # served by the API's (status, created_at) index
+            return_document=ReturnDocument.AFTER
         )
+        if doc is None:
+            break
+        claimed.append(doc)
+    return claimed
+
+
+async def process_transcriptions(db) -> int:
+    """Transcribe a batch of pending feedbacks; returns how many were picked up"""
+    pending_transcription = await claim_feedbacks(db, {"status": "pending"}, "transcribing", MAX_CONCURRENT)
+    
+    if pending_transcription:
+        feedback_ids = [doc["_id"] for doc in pending_transcription]
         
-        success, result = await transcribe_audio(str(filepath))
+        logger.info(f"Processing transcription for {len(feedback_ids)} feedbacks")
         
-        if success:
+        async def save_partial(index: int, text: str):
+            # Lets the dashboard show a clip's transcript while it is decoded
             await db.feedbacks.update_one(
-                {"_id": feedback_id},
-                {
-                    "$set": {
-                        "transcription": result,
-                        "status": "transcribed",
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+                {"_id": feedback_ids[index], "status": "transcribing"},
+                {"$set": {"transcription_partial": text, "updated_at": datetime.now(UTC)}}
             )
-        else:
-            await db.feedbacks.update_one(
+        
+        results = await transcribe_batch([
+            str(Path(UPLOAD_DIR) / doc.get("media_filename", "")) for doc in pending_transcription
+        ], save_partial)
+        
+        now = datetime.now(UTC)
+        await db.feedbacks.bulk_write([
+            UpdateOne(
                 {"_id": feedback_id},
-                {
-                    "$set": {
-                        "status": "error",
-                        "error_message": f"Transcription failed: {result}",
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+                {"$set": {"transcription": result, "status": "transcribed", "updated_at": now},
+                 "$unset": {"transcription_partial": ""}}
+                if success else
+                {"$set": {"status": "error", "error_message": f"Transcription failed: {result}", "updated_at": now},
+                 "$unset": {"transcription_partial": ""}}
             )
+            for feedback_id, (success, result) in zip(feedback_ids, results)
+        ], ordered=False)  # independent updates: one failure must not skip the rest
     
-    # Process pending analysis (transcribed but not analyzed)
-    pending_analysis = await db.feedbacks.find(
-        {"status": "transcribed", "transcription": {"$exists": True, "$ne": None}}
-    ).limit(MAX_CONCURRENT).to_list(length=MAX_CONCURRENT)
+    return len(pending_transcription)
+
+
+def analysis_update(doc: dict, success: bool, result: dict, now: datetime) -> dict:
+    """Update recording an analysis result, requeueing transient failures a few times"""
+    if success:
+        return {"$set": {"analysis": result, "status": "completed", "updated_at": now}}
     
-    for doc in pending_analysis:
-        feedback_id = doc["_id"]
-        transcription = doc.get("transcription", "")
-        
-        logger.info(f"Processing analysis for {feedback_id}")
+    attempts = doc.get("analysis_attempts", 0) + 1
+    if result.get("retryable") and attempts < MAX_ANALYSIS_ATTEMPTS:
+        logger.warning(f"Requeueing analysis of {doc['_id']} (attempt {attempts}): {result['error']}")
+        return {"$set": {"status": "transcribed", "analysis_attempts": attempts, "updated_at": now}}
+    
+    return {"$set": {
+        "status": "error",
+        "error_message": f"Analysis failed: {result.get('error', 'Unknown')}",
+        "analysis_attempts": attempts,
+        "updated_at": now
+    }}
+
+
+async def process_analyses(db) -> int:
+    """Analyze a batch of transcribed feedbacks; returns how many were picked up"""
+    pending_analysis = await claim_feedbacks(
+        db,
+        {"status": "transcribed", "transcription": {"$exists": True, "$ne": None}},
+        "analyzing",
+        MAX_CONCURRENT_LLM
+    )
+    
+    if pending_analysis:
+        logger.info(f"Processing analysis for {len(pending_analysis)} feedbacks")
         
-        # Mark as analyzing
-        await db.feedbacks.update_one(
-            {"_id": feedback_id},
-            {"$set": {"status": "analyzing", "updated_at": datetime.utcnow()}}
-        )
+        # Qwen calls run concurrently (at most MAX_CONCURRENT_LLM, the batch size):
+        # the batch takes as long as its slowest call, not the sum of all
+        results = await asyncio.gather(*(
+            analyze_cached(db, doc.get("transcription", "")) for doc in pending_analysis
+        ))
         
-        success, result = await analyze_transcription(transcription)
+        now = datetime.now(UTC)
+        await db.feedbacks.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, analysis_update(doc, success, result, now))
+            for doc, (success, result) in zip(pending_analysis, results)
+        ], ordered=False)
         
-        if success:
-            await db.feedbacks.update_one(
-                {"_id": feedback_id},
-                {
-                    "$set": {
-                        "analysis": result,
-                        "status": "completed",
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-        else:
-            await db.feedbacks.update_one(
-                {"_id": feedback_id},
-                {
-                    "$set": {
-                        "status": "error",
-                        "error_message": f"Analysis failed: {result.get('error', 'Unknown')}",
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
+        # One rollup refresh for every (day, store) row the batch completed
+        rows = {
+            (doc.get("recorded_date"), doc.get("store_code"))
+            for doc, (success, _) in zip(pending_analysis, results) if success
+        }
+        if rows:
+            await refresh_daily_stats(db, {"$or": [
+                {"recorded_date": recorded_date, "store_code": store_code}
+                for recorded_date, store_code in rows
+            ]})
+    
+    return len(pending_analysis)
+
+
+async def process_pending() -> int:
+    """Process a batch of each stage; returns how many feedbacks were picked up"""
+    db = db_client[DB_NAME]
+    # Analysis waits on the network, transcription on whisper: run them side by side
+    transcribed, analyzed = await asyncio.gather(process_transcriptions(db), process_analyses(db))
+    return transcribed + analyzed
+
+
+async def process_backlog():
+    """Process batches until nothing is pending"""
+    while await process_pending():
+        pass
+
+
+async def poll():
+    """Fallback: process the backlog every POLL_INTERVAL seconds"""
+    while True:
+        try:
+            await process_backlog()
+        except Exception as e:
+            logger.error(f"Error in processing loop: {e}")
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def run_on_changes():
+    """
+    Process the backlog, then again whenever a feedback needs work: idle
+    workers issue no queries and uploads start transcribing immediately.
+    Without a replica set (no change streams) falls back to polling.
+    """
+    db = db_client[DB_NAME]
+    while True:
+        try:
+            # Open the stream before draining the backlog so no write falls in between
+            stream = await db.feedbacks.watch([{"$match": WORK_CHANGES}])
+        except PyMongoError as e:
+            logger.warning(f"Change stream unavailable, polling every {POLL_INTERVAL}s: {e}")
+            await poll()
+            return
+        try:
+            async with stream:
+                await process_backlog()
+                async for _ in stream:
+                    await process_backlog()
+        except Exception as e:
+            logger.error(f"Error in processing loop: {e}")
+            await asyncio.sleep(POLL_INTERVAL)
 
 
 async def main():
     """Main worker loop"""
-    global db_client
+    global db_client, http_client, whisper_model
     
     logger.info("Starting Store Feedback Worker...")
     logger.info(f"MongoDB: {MONGO_URI}")
     logger.info(f"Upload Dir: {UPLOAD_DIR}")
     logger.info(f"Whisper CLI: {WHISPER_CLI}")
-    logger.info(f"Poll Interval: {POLL_INTERVAL}s")
+    logger.info(
+        f"Whisper threads: {WHISPER_THREADS} (long clips: {WHISPER_PROCESSORS} processors), "
+        f"flash attention: {'on' if WHISPER_FLASH_ATTN else 'off'}"
+    )
+    if WHISPER_SERVER_URL:
+        logger.info(f"Whisper server: {WHISPER_SERVER_URL}")
+    logger.info(f"Poll Interval (without change streams): {POLL_INTERVAL}s")
     
     # Connect to MongoDB
-    db_client = AsyncIOMotorClient(MONGO_URI)
+    db_client = AsyncMongoClient(MONGO_URI)
+    http_client = httpx.AsyncClient(
+        timeout=60.0,
+        http2=True,  # concurrent calls multiplex over one connection
+        limits=httpx.Limits(max_keepalive_connections=MAX_CONCURRENT_LLM)
+    )
     
     # Verify connection
     try:
@@ -380,8 +885,25 @@ async def main():
         logger.error(f"Failed to connect to MongoDB: {e}")
         sys.exit(1)
     
+    # Cached analyses expire after ANALYSIS_CACHE_TTL
+    await db_client[DB_NAME].analysis_cache.create_index("created_at", expireAfterSeconds=ANALYSIS_CACHE_TTL)
+    
     # Check whisper availability
-    if Path(WHISPER_CLI).exists() and Path(WHISPER_MODEL).exists():
+    if FASTER_WHISPER_MODEL:
+        try:
+            from faster_whisper import WhisperModel
+            whisper_model = WhisperModel(
+                FASTER_WHISPER_MODEL,
+                device=WHISPER_DEVICE,
+                compute_type=WHISPER_COMPUTE_TYPE,
+                cpu_threads=max(1, WHISPER_THREADS // MAX_CONCURRENT),
+                num_workers=MAX_CONCURRENT  # lets a batch's files transcribe in parallel
+            )
+            logger.info(f"✓ faster-whisper model loaded ({FASTER_WHISPER_MODEL}, {WHISPER_DEVICE}, {WHISPER_COMPUTE_TYPE})")
+        except Exception as e:
+            logger.error(f"Cannot load faster-whisper model {FASTER_WHISPER_MODEL}: {e}")
+            sys.exit(1)
+    elif Path(WHISPER_CLI).exists() and Path(WHISPER_MODEL).exists():
         logger.info("✓ Whisper.cpp ready")
     else:
         logger.warning("⚠ Whisper.cpp not found - transcription will fail")
@@ -390,18 +912,12 @@ async def main():
     logger.info("Worker running. Press Ctrl+C to stop.")
     
     try:
-        while True:
-            try:
-                await process_pending()
-            except Exception as e:
-                logger.error(f"Error in processing loop: {e}")
-            
-            await asyncio.sleep(POLL_INTERVAL)
-    
+        await run_on_changes()
     except KeyboardInterrupt:
         logger.info("Shutting down...")
     finally:
-        db_client.close()
+        await http_client.aclose()
+        await db_client.close()
 
 
 if __name__ == "__main__":
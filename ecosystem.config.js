@@ -8,14 +8,18 @@ const os = require('os');
 
 const homeDir = os.homedir();
 const venvPath = path.join(homeDir, 'new');
+const apiWorkers = String(process.env.WEB_CONCURRENCY || os.cpus().length);
 
 module.exports = {
   apps: [
     {
       name: 'feedback-api',
       script: path.join(venvPath, 'bin/python'),
-      args: '-m uvicorn app.main:app --host 127.0.0.1 --port 20530',
+      args: `-m uvicorn app.main:app --host 127.0.0.1 --port 20530 --loop uvloop --http httptools --workers ${apiWorkers}`,
       cwd: path.join(__dirname, 'backend'),
+      env: {
+        WEB_CONCURRENCY: apiWorkers  // match --workers so each process takes its share of the Mongo pool
+      },
       instances: 1,
       autorestart: true,
       watch: false,
@@ -34,10 +34,10 @@ interface Feedback {
   analysis?: {
     summary: string;
     tone: 'positive' | 'negative' | 'neutral';
-    tone_score: number;
-    products: string[];
-    issues: string[];
-    actions: string[];
+    tone_score?: number;
+    products?: string[];
+    issues?: string[];
+    actions?: string[];
   };
   status: string;
   created_at: string;
@@ -210,7 +210,7 @@ const RecordingPage: React.FC = () => {
 
   const loadRecentUploads = async () => {
     try {
-      const data = await api.get('/api/v1/feedbacks?limit=5');
+      const data = await api.get('/api/v1/feedbacks?limit=5&summary=true');
       setRecentUploads(data);
     } catch (e) {
       console.error('Failed to load recent uploads');
@@ -463,7 +463,7 @@ const DashboardPage: React.FC = () => {
     try {
       const [statsData, feedbacksData] = await Promise.all([
         api.get(`/api/v1/dashboard/stats?days=${days}`),
-        api.get('/api/v1/feedbacks?limit=20')
+        api.get('/api/v1/feedbacks?limit=20&summary=true')
       ]);
       setStats(statsData);
       setFeedbacks(feedbacksData);
@@ -474,6 +474,17 @@ const DashboardPage: React.FC = () => {
     }
   };
 
+  // List rows only carry tone/summary; fetch the transcription and full analysis on open
+  const openFeedback = async (fb: Feedback) => {
+    setSelectedFeedback(fb);
+    try {
+      const detail = await api.get(`/api/v1/feedback/${fb.id}`);
+      setSelectedFeedback((current) => (current?.id === fb.id ? detail : current));
+    } catch (e) {
+      console.error('Failed to load feedback details');
+    }
+  };
+
   const TONE_COLORS = {
     positive: '#22c55e',
     negative: '#ef4444',
@@ -698,7 +709,7 @@ const DashboardPage: React.FC = () => {
               </thead>
               <tbody className="divide-y divide-gray-100">
                 {feedbacks.map((fb) => (
-                  <tr key={fb.id} className="hover:bg-gray-50 cursor-pointer" onClick={() => setSelectedFeedback(fb)}>
+                  <tr key={fb.id} className="hover:bg-gray-50 cursor-pointer" onClick={() => openFeedback(fb)}>
                     <td className="px-6 py-4 font-medium text-gray-800">{fb.store_code}</td>
                     <td className="px-6 py-4 text-gray-600">{fb.recorded_date}</td>
                     <td className="px-6 py-4">
@@ -792,7 +803,7 @@ const DashboardPage: React.FC = () => {
                       <div>
                         <p className="text-sm text-gray-500 mb-2">Products</p>
                         <div className="flex flex-wrap gap-1">
-                          {selectedFeedback.analysis.products.map((p, i) => (
+                          {selectedFeedback.analysis.products?.map((p, i) => (
                             <span key={i} className="px-2 py-1 bg-blue-100 text-blue-700 text-xs rounded-full">
                               {p}
                             </span>
@@ -802,7 +813,7 @@ const DashboardPage: React.FC = () => {
                       <div>
                         <p className="text-sm text-gray-500 mb-2">Issues</p>
                         <div className="flex flex-wrap gap-1">
-                          {selectedFeedback.analysis.issues.map((p, i) => (
+                          {selectedFeedback.analysis.issues?.map((p, i) => (
                             <span key={i} className="px-2 py-1 bg-red-100 text-red-700 text-xs rounded-full">
                               {p}
                             </span>
@@ -812,7 +823,7 @@ const DashboardPage: React.FC = () => {
                       <div>
                         <p className="text-sm text-gray-500 mb-2">Actions</p>
                         <div className="flex flex-wrap gap-1">
-                          {selectedFeedback.analysis.actions.map((p, i) => (
+                          {selectedFeedback.analysis.actions?.map((p, i) => (
                             <span key={i} className="px-2 py-1 bg-green-100 text-green-700 text-xs rounded-full">
                               {p}
                             </span>